@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the encode -> channel -> decode pipeline
+
+Writes machine-readable JSON so results from different versions can be
+compared with --compare.
+"""
+
+import argparse
+import json
+import platform
+import random
+import string
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+from encoder_decoder import ManchesterEncoder, ManchesterDecoder, StreamingDecoder
+from utils import BrightnessDetector, BitBuffer
+
+DEFAULT_PAYLOAD_SIZES = [64, 1024, 8192]
+DEFAULT_RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080)]
+
+def make_payload(size, seed=0):
+    """Deterministic printable text of the given size"""
+    rng = random.Random(seed)
+    return ''.join(rng.choice(string.ascii_letters + string.digits + ' ') for _ in range(size))
+
+def make_frames(width, height, count=32, seed=0):
+    """Alternating dark/bright BGR frames with a little noise"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for index in range(count):
+        level = 200 if index % 2 else 40
+        noise = rng.integers(0, 16, size=(height, width, 3), dtype=np.uint8)
+        frames.append(np.full((height, width, 3), level, dtype=np.uint8) + noise)
+    return frames
+
+def summarize(durations, units=1):
+    """Latency percentiles (ms) and throughput (units per second) for timed calls"""
+    durations = np.asarray(durations, dtype=np.float64)
+    total = float(durations.sum())
+    return {
+        'calls': int(len(durations)),
+        'mean_ms': float(durations.mean() * 1000),
+        'p50_ms': float(np.percentile(durations, 50) * 1000),
+        'p90_ms': float(np.percentile(durations, 90) * 1000),
+        'p99_ms': float(np.percentile(durations, 99) * 1000),
+        'max_ms': float(durations.max() * 1000),
+        'per_second': (len(durations) * units / total) if total > 0 else None,
+    }
+
+def time_calls(func, repeats):
+    """Time repeated calls of func, return per-call durations in seconds"""
+    func()  # Warm up caches and lazy imports
+    durations = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - started)
+    return durations
+
+def peak_memory(func):
+    """Peak bytes allocated by Python while running func once"""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def bench_encoder(payload_sizes, repeats):
+    """ManchesterEncoder.encode_message throughput in payload bits per second"""
+    encoder = ManchesterEncoder()
+    results = []
+    for size in payload_sizes:
+        message = make_payload(size)
+        encode = lambda: encoder.encode_message(message)
+        stats = summarize(time_calls(encode, repeats), units=size * 8)
+        stats.update({'payload_bytes': size, 'peak_memory_bytes': peak_memory(encode)})
+        results.append(stats)
+    return results
+
+def bench_decoder(payload_sizes, repeats):
+    """ManchesterDecoder.decode_message throughput in payload bits per second"""
+    encoder = ManchesterEncoder()
+    decoder = ManchesterDecoder()
+    results = []
+    for size in payload_sizes:
+        encoded = encoder.encode_message(make_payload(size))
+        decode = lambda: decoder.decode_message(encoded)
+        stats = summarize(time_calls(decode, repeats), units=size * 8)
+        stats.update({'payload_bytes': size, 'peak_memory_bytes': peak_memory(decode)})
+        results.append(stats)
+    return results
+
+def bench_streaming_decoder(payload_sizes, repeats):
+    """StreamingDecoder throughput in received symbols per second"""
+    encoder = ManchesterEncoder()
+    results = []
+    for size in payload_sizes:
+        symbols = [int(bit) for bit in encoder.encode_message(make_payload(size))]
+        decode = lambda: StreamingDecoder(max_message_bytes=size + 1).feed_bits(symbols)
+        stats = summarize(time_calls(decode, max(1, repeats // 10)), units=len(symbols))
+        stats.update({'payload_bytes': size, 'symbols': len(symbols),
+                      'peak_memory_bytes': peak_memory(decode)})
+        results.append(stats)
+    return results
+
+def bench_brightness(resolutions, repeats):
+    """BrightnessDetector.get_center_brightness latency per frame"""
+    detector = BrightnessDetector()
+    results = []
+    for width, height in resolutions:
+        frames = make_frames(width, height)
+        index = [0]
+        
+        def measure():
+            detector.get_center_brightness(frames[index[0] % len(frames)])
+            index[0] += 1
+        
+        stats = summarize(time_calls(measure, repeats))
+        stats.update({'resolution': f"{width}x{height}", 'peak_memory_bytes': peak_memory(measure)})
+        results.append(stats)
+    return results
+
+def bench_bit_buffer(repeats, bits_per_call=10000):
+    """BitBuffer.add_bit throughput in bits per second"""
+    pattern = [index % 2 for index in range(bits_per_call)]
+    
+    def fill():
+        buffer = BitBuffer()
+        for bit in pattern:
+            buffer.add_bit(bit)
+    
+    stats = summarize(time_calls(fill, max(1, repeats // 10)), units=bits_per_call)
+    stats.update({'bits_per_call': bits_per_call, 'peak_memory_bytes': peak_memory(fill)})
+    return stats
+
+def bench_receiver_frames(resolutions, repeats):
+    """Receiver per-frame processing: ROI brightness, slicing, clock recovery, decoding"""
+    from receiver import CameraReceiver
+    
+    results = []
+    for width, height in resolutions:
+        frames = make_frames(width, height)
+        receiver = CameraReceiver(show_preview=False)
+        receiver.message_callback = None
+        receiver.info_callback = None
+        receiver._reset_pipeline()
+        state = {'index': 0, 'timestamp': 0.0}
+        
+        def process():
+            frame = frames[state['index'] % len(frames)]
+            brightness = receiver.brightness_detector.get_center_brightness(frame)
+            receiver._process_sample(state['timestamp'], brightness)
+            state['index'] += 1
+            state['timestamp'] += 1.0 / 30
+        
+        stats = summarize(time_calls(process, repeats))
+        stats.update({'resolution': f"{width}x{height}", 'peak_memory_bytes': peak_memory(process)})
+        results.append(stats)
+    return results
+
+def environment():
+    """Interpreter and library versions the numbers were taken with"""
+    info = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+    }
+    try:
+        import cv2
+        info['opencv'] = cv2.__version__
+    except ImportError:
+        info['opencv'] = None
+    return info
+
+def run_benchmarks(payload_sizes=None, resolutions=None, repeats=200):
+    """Run every benchmark and return the results as a JSON-serializable dict"""
+    payload_sizes = payload_sizes or DEFAULT_PAYLOAD_SIZES
+    resolutions = resolutions or DEFAULT_RESOLUTIONS
+    return {
+        'timestamp': time.time(),
+        'environment': environment(),
+        'repeats': repeats,
+        'benchmarks': {
+            'encoder': bench_encoder(payload_sizes, repeats),
+            'decoder': bench_decoder(payload_sizes, repeats),
+            'streaming_decoder': bench_streaming_decoder(payload_sizes, repeats),
+            'brightness': bench_brightness(resolutions, repeats),
+            'bit_buffer': bench_bit_buffer(repeats),
+            'receiver_frame': bench_receiver_frames(resolutions, repeats),
+        },
+    }
+
+def _flatten(results):
+    """Map 'benchmark[case]' to its stats for comparison"""
+    flat = {}
+    for name, entries in results['benchmarks'].items():
+        for entry in (entries if isinstance(entries, list) else [entries]):
+            case = entry.get('payload_bytes', entry.get('resolution', ''))
+            flat[f"{name}[{case}]"] = entry
+    return flat
+
+def compare(baseline, current, tolerance=0.25):
+    """List cases whose median latency regressed by more than the tolerance"""
+    regressions = []
+    previous = _flatten(baseline)
+    for key, entry in _flatten(current).items():
+        if key not in previous:
+            continue
+        before, after = previous[key]['p50_ms'], entry['p50_ms']
+        if before > 0 and after > before * (1 + tolerance):
+            regressions.append({'case': key, 'baseline_p50_ms': before, 'current_p50_ms': after,
+                                'slowdown': after / before})
+    return regressions
+
+def parse_resolution(text):
+    """Parse WIDTHxHEIGHT"""
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="WhisprNet pipeline benchmarks")
+    parser.add_argument('--output', '-o', help="Write JSON results to this file")
+    parser.add_argument('--repeats', type=int, default=200, help="Timed calls per case")
+    parser.add_argument('--payload-sizes', type=int, nargs='+', default=DEFAULT_PAYLOAD_SIZES)
+    parser.add_argument('--resolutions', type=parse_resolution, nargs='+', default=DEFAULT_RESOLUTIONS)
+    parser.add_argument('--compare', help="Baseline JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed median slowdown")
+    args = parser.parse_args(argv)
+    
+    results = run_benchmarks(args.payload_sizes, args.resolutions, args.repeats)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text)
+    else:
+        print(text)
+    
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"❌ {regression['case']}: {regression['baseline_p50_ms']:.3f}ms -> "
+                  f"{regression['current_p50_ms']:.3f}ms ({regression['slowdown']:.2f}x)", file=sys.stderr)
+        if regressions:
+            return 1
+        print("✅ No performance regressions", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
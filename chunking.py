@@ -0,0 +1,184 @@
+import binascii
+import os
+import struct
+from collections import OrderedDict, deque
+
+# Chunk layout, carried as the payload of one frame each: magic, transfer id,
+# chunk index, chunk count, then a slice of the transfer. 0xFE never occurs in
+# UTF-8, so chunks and text messages are told apart by their first byte.
+CHUNK_MAGIC = 0xFE
+CHUNK_FORMAT = '>BHHH'
+CHUNK_HEADER_SIZE = struct.calcsize(CHUNK_FORMAT)
+MAX_CHUNKS = 0xFFFF
+DEFAULT_CHUNK_SIZE = 64  # Data bytes per chunk; shorter chunks are cheaper to miss
+
+def pack_transfer(data, name=''):
+    """Name length, name, data and a CRC-32 of the whole transfer"""
+    name = name.encode('utf-8')
+    if len(name) > 255:
+        raise ValueError("Transfer name too long")
+    body = bytes([len(name)]) + name + bytes(data)
+    return body + struct.pack('>I', binascii.crc32(body))
+
+def unpack_transfer(blob):
+    """(name, data) of a reassembled transfer, ValueError if it is corrupt"""
+    if len(blob) < 5 or struct.unpack_from('>I', blob, len(blob) - 4)[0] != binascii.crc32(blob[:-4]):
+        raise ValueError("Transfer CRC mismatch")
+    name_length = blob[0]
+    if 1 + name_length > len(blob) - 4:
+        raise ValueError("Transfer name is truncated")
+    return blob[1:1 + name_length].decode('utf-8', errors='replace'), bytes(blob[1 + name_length:-4])
+
+def save_transfer(directory, name, data):
+    """Write a received transfer into a directory, return the path it got"""
+    os.makedirs(directory, exist_ok=True)
+    # Never trust a path from the sender, and never overwrite an earlier file
+    base, ext = os.path.splitext(os.path.basename(name) or "transfer.bin")
+    path = os.path.join(directory, base + ext)
+    counter = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f"{base}_{counter}{ext}")
+        counter += 1
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+def split_transfer(data, name='', chunk_size=DEFAULT_CHUNK_SIZE, transfer_id=None):
+    """Chunk payloads for bytes (e.g. a file's contents), each to be sent in its own frame"""
+    if chunk_size < 1:
+        raise ValueError("Chunk size must be at least one byte")
+    blob = pack_transfer(data, name)
+    total = -(-len(blob) // chunk_size)
+    if total > MAX_CHUNKS:
+        raise ValueError(f"Transfer too large: {total} chunks of {chunk_size} bytes")
+    if transfer_id is None:
+        transfer_id = int.from_bytes(os.urandom(2), 'big')  # Tells repeated sends of a file apart
+    return [struct.pack(CHUNK_FORMAT, CHUNK_MAGIC, transfer_id, index, total) +
+            blob[index * chunk_size:(index + 1) * chunk_size] for index in range(total)]
+
+def is_chunk(payload):
+    """Whether a payload starts like a chunk"""
+    return len(payload) > 0 and payload[0] == CHUNK_MAGIC
+
+def parse_chunk(payload):
+    """(transfer id, index, total, data) of a chunk payload, ValueError if it is malformed"""
+    if len(payload) < CHUNK_HEADER_SIZE or not is_chunk(payload):
+        raise ValueError("Not a chunk")
+    _, transfer_id, index, total = struct.unpack_from(CHUNK_FORMAT, payload)
+    if index >= total:
+        raise ValueError("Chunk index out of range")
+    return transfer_id, index, total, bytes(payload[CHUNK_HEADER_SIZE:])
+
+def carousel(chunks, rounds=None):
+    """(round, index, chunk) over and over, so chunks a receiver missed come round again"""
+    round_index = 0
+    while rounds is None or round_index < rounds:
+        for index, chunk in enumerate(chunks):
+            yield round_index, index, chunk
+        round_index += 1
+
+class PartialTransfer:
+    """Chunks of one transfer received so far"""
+    def __init__(self, total):
+        self.shape = total  # Chunks of a later packet with another shape belong to a new transfer
+        self.total = total
+        self.chunks = {}    # Index -> data
+        self.size = 0       # Bytes held
+    
+    @property
+    def received(self):
+        """Number of chunks in hand"""
+        return len(self.chunks)
+    
+    @property
+    def missing(self):
+        """Number of chunks still to come"""
+        return self.total - len(self.chunks)
+    
+    def add(self, index, data):
+        """Store one chunk, repeats are ignored"""
+        if index not in self.chunks:
+            self.chunks[index] = data
+            self.size += len(data)
+    
+    def blob(self):
+        """Reassembled transfer once nothing is missing"""
+        return b''.join(self.chunks[index] for index in range(self.total))
+
+class ChunkAssembler:
+    """Reassembly table for chunked transfers, bounded in memory
+    
+    Transfers fill in as chunks arrive in any order and any number of times.
+    When the table outgrows its limit, the transfer that has gone longest
+    without a new chunk is dropped.
+    """
+    def __init__(self, max_bytes=1 << 20, remember=32):
+        self.max_bytes = max_bytes          # Chunk data held across all partial transfers
+        self.transfers = OrderedDict()      # Transfer id -> PartialTransfer, least recently fed first
+        self.completed = deque(maxlen=remember)  # Ids already delivered, their repeats are ignored
+        self.evicted = 0                    # Transfers dropped to stay under the limit
+        self.rejected = 0                   # Malformed chunks and transfers that failed their CRC
+        self.size = 0
+    
+    def reset(self):
+        """Forget every partial transfer"""
+        self.transfers.clear()
+        self.size = 0
+    
+    def add(self, payload):
+        """Add one chunk payload, return (name, data) once its transfer is complete"""
+        try:
+            transfer_id, key, shape, data = self._parse(payload)
+        except ValueError:
+            self.rejected += 1
+            return None
+        if transfer_id in self.completed:
+            return None  # A later lap of the carousel
+        
+        transfer = self.transfers.get(transfer_id)
+        if transfer is None or transfer.shape != shape:
+            self._drop(transfer_id)
+            transfer = self.transfers[transfer_id] = self._new_transfer(payload, shape)
+        self.transfers.move_to_end(transfer_id)
+        held = transfer.size
+        transfer.add(key, data)
+        self.size += transfer.size - held
+        
+        if transfer.missing:
+            self._evict()
+            return None
+        
+        self._drop(transfer_id)
+        try:
+            transfer = unpack_transfer(transfer.blob())
+        except ValueError:
+            self.rejected += 1  # Start over, the next lap may bring it in cleanly
+            return None
+        self.completed.append(transfer_id)
+        return transfer
+    
+    def progress(self):
+        """(transfer id, chunks received, chunks in total) of every partial transfer"""
+        return [(transfer_id, transfer.received, transfer.total)
+                for transfer_id, transfer in self.transfers.items()]
+    
+    def _parse(self, payload):
+        """(transfer id, packet key, transfer shape, data) of a packet, ValueError if it is malformed"""
+        return parse_chunk(payload)
+    
+    def _new_transfer(self, payload, shape):
+        """Empty transfer for the first packet of its kind"""
+        return PartialTransfer(shape)
+    
+    def _drop(self, transfer_id):
+        """Remove a transfer from the table"""
+        transfer = self.transfers.pop(transfer_id, None)
+        if transfer is not None:
+            self.size -= transfer.size
+    
+    def _evict(self):
+        """Drop the least recently fed transfers until the table fits its limit"""
+        # The transfer just fed sits last, so it only goes when it can never fit on its own
+        while self.size > self.max_bytes and self.transfers:
+            self._drop(next(iter(self.transfers)))
+            self.evicted += 1
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Headless command-line interface: send, receive, decode-file, simulate and bench
+
+Only argparse is loaded up front. Each subcommand imports what it needs
+when it runs, so scripted jobs never pay for Tk or OpenCV they do not
+use: decoding a trace loads NumPy but no OpenCV, and only send loads Tk.
+"""
+
+import argparse
+import sys
+import time
+from scheduler import DEFAULT_REFRESH_HZ  # Standard library only
+from config import (LANE_CHOICES, LINE_CODE_CHOICES, FEC_LEVELS, RECEIVED_DIR, FILE_LAPS,
+                    FOUNTAIN_SYMBOLS_PER_BLOCK, MIN_SPEED_MS, MAX_SPEED_MS)
+
+LINE_CODE_HELP = ("Line code (%(default)s). 8B10B is the dense DC-balanced choice; "
+                  "4B5B is as dense but its average brightness follows the data")
+INFO_INTERVAL = 1.0  # Seconds between detection info lines with --verbose
+
+def log(text):
+    """Progress and diagnostics go to stderr, received data to stdout"""
+    print(text, file=sys.stderr, flush=True)
+
+def parse_choice(choices):
+    """Argument type matching one of the choices regardless of case, e.g. 'rgb' -> 'RGB'"""
+    def parse(text):
+        for choice in choices:
+            if choice.lower() == text.lower():
+                return choice
+        raise argparse.ArgumentTypeError(f"Must be one of {', '.join(choices)}")
+    return parse
+
+def make_receiver(mode, refresh_hz=DEFAULT_REFRESH_HZ, **kwargs):
+    """Receiver for a lane mode: PAM, color, grid, rolling shutter rows or a single cell"""
+    from receiver import CameraReceiver, GridReceiver, ColorReceiver, PamReceiver, RollingShutterReceiver
+    from grid import parse_grid
+    
+    if mode == "Rows":
+        return RollingShutterReceiver(refresh_hz, **kwargs)
+    if mode.startswith("PAM-"):
+        return PamReceiver(int(mode[4:]), **kwargs)
+    if mode == "RGB":
+        return ColorReceiver(**kwargs)
+    rows, cols = parse_grid(mode)
+    if rows * cols > 1:
+        return GridReceiver(rows, cols, **kwargs)
+    return CameraReceiver(**kwargs)
+
+def configure_sender(flicker, args):
+    """Apply the mode, line code, FEC and compression options to a ScreenFlicker"""
+    from grid import parse_grid
+    
+    if args.mode.startswith("PAM-") and args.line_code != "Manchester":
+        raise ValueError("Line codes apply to binary modes, PAM sends its own levels")
+    flicker.color = args.mode == "RGB"
+    flicker.fullscreen = args.mode == "Rows"
+    flicker.levels = int(args.mode[4:]) if args.mode.startswith("PAM-") else 2
+    flicker.line_code = args.line_code.lower()
+    flicker.fec_level = FEC_LEVELS[args.fec]
+    flicker.compress = not args.no_compress
+    flicker.rows, flicker.cols = parse_grid(args.mode) if "x" in args.mode else (1, 1)
+    flicker.refresh_hz = args.refresh_hz
+
+def export_metrics(snapshot, path):
+    """Write a metrics snapshot, CSV for .csv paths and JSON otherwise"""
+    from metrics import export_json, export_csv
+    (export_csv if path.lower().endswith('.csv') else export_json)(snapshot, path)
+
+def transfer_saver(directory):
+    """Transfer callback that saves completed files and reports where they went"""
+    from chunking import save_transfer
+    
+    def save(name, data):
+        path = save_transfer(directory, name, data)
+        save.paths.append(path)
+        log(f"📦 {name} ({len(data)} bytes) saved to {path}")
+    save.paths = []
+    return save
+
+def command_send(args):
+    """Flicker a message or a file in a bare transmitter window"""
+    import os
+    import tkinter as tk
+    from sender import ScreenFlicker
+    
+    if args.message is None and args.file is None:
+        raise ValueError("Give a message or --file")
+    # Rows mode ignores the speed, it sends one symbol per display refresh
+    if args.mode != "Rows" and not MIN_SPEED_MS <= args.speed <= MAX_SPEED_MS:
+        raise ValueError(f"Speed must be between {MIN_SPEED_MS}-{MAX_SPEED_MS}ms")
+    
+    flicker = ScreenFlicker()
+    configure_sender(flicker, args)
+    
+    # Only the flicker window is shown, the root window stays hidden
+    root = tk.Tk()
+    root.withdraw()
+    result = {'completed': False}
+    
+    def done(completed):
+        result['completed'] = completed
+        root.quit()
+    
+    if args.file:
+        with open(args.file, 'rb') as f:
+            data = f.read()
+        name = os.path.basename(args.file)
+        if args.fountain:
+            flicker.send_fountain(data, name, args.speed, args.symbols_per_block, None, log, done)
+        else:
+            flicker.send_data(data, name, args.speed, args.laps, None, log, done)
+    else:
+        flicker.send_message(args.message, args.speed, None, log, done)
+    
+    try:
+        root.mainloop()
+    except KeyboardInterrupt:
+        flicker.stop_transmission()
+    finally:
+        flicker.close_flicker_window()
+        root.destroy()
+    
+    if args.metrics:
+        export_metrics(flicker.metrics.snapshot(), args.metrics)
+    return 0 if result['completed'] else 1
+
+def command_receive(args):
+    """Listen on the camera until interrupted, printing messages and saving files"""
+    import signal
+    import threading
+    from sources import CameraSource
+    
+    receiver = make_receiver(args.mode, args.refresh_hz, show_preview=args.preview, camera_fps=args.fps,
+                             soft_decision=not args.hard_decision)
+    receiver.transfer_callback = transfer_saver(args.output_dir)
+    
+    # SIGTERM stops a daemon as cleanly as Ctrl-C does
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    
+    last_info = [0.0]
+    
+    def info(text):
+        # Detection info arrives with every bit, errors always get through
+        now = time.monotonic()
+        if text.startswith("Error") or (args.verbose and now - last_info[0] >= INFO_INTERVAL):
+            last_info[0] = now
+            log(text)
+    
+    def message(text):
+        print(text, flush=True)
+    
+    receiver.start_receiving(message, info, source=CameraSource(args.camera, fps=args.fps), record_path=args.record)
+    log(f"📹 Camera {args.camera} started, listening for optical signals ({args.mode})...")
+    
+    deadline = time.monotonic() + args.duration if args.duration else None
+    next_export = time.monotonic() + args.metrics_interval
+    try:
+        while receiver.capture_thread.is_alive() and not stop.wait(0.5):
+            now = time.monotonic()
+            if deadline and now >= deadline:
+                break
+            if args.metrics and now >= next_export:
+                export_metrics(receiver.metrics_snapshot(), args.metrics)
+                next_export = now + args.metrics_interval
+    finally:
+        # Take the snapshot while the session state is still there
+        snapshot = receiver.metrics_snapshot()
+        receiver.stop_receiving()
+        if args.metrics:
+            export_metrics(snapshot, args.metrics)
+        log("📹 Camera stopped")
+    return 0
+
+def command_decode_file(args):
+    """Decode a recorded video file or brightness trace as fast as it reads"""
+    from sources import open_source
+    
+    receiver = make_receiver(args.mode, args.refresh_hz, show_preview=False, bit_duration_ms=args.bit_duration,
+                             soft_decision=not args.hard_decision)
+    receiver.transfer_callback = transfer_saver(args.output_dir)
+    started = time.perf_counter()
+    messages = receiver.decode_source(open_source(args.path), lambda text: print(text, flush=True))
+    saved = receiver.transfer_callback.paths
+    log(f"📂 Decoded {args.path} in {time.perf_counter() - started:.2f}s: "
+        f"{len(messages)} messages, {len(saved)} files")
+    
+    if args.metrics:
+        export_metrics(receiver.metrics_snapshot(), args.metrics)
+    return 0 if messages or saved else 1
+
+def command_simulate(args):
+    """Sweep the synthetic channel, or save one simulated trace for decode-file"""
+    import json
+    import numpy as np
+    from simulator import OpticalChannelSimulator, sweep
+    from encoder_decoder import make_encoder
+    
+    channel = {'fps': args.fps, 'scheduled': args.scheduled}
+    encoder = make_encoder(args.line_code.lower())
+    if args.trace:
+        from sources import save_trace
+        simulator = OpticalChannelSimulator(seed=args.seed, **channel)
+        timestamps, brightness = simulator.simulate(encoder.encode_message(args.message), args.bit_durations[0])
+        save_trace(args.trace, np.column_stack((timestamps, brightness)))
+        log(f"💾 Saved {len(timestamps)} samples at {args.bit_durations[0]}ms/bit to {args.trace}")
+        return 0
+    
+    results = sweep(args.message, args.bit_durations, args.trials, args.seed, encoder=encoder,
+                    soft_decision=not args.hard_decision, **channel)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+    print(f"{'ms/bit':>8} {'frames':>7} {'success':>8} {'SER':>7} {'goodput':>10}")
+    for result in results:
+        print(f"{result['bit_duration_ms']:>8g} {result['frames_per_symbol']:>7.2f} {result['success_rate']:>8.0%} "
+              f"{result['symbol_error_rate']:>7.3f} {result['goodput_bps']:>6.1f} bps")
+    return 0
+
+def command_bench(args):
+    """Run the benchmark harness with the remaining arguments"""
+    import benchmark
+    return benchmark.main(args.bench_args)
+
+def build_parser():
+    """Argument parser for every subcommand"""
+    parser = argparse.ArgumentParser(prog="whisprnet", description="WhisprNet optical link, without the GUI")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    def add_mode(command):
+        command.add_argument('--mode', type=parse_choice(LANE_CHOICES), default=LANE_CHOICES[0],
+                             help="Lane mode, must match on both ends (%(default)s)")
+        command.add_argument('--refresh-hz', type=float, default=DEFAULT_REFRESH_HZ,
+                             help="Sender's display refresh rate, Rows mode sends a symbol per refresh (%(default)s)")
+    
+    def add_decision(command):
+        command.add_argument('--hard-decision', action='store_true',
+                             help="Decide symbols from the sliced runs alone, without integrating their samples")
+    
+    def add_output(command):
+        command.add_argument('--output-dir', default=RECEIVED_DIR, help="Where received files are saved (%(default)s)")
+        command.add_argument('--metrics', help="Write a metrics snapshot here (.json or .csv)")
+    
+    send = commands.add_parser('send', help="Flicker a message or file in a bare transmitter window")
+    send.add_argument('message', nargs='?', help="Text to send")
+    send.add_argument('--file', help="Send this file as a chunked transfer instead")
+    send.add_argument('--fountain', action='store_true', help="Fountain-code the file instead of looping a carousel")
+    send.add_argument('--laps', type=int, default=FILE_LAPS, help="Carousel laps for a file (%(default)s)")
+    send.add_argument('--symbols-per-block', type=float, default=FOUNTAIN_SYMBOLS_PER_BLOCK,
+                      help="Fountain symbols sent per source block (%(default)s)")
+    add_mode(send)
+    send.add_argument('--line-code', type=parse_choice(LINE_CODE_CHOICES), default=LINE_CODE_CHOICES[0],
+                      help=LINE_CODE_HELP)
+    send.add_argument('--fec', type=parse_choice(list(FEC_LEVELS)), default="Off", help="Reed-Solomon level (%(default)s)")
+    send.add_argument('--no-compress', action='store_true', help="Send payloads uncompressed")
+    send.add_argument('--speed', type=int, default=100, help="Symbol duration in ms, ignored in Rows mode (%(default)s)")
+    send.add_argument('--metrics', help="Write the sender's metrics here (.json or .csv)")
+    send.set_defaults(handler=command_send)
+    
+    receive = commands.add_parser('receive', help="Headless camera receiver, runs until interrupted")
+    add_mode(receive)
+    receive.add_argument('--camera', type=int, default=0, help="Camera index (%(default)s)")
+    receive.add_argument('--fps', type=int, default=30, help="Requested camera frame rate (%(default)s)")
+    receive.add_argument('--duration', type=float, help="Stop after this many seconds")
+    receive.add_argument('--record', help="Save the brightness trace here (.npy) on exit")
+    receive.add_argument('--preview', action='store_true', help="Show the OpenCV camera preview")
+    receive.add_argument('--verbose', '-v', action='store_true', help="Print detection info once a second")
+    add_decision(receive)
+    add_output(receive)
+    receive.add_argument('--metrics-interval', type=float, default=10.0,
+                         help="Seconds between metrics snapshots (%(default)s)")
+    receive.set_defaults(handler=command_receive)
+    
+    decode = commands.add_parser('decode-file', help="Decode a recorded video or .npy brightness trace")
+    decode.add_argument('path')
+    add_mode(decode)
+    decode.add_argument('--bit-duration', type=float, help="Nominal ms per symbol, recovered from the signal if left out")
+    add_decision(decode)
+    add_output(decode)
+    decode.set_defaults(handler=command_decode_file)
+    
+    simulate = commands.add_parser('simulate', help="Error-rate sweep over the synthetic optical channel")
+    simulate.add_argument('--message', default="Hello from WhisprNet!")
+    simulate.add_argument('--bit-durations', type=float, nargs='+', default=[50, 67, 100, 150, 200],
+                          help="ms per symbol to try (%(default)s)")
+    simulate.add_argument('--trials', type=int, default=10)
+    simulate.add_argument('--seed', type=int, default=0)
+    simulate.add_argument('--fps', type=float, default=30.0, help="Simulated camera frame rate (%(default)s)")
+    simulate.add_argument('--line-code', type=parse_choice(LINE_CODE_CHOICES), default=LINE_CODE_CHOICES[0],
+                          help=LINE_CODE_HELP)
+    simulate.add_argument('--scheduled', action='store_true', help="Model the deadline-driven sender")
+    add_decision(simulate)
+    simulate.add_argument('--json', action='store_true', help="Print the results as JSON")
+    simulate.add_argument('--trace', help="Save one simulated trace (first bit duration) here instead of sweeping")
+    simulate.set_defaults(handler=command_simulate)
+    
+    bench = commands.add_parser('bench', help="Benchmark the hot paths, other arguments go to benchmark.py",
+                                add_help=False)
+    bench.set_defaults(handler=command_bench)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    # Whatever bench does not know is benchmark.py's, including its own --help
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != 'bench':
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.bench_args = extra
+    try:
+        return args.handler(args)
+    except Exception as e:
+        log(f"❌ {e}")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import numpy as np
+from lanes import lane_symbols
+from framing import build_frame
+from fec import protect_frame
+
+# Lanes go out in R, G, B order; this is where each one lands in a BGR frame
+LANE_CHANNELS = (2, 1, 0)
+CALIBRATION_SYMBOLS = 4  # Symbols per calibration step
+
+def calibration_preamble(symbols_per_step=CALIBRATION_SYMBOLS):
+    """Pure red, green and blue plateaus followed by a black gap, shape (symbols, 3)"""
+    steps = np.vstack((np.eye(3, dtype=np.uint8), np.zeros((1, 3), dtype=np.uint8)))
+    return np.repeat(steps, symbols_per_step, axis=0)
+
+def color_symbols(message, encoder=None, sequence=None, fec_level=0, compress=False):
+    """Calibration preamble, then one Manchester frame per color lane, shape (symbols, 3)"""
+    data = message.encode('utf-8') if isinstance(message, str) else bytes(message)
+    if sequence is not None:
+        data = protect_frame(build_frame(data, sequence, fec_level, compress))  # Framed before striping, like the grid
+    frames = lane_symbols(data, 3, encoder)
+    return np.concatenate((calibration_preamble(), frames))
+
+def symbol_color(levels):
+    """Tk color of one (r, g, b) symbol"""
+    red, green, blue = (255 if level else 0 for level in levels)
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+class CrossTalkCalibrator:
+    """Learn how the camera sees each color lane from the preamble and undo the mixing"""
+    def __init__(self, min_contrast=30.0, idle_rate=0.1, symbols_per_step=CALIBRATION_SYMBOLS):
+        self.min_contrast = min_contrast          # A plateau must rise this far above black
+        self.idle_rate = idle_rate                # Tracking rate of the black level between messages
+        self.symbols_per_step = symbols_per_step  # Length of each preamble step in symbols
+        self.reset()
+    
+    def reset(self):
+        """Forget the calibration"""
+        self.black = None     # BGR of the black screen
+        self.unmixing = None  # Maps BGR above black to lane levels, None until calibrated
+        self.symbol_period = None  # Seconds per symbol, measured from the preamble
+        self._started = None  # Timestamp of the first preamble sample
+        self._plateaus = []   # Samples of each finished calibration step
+        self._current = None  # Samples of the step being collected
+        self._current_lane = None
+    
+    @property
+    def calibrated(self):
+        """Whether a preamble has been seen"""
+        return self.unmixing is not None
+    
+    @property
+    def collecting(self):
+        """Whether a preamble is being collected right now"""
+        return self._current_lane is not None or bool(self._plateaus)
+    
+    def feed(self, bgr, timestamp=None):
+        """Add one BGR sample, return True when it completed a calibration"""
+        bgr = np.asarray(bgr, dtype=np.float64)
+        if self.black is None:
+            self.black = bgr.copy()
+            return False
+        
+        # Which lane is on: the channel that rose the most above black
+        rise = bgr - self.black
+        lane = None
+        if rise.max() >= self.min_contrast:
+            lane = LANE_CHANNELS.index(int(np.argmax(rise)))
+        
+        if lane is not None and lane == self._current_lane:
+            self._current.append(bgr)
+            return False
+        
+        # The step changed: finish the one being collected
+        if self._current_lane is not None:
+            self._plateaus.append(self._current)
+            self._current = None
+            self._current_lane = None
+        
+        if lane is None:
+            if len(self._plateaus) == 3:
+                # Three steps of known length also give the symbol clock
+                if timestamp is not None and self._started is not None:
+                    self.symbol_period = (timestamp - self._started) / (3 * self.symbols_per_step)
+                return self._solve()
+            self._plateaus = []
+            self.black += self.idle_rate * (bgr - self.black)
+        elif lane == len(self._plateaus):
+            # Next step of the preamble: red, then green, then blue
+            self._current = [bgr]
+            self._current_lane = lane
+            if lane == 0:
+                self._started = timestamp
+        else:
+            self._plateaus = []
+        return False
+    
+    def unmix(self, bgr):
+        """Lane levels (R, G, B) for one BGR sample, on the 0-255 brightness scale"""
+        bgr = np.asarray(bgr, dtype=np.float64)
+        if self.unmixing is None:
+            return bgr[list(LANE_CHANNELS)]
+        return self.unmixing @ (bgr - self.black) * 255.0
+    
+    def _solve(self):
+        """Invert the measured response of every channel to every lane"""
+        plateaus, self._plateaus = self._plateaus, []
+        
+        # Column k is what the camera saw for lane k alone. The first and
+        # last samples of a step straddle its edges, so use the middle.
+        response = np.empty((3, 3))
+        for lane, samples in enumerate(plateaus):
+            middle = samples[1:-1] if len(samples) > 2 else samples
+            response[:, lane] = np.median(middle, axis=0) - self.black
+        
+        try:
+            self.unmixing = np.linalg.inv(response)
+        except np.linalg.LinAlgError:
+            return False
+        return True
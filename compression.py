@@ -0,0 +1,36 @@
+import zlib
+
+# Preset deflate dictionary for short chat text. A one-line message has no
+# history of its own to refer back to, but it can point into this text from
+# its first byte. The most common strings come last, where references are shortest.
+CHAT_DICTIONARY = (
+    "https://www. .com .org @gmail.com password address number phone call email "
+    "January February March April May June July August September October November December "
+    "Monday Tuesday Wednesday Thursday Friday Saturday Sunday "
+    "morning afternoon evening tonight tomorrow yesterday today minutes hours week "
+    "meeting office home work school lunch dinner coffee the door room "
+    "please thank you thanks sorry hello Hello hi Hi hey Hey bye okay OK ok yes Yes no No "
+    "I'm I am I'll I will I have I think I don't know can you could you would you "
+    "are you there? how are you? what's up? see you later. let me know. on my way. "
+    "in the of the to the for the and the is the at the on the with the from the "
+    "that this there they them their what when where which who why how about "
+    "just like good great need want time more some been have will would your "
+    "message test The the and you for are not with this that was "
+).encode('utf-8')
+MAX_INFLATED = 0xFFFF  # Largest payload a frame can describe
+
+def compress_payload(data):
+    """Raw deflate of bytes against the chat dictionary (the frame CRC replaces zlib's checksum)"""
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, CHAT_DICTIONARY)
+    return compressor.compress(bytes(data)) + compressor.flush()
+
+def decompress_payload(data, max_length=MAX_INFLATED):
+    """Bytes of a compressed payload, ValueError if it is corrupt"""
+    decompressor = zlib.decompressobj(-15, zdict=CHAT_DICTIONARY)
+    try:
+        data = decompressor.decompress(bytes(data), max_length)
+    except zlib.error:
+        raise ValueError("Compressed payload is corrupt")
+    if not decompressor.eof or decompressor.unconsumed_tail:
+        raise ValueError("Compressed payload is truncated or too long")
+    return data
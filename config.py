@@ -0,0 +1,14 @@
+# Settings shared by the GUI and the command line. Standard library only, so
+# importing them costs the CLI nothing before a subcommand runs.
+
+LANE_CHOICES = ["1x1", "2x2", "3x3", "4x4", "RGB", "PAM-4", "PAM-8", "Rows"]
+LINE_CODE_CHOICES = ["Manchester", "4B5B", "8B10B"]
+# Reed-Solomon redundancy: 4 parity bytes per level and codeword, each pair repairs one byte
+FEC_LEVELS = {"Off": 0, "Low": 1, "Medium": 2, "High": 4}
+RECEIVED_DIR = "received_files"
+FILE_LAPS = 3  # Times the chunk carousel goes round, so the receiver can fill in missed chunks
+FOUNTAIN_SYMBOLS_PER_BLOCK = 2.0  # Fountain mode: rebuilds the file even if about 40% of the symbols are lost
+# Symbol time limits in ms. A 30 fps camera needs about 50 ms per symbol; only
+# Rows mode goes faster, and it always sends one symbol per display refresh
+MIN_SPEED_MS = 50
+MAX_SPEED_MS = 1000
@@ -1,38 +1,126 @@
 import struct
+import numpy as np
+from collections import deque
+from line_codes import get_line_code, line_code_by_id
+from framing import FRAME_MAGIC, HEADER_SIZE, is_frame
+from fec import FEC_HEADER_SIZE, read_header, air_size, open_frame, unwrap_frame
+
+# Manchester symbol pair for each data bit (0 -> 10, 1 -> 01)
+MANCHESTER_PAIRS = np.array([[1, 0], [0, 1]], dtype=np.uint8)
+
+# Manchester symbols for every possible byte value (256 x 16 lookup table)
+MANCHESTER_BYTE_TABLE = MANCHESTER_PAIRS[
+    np.unpackbits(np.arange(256, dtype=np.uint8)[:, np.newaxis], axis=1)
+].reshape(256, 16)
+
+# Start of a block-coded frame: runs of 7 never occur in any line code's data
+BLOCK_SYNC = "11111110000000"
+CODE_ID_BITS = 4      # Line code id, Manchester coded so it reads without knowing the code
+LENGTH_BYTES = 2      # Payload length, sent in the frame's own line code
+
+def string_to_bits(bit_string):
+    """Convert a '0'/'1' string to a uint8 bit array (other characters become 2)"""
+    codes = np.frombuffer(bit_string.encode('ascii', 'replace'), dtype=np.uint8)
+    bits = codes - ord('0')
+    bits[bits > 1] = 2
+    return bits
+
+def bits_to_string(bits):
+    """Convert a uint8 bit array to a '0'/'1' string"""
+    return (np.asarray(bits, dtype=np.uint8) + ord('0')).tobytes().decode('ascii')
+
+def bytes_to_bits(data):
+    """Unpack bytes into a uint8 bit array (MSB first)"""
+    return np.unpackbits(np.frombuffer(bytes(data), dtype=np.uint8))
+
+def bits_to_bytes(bits):
+    """Pack a uint8 bit array (MSB first) into bytes"""
+    if len(bits) % 8 != 0:
+        raise ValueError("Binary data length must be multiple of 8")
+    return np.packbits(bits).tobytes()
+
+def manchester_encode_bytes(data):
+    """Manchester encode bytes straight into a uint8 symbol array"""
+    return MANCHESTER_BYTE_TABLE[np.frombuffer(bytes(data), dtype=np.uint8)].reshape(-1)
+
+def manchester_encode_bits(bits):
+    """Manchester encode a uint8 bit array: 0 -> 10, 1 -> 01"""
+    return MANCHESTER_PAIRS[np.asarray(bits, dtype=np.uint8)].reshape(-1)
+
+def manchester_decode_bits(symbols, source=None):
+    """Decode a uint8 Manchester symbol array: 10 -> 0, 01 -> 1 (errors quote source, if given)"""
+    symbols = np.asarray(symbols, dtype=np.uint8)
+    if len(symbols) % 2 != 0:
+        raise ValueError("Manchester data length must be even")
+    
+    pairs = symbols.reshape(-1, 2)
+    invalid = (pairs[:, 0] == pairs[:, 1]) | (pairs > 1).any(axis=1)
+    if invalid.any():
+        index = int(np.argmax(invalid))
+        pair = bits_to_string(pairs[index]) if source is None else source[2 * index:2 * index + 2]
+        raise ValueError(f"Invalid Manchester pair: {pair}")
+    
+    return pairs[:, 1].copy()
 
 class ManchesterEncoder:
     def __init__(self):
         self.start_sync = "11110000"  # Start synchronization pattern
         self.end_sync = "00001111"    # End synchronization pattern
+        self._start_bits = string_to_bits(self.start_sync)
+        self._end_bits = string_to_bits(self.end_sync)
     
     def encode_message(self, message):
         """Encode message with Manchester encoding"""
-        # Convert message to binary (UTF-8)
-        message_bytes = message.encode('utf-8')
-        binary_data = ''.join(format(byte, '08b') for byte in message_bytes)
+        # Convert message to binary (UTF-8) and apply Manchester encoding
+        encoded_bits = self.encode_bytes(message.encode('utf-8'))
         
-        # Apply Manchester encoding (0 -> 10, 1 -> 01)
-        manchester_data = self.manchester_encode(binary_data)
+        return bits_to_string(encoded_bits)
+    
+    def encode_bytes(self, data):
+        """Encode raw bytes into a framed uint8 symbol array"""
+        manchester_data = manchester_encode_bytes(data)
         
         # Add sync patterns
-        encoded_message = self.start_sync + manchester_data + self.end_sync
-        
-        return encoded_message
+        return np.concatenate((self._start_bits, manchester_data, self._end_bits))
     
     def manchester_encode(self, binary_string):
         """Apply Manchester encoding: 0 -> 10, 1 -> 01"""
-        encoded = ""
-        for bit in binary_string:
-            if bit == '0':
-                encoded += "10"
-            elif bit == '1':
-                encoded += "01"
-        return encoded
+        bits = string_to_bits(binary_string)
+        return bits_to_string(manchester_encode_bits(bits[bits < 2]))
+
+class BlockCodeEncoder:
+    """Frame messages in a denser block line code, announced in the frame header"""
+    def __init__(self, line_code):
+        self.line_code = line_code
+        self._sync_bits = string_to_bits(BLOCK_SYNC)
+    
+    def encode_message(self, message):
+        """Encode message as a block-coded frame"""
+        return bits_to_string(self.encode_bytes(message.encode('utf-8')))
+    
+    def encode_bytes(self, data):
+        """Encode raw bytes into a framed uint8 symbol array"""
+        code_id = (self.line_code.code_id >> np.arange(CODE_ID_BITS - 1, -1, -1)) & 1
+        header = np.concatenate((self._sync_bits, manchester_encode_bits(code_id)))
+        body = self.line_code.encode(len(data).to_bytes(LENGTH_BYTES, 'big') + bytes(data),
+                                     previous=int(header[-1]))
+        # The closing symbol gives the last data symbol an edge to end on
+        return np.concatenate((header, body, [1 - body[-1]])).astype(np.uint8)
+
+def make_encoder(line_code='manchester'):
+    """Frame encoder for a line code name, Manchester by default"""
+    if line_code.lower() == 'manchester':
+        return ManchesterEncoder()
+    return BlockCodeEncoder(get_line_code(line_code))
 
 class ManchesterDecoder:
     def __init__(self):
         self.start_sync = "11110000"
         self.end_sync = "00001111"
+        self._start_bytes = string_to_bits(self.start_sync).tobytes()
+        self._end_bytes = string_to_bits(self.end_sync).tobytes()
+        self._magic_symbols = MANCHESTER_BYTE_TABLE[FRAME_MAGIC]
+        self._magic_string = bits_to_string(self._magic_symbols)
     
     def decode_message(self, bit_string):
         """Decode Manchester encoded message"""
@@ -41,8 +129,16 @@ class ManchesterDecoder:
         if start_pos == -1:
             raise ValueError("Start sync pattern not found")
         
-        # Look for end sync after start
+        # Framed messages say how long they are, no end sync to search for
         search_start = start_pos + len(self.start_sync)
+        if bit_string.startswith(self._magic_string, search_start):
+            payload = self._decode_frame(string_to_bits(bit_string[search_start:]))
+            try:
+                return payload.decode('utf-8')
+            except UnicodeDecodeError:
+                raise ValueError("Invalid UTF-8 data")
+        
+        # Look for end sync after start
         end_pos = bit_string.find(self.end_sync, search_start)
         if end_pos == -1:
             raise ValueError("End sync pattern not found")
@@ -50,44 +146,313 @@ class ManchesterDecoder:
         # Extract Manchester encoded data
         manchester_data = bit_string[search_start:end_pos]
         
-        # Decode Manchester encoding
-        binary_data = self.manchester_decode(manchester_data)
+        # Decode Manchester encoding and convert binary to message
+        return self._bits_to_message(manchester_decode_bits(string_to_bits(manchester_data),
+                                                            manchester_data))
+    
+    def decode_bytes(self, symbols):
+        """Decode a uint8 symbol array into the raw bytes between the syncs, or a frame's payload"""
+        raw = np.asarray(symbols, dtype=np.uint8).tobytes()
         
-        # Convert binary to message
-        message = self.binary_to_message(binary_data)
+        start_pos = raw.find(self._start_bytes)
+        if start_pos == -1:
+            raise ValueError("Start sync pattern not found")
+        
+        search_start = start_pos + len(self._start_bytes)
+        if raw.startswith(self._magic_symbols.tobytes(), search_start):
+            return self._decode_frame(np.frombuffer(raw, dtype=np.uint8)[search_start:])
+        end_pos = raw.find(self._end_bytes, search_start)
+        if end_pos == -1:
+            raise ValueError("End sync pattern not found")
         
-        return message
+        manchester_data = np.frombuffer(raw, dtype=np.uint8)[search_start:end_pos]
+        return bits_to_bytes(manchester_decode_bits(manchester_data))
     
     def manchester_decode(self, manchester_string):
         """Decode Manchester encoding: 10 -> 0, 01 -> 1"""
-        if len(manchester_string) % 2 != 0:
-            raise ValueError("Manchester data length must be even")
-        
-        decoded = ""
-        for i in range(0, len(manchester_string), 2):
-            pair = manchester_string[i:i+2]
-            if pair == "10":
-                decoded += "0"
-            elif pair == "01":
-                decoded += "1"
-            else:
-                raise ValueError(f"Invalid Manchester pair: {pair}")
-        
-        return decoded
+        return bits_to_string(manchester_decode_bits(string_to_bits(manchester_string),
+                                                     manchester_string))
     
     def binary_to_message(self, binary_string):
         """Convert binary string to UTF-8 message"""
         if len(binary_string) % 8 != 0:
             raise ValueError("Binary data length must be multiple of 8")
         
-        message_bytes = []
-        for i in range(0, len(binary_string), 8):
-            byte_str = binary_string[i:i+8]
-            byte_val = int(byte_str, 2)
-            message_bytes.append(byte_val)
+        bits = string_to_bits(binary_string)
+        if (bits > 1).any():
+            raise ValueError("Invalid binary data")
         
+        return self._bits_to_message(bits)
+    
+    def _decode_frame(self, symbols):
+        """Payload of the frame the symbols start with, ValueError if it is corrupt"""
+        # Every frame, even an empty one without FEC, is at least this long
+        header = bits_to_bytes(manchester_decode_bits(symbols[:16 * FEC_HEADER_SIZE]))
+        flags, _, length, _ = read_header(header)
+        needed = 16 * air_size(flags, length)
+        if len(symbols) < needed:
+            raise ValueError("Frame is truncated")
+        return open_frame(bits_to_bytes(manchester_decode_bits(symbols[:needed])))[0]
+    
+    def _bits_to_message(self, bits):
+        """Pack a bit array and decode it as UTF-8"""
         try:
-            message = bytes(message_bytes).decode('utf-8')
-            return message
+            return bits_to_bytes(bits).decode('utf-8')
         except UnicodeDecodeError:
             raise ValueError("Invalid UTF-8 data")
+
+class StreamingDecoder:
+    """Incremental decoder fed one received bit at a time
+    
+    Manchester frames and block-coded frames are told apart by their sync
+    pattern, so the sender can pick a line code without telling the receiver.
+    Payloads wrapped by framing.build_frame are checked against their CRCs,
+    repaired by their Reed-Solomon parity if they carry any and, in
+    Manchester, end after their stated length.
+    """
+    def __init__(self, max_message_bytes=1250, framing=True, lenient=False):
+        self.start_sync = "11110000"
+        self.end_sync = "00001111"
+        self.max_message_bytes = max_message_bytes  # Abort runaway frames
+        self.framing = framing                      # Unwrap framed payloads, off for lane stripes
+        self.lenient = lenient                      # Guess damaged pairs even outside frames
+        self.sequence = None                        # Sequence number of the last good frame
+        self.rejected_frames = 0                    # Frames dropped for a bad header or CRC
+        self.syncs = 0                              # Frame starts seen, delivered or not
+        self.corrected = 0                          # Byte errors FEC repaired in the last good frame
+        self.guessed = 0                            # Damaged symbols guessed in the last frame
+        self.soft_decided = 0                       # Damaged pairs settled by their soft values in the last frame
+        
+        self._start_word = int(self.start_sync, 2)
+        self._end_word = int(self.end_sync, 2)
+        self._sync_mask = (1 << len(self.start_sync)) - 1
+        self._sync_length = len(self.start_sync)
+        self._block_word = int(BLOCK_SYNC, 2)
+        self._block_mask = (1 << len(BLOCK_SYNC)) - 1
+        self._window = 0
+        self._soft_window = deque(maxlen=self._sync_length)  # Soft values riding along the sync window
+        self.line_code = None  # Block code of the current frame, None for Manchester
+        self.reset()
+    
+    def reset(self):
+        """Drop any partially received frame and go back to hunting for sync"""
+        self.in_frame = False
+        self.line_code = None
+        self._block_symbols = None
+        self._frame_bits = 0
+        self._frame_size = None  # Bytes of a framed payload's frame, known once its header is in
+        self._guessed = 0
+        self._soft_decided = 0
+        self._half_symbol = None
+        self._half_soft = None
+        self._current_byte = 0
+        self._byte_bits = 0
+        self._payload = bytearray()
+    
+    def feed(self, bit):
+        """Feed one bit, return the decoded message once a frame completes"""
+        payload = self.feed_bit(bit)
+        if payload is None:
+            return None
+        
+        try:
+            return payload.decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+    
+    def feed_bit(self, bit, soft=None):
+        """Feed one bit, return the raw payload bytes once a frame completes
+        
+        soft is the symbol's matched filter output, positive for on (see
+        utils.SymbolIntegrator). With it a damaged Manchester pair (00 or
+        11) is settled by which half was brighter instead of ending the frame.
+        """
+        bit = 1 if bit == 1 or bit == '1' else 0
+        
+        # The sync window doubles as an 8-bit delay line: a bit is only
+        # committed as data once it can no longer be part of the end sync
+        outgoing = (self._window >> (self._sync_length - 1)) & 1
+        self._window = ((self._window << 1) | bit) & self._block_mask
+        outgoing_soft = self._soft_window[0] if len(self._soft_window) == self._sync_length else None
+        self._soft_window.append(soft)
+        
+        # Runs of seven occur in no line code, so a block sync always
+        # (re)starts a frame
+        if self._window == self._block_word:
+            # Its middle already counted as a Manchester start a few symbols ago
+            if not (self.in_frame and self._block_symbols is None and self._frame_bits < self._sync_length):
+                self.syncs += 1
+            self.reset()
+            self.in_frame = True
+            self._block_symbols = []
+            return None
+        
+        if self._block_symbols is not None:
+            return self._feed_block(bit)
+        
+        # "1111" never occurs in valid Manchester data, so a start sync
+        # always (re)starts a frame. The middle of a block sync looks like one
+        # too, but the block sync completes a few symbols later and takes over.
+        if self._window & self._sync_mask == self._start_word:
+            self.syncs += 1
+            self.reset()
+            self.in_frame = True
+            return None
+        
+        if not self.in_frame:
+            return None
+        
+        self._frame_bits += 1
+        if self._frame_bits > self._sync_length and not self._commit(outgoing, outgoing_soft):
+            self.reset()
+            return None
+        
+        if self._frame_size is not None:
+            if len(self._payload) < self._frame_size:
+                return None
+            data, guessed, soft_decided = bytes(self._payload), self._guessed, self._soft_decided
+            self.reset()
+            return self._unwrap(data, guessed, soft_decided)
+        
+        if self._frame_bits >= self._sync_length and self._window & self._sync_mask == self._end_word:
+            return self._finish_frame()
+        
+        return None
+    
+    def feed_bits(self, bits):
+        """Feed a sequence of bits, return every message decoded along the way"""
+        messages = []
+        for bit in bits:
+            message = self.feed(bit)
+            if message is not None:
+                messages.append(message)
+        return messages
+    
+    def _commit(self, symbol, soft=None):
+        """Add one Manchester symbol to the frame, return False on invalid data"""
+        if self._half_symbol is None:
+            self._half_symbol = symbol
+            self._half_soft = soft
+            return True
+        
+        if self._half_symbol == symbol and soft is not None and self._half_soft is not None and soft != self._half_soft:
+            # Invalid pair, but every pair holds one on and one off half:
+            # the likelier of 10 and 01 has its on half where the symbol
+            # integrated brighter. Once the sync has fixed where pairs start
+            # they are independent, so this is the Viterbi path as well.
+            symbol = 1 if soft > self._half_soft else 0
+            self._soft_decided += 1
+        elif self._half_symbol == symbol:
+            # Invalid Manchester pair (00 or 11). A frame's CRC (and FEC, if
+            # it carries any) judges the whole payload later, so guess the bit
+            # rather than throw the frame away.
+            if not (self.lenient or (self.framing and is_frame(self._payload))):
+                return False
+            self._guessed += 1
+        
+        # 10 -> 0, 01 -> 1: the data bit equals the second symbol
+        self._half_symbol = None
+        self._current_byte = (self._current_byte << 1) | symbol
+        self._byte_bits += 1
+        
+        if self._byte_bits == 8:
+            self._payload.append(self._current_byte)
+            self._current_byte = 0
+            self._byte_bits = 0
+            if len(self._payload) > self.max_message_bytes and self._frame_size is None:
+                return False
+            if self.framing and self._frame_size is None and len(self._payload) in (HEADER_SIZE, FEC_HEADER_SIZE):
+                return self._read_header()
+        
+        return True
+    
+    def _read_header(self):
+        """Check a frame header as soon as it is in, return False if it is corrupt"""
+        try:
+            flags, _, length, _ = read_header(self._payload)
+        except ValueError:
+            # Wait for the header parity before giving up on a damaged
+            # header, and leave data that never looked like a frame alone
+            if len(self._payload) < FEC_HEADER_SIZE or not is_frame(self._payload):
+                return True
+            self.rejected_frames += 1
+            return False
+        if length > self.max_message_bytes:
+            return False
+        self._frame_size = air_size(flags, length)
+        return True
+    
+    def _feed_block(self, symbol):
+        """Add one symbol to a block-coded frame, return its payload once complete"""
+        self._block_symbols.append(symbol)
+        
+        # The Manchester coded id says which code the rest of the frame uses
+        if self.line_code is None:
+            if len(self._block_symbols) < 2 * CODE_ID_BITS:
+                return None
+            try:
+                id_bits = manchester_decode_bits(self._block_symbols)
+            except ValueError:
+                self.reset()
+                return None
+            self.line_code = line_code_by_id(int(id_bits @ (1 << np.arange(CODE_ID_BITS - 1, -1, -1))))
+            if self.line_code is None:
+                self.reset()
+                return None
+            self._block_previous = symbol  # Where NRZI codes start from
+            self._block_symbols = []
+            self._block_needed = LENGTH_BYTES * self.line_code.symbols_per_byte
+            self._block_length = None
+            return None
+        
+        if len(self._block_symbols) < self._block_needed:
+            return None
+        guessed = 0
+        try:
+            data = self.line_code.decode(self._block_symbols, previous=self._block_previous)
+        except ValueError:
+            if self._block_length is None or not self.framing:
+                self.reset()  # Invalid code group
+                return None
+            # Damaged groups in the payload: a frame's CRC and FEC may still sort them out
+            data = self.line_code.decode(self._block_symbols, previous=self._block_previous, strict=False)
+            guessed = 1
+        
+        if self._block_length is None:
+            # Length header: wait for that many payload bytes
+            self._block_length = int.from_bytes(data, 'big')
+            if self._block_length > self.max_message_bytes:
+                self.reset()
+                return None
+            self._block_needed += self._block_length * self.line_code.symbols_per_byte
+            if self._block_length:
+                return None
+        
+        self.reset()
+        return self._unwrap(data[LENGTH_BYTES:], guessed)
+    
+    def _unwrap(self, data, guessed=0, soft_decided=0):
+        """Payload of framed data once it is repaired and its CRCs check out, other data as it is"""
+        self.guessed = guessed
+        self.soft_decided = soft_decided
+        if not self.framing:
+            return data
+        try:
+            payload, sequence, corrected = unwrap_frame(data)
+        except ValueError:
+            self.rejected_frames += 1
+            return None
+        if sequence is None and guessed:
+            return None  # Nothing can vouch for guessed symbols outside a frame
+        if sequence is not None:
+            self.sequence = sequence
+        self.corrected = corrected
+        return payload
+    
+    def _finish_frame(self):
+        """Close the current frame, return its payload if it is complete"""
+        complete = self._half_symbol is None and self._byte_bits == 0
+        payload, guessed, soft_decided = bytes(self._payload), self._guessed, self._soft_decided
+        self.reset()
+        
+        return self._unwrap(payload, guessed, soft_decided) if complete else None
@@ -0,0 +1,269 @@
+import numpy as np
+from framing import HEADER_SIZE, CRC_SIZE, FLAG_FEC_MASK, is_frame, parse_header, parse_frame, frame_size
+
+HEADER_PARITY = 4  # The header is its own codeword and always corrects 2 byte errors
+FEC_HEADER_SIZE = HEADER_SIZE + HEADER_PARITY
+MAX_FEC_LEVEL = FLAG_FEC_MASK
+CODEWORD_SIZE = 255  # Longest Reed-Solomon codeword over GF(256)
+
+# GF(256) arithmetic with the 0x11d polynomial, generator 2. The exponent
+# table is doubled so products of two logs never need a modulo.
+GF_EXP = np.zeros(512, dtype=np.int64)
+GF_LOG = np.zeros(256, dtype=np.int64)
+_value = 1
+for _power in range(255):
+    GF_EXP[_power] = _value
+    GF_LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11d
+GF_EXP[255:] = GF_EXP[:257]
+_EXP = GF_EXP.tolist()  # Plain lists are faster than NumPy for scalar lookups
+_LOG = GF_LOG.tolist()
+
+def _mul(a, b):
+    """Product of two field elements"""
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
+
+def _div(a, b):
+    """Quotient of two field elements"""
+    if b == 0:
+        raise ZeroDivisionError("Division by zero in GF(256)")
+    if a == 0:
+        return 0
+    return _EXP[(_LOG[a] + 255 - _LOG[b]) % 255]
+
+def _pow(a, power):
+    """Field element raised to an integer power (negative powers invert)"""
+    return _EXP[(_LOG[a] * power) % 255]
+
+def _poly_scale(poly, factor):
+    """Polynomial times a field element"""
+    return [_mul(coef, factor) for coef in poly]
+
+def _poly_add(p, q):
+    """Sum of two polynomials, highest degree first"""
+    result = [0] * max(len(p), len(q))
+    for index, coef in enumerate(p):
+        result[index + len(result) - len(p)] = coef
+    for index, coef in enumerate(q):
+        result[index + len(result) - len(q)] ^= coef
+    return result
+
+def _poly_mul(p, q):
+    """Product of two polynomials"""
+    result = [0] * (len(p) + len(q) - 1)
+    for j, q_coef in enumerate(q):
+        for i, p_coef in enumerate(p):
+            result[i + j] ^= _mul(p_coef, q_coef)
+    return result
+
+def _poly_eval(poly, x):
+    """Value of a polynomial at x (Horner's scheme)"""
+    value = poly[0]
+    for coef in poly[1:]:
+        value = _mul(value, x) ^ coef
+    return value
+
+def fec_parity(level):
+    """Parity bytes per codeword for a redundancy level, each pair corrects one byte error"""
+    if not 0 <= level <= MAX_FEC_LEVEL:
+        raise ValueError(f"FEC level must be between 0 and {MAX_FEC_LEVEL}")
+    return 4 * level
+
+class ReedSolomonCodec:
+    """Systematic Reed-Solomon code over GF(256) with a fixed number of parity bytes"""
+    def __init__(self, parity):
+        if not 0 < parity < CODEWORD_SIZE:
+            raise ValueError("Parity must leave room for data in a 255 byte codeword")
+        self.parity = parity
+        self.generator = [1]
+        for power in range(parity):
+            self.generator = _poly_mul(self.generator, [1, _EXP[power]])
+        self._roots = GF_LOG[GF_EXP[:parity]]  # Logs of the generator roots
+    
+    def encode(self, data):
+        """Data followed by its parity bytes"""
+        data = bytes(data)
+        if len(data) + self.parity > CODEWORD_SIZE:
+            raise ValueError("Codeword longer than 255 bytes")
+        
+        # Remainder of data * x^parity divided by the generator
+        remainder = list(data) + [0] * self.parity
+        for index in range(len(data)):
+            coef = remainder[index]
+            if coef:
+                for offset in range(1, len(self.generator)):
+                    remainder[index + offset] ^= _mul(self.generator[offset], coef)
+        return data + bytes(remainder[len(data):])
+    
+    def syndromes(self, codeword):
+        """Codeword evaluated at every generator root, all zero when it is intact"""
+        codeword = np.frombuffer(bytes(codeword), dtype=np.uint8)
+        powers = np.arange(len(codeword) - 1, -1, -1)
+        nonzero = codeword != 0
+        logs = GF_LOG[codeword[nonzero]]
+        terms = GF_EXP[(logs[np.newaxis, :] + self._roots[:, np.newaxis] * powers[nonzero]) % 255]
+        return np.bitwise_xor.reduce(terms, axis=1) if terms.shape[1] else np.zeros(self.parity, dtype=np.int64)
+    
+    def decode(self, codeword):
+        """(data, corrected byte errors) of a received codeword, ValueError if beyond repair"""
+        codeword = bytes(codeword)
+        if len(codeword) <= self.parity:
+            raise ValueError("Codeword too short")
+        syndromes = self.syndromes(codeword)
+        if not syndromes.any():
+            return codeword[:-self.parity], 0  # The common case: nothing to fix
+        
+        syndromes = [0] + syndromes.tolist()  # Shifted so index k holds S(k - 1)
+        locator = self._error_locator(syndromes)
+        positions = self._error_positions(locator[::-1], len(codeword))
+        repaired = self._correct(list(codeword), syndromes, positions)
+        if self.syndromes(repaired).any():
+            raise ValueError("Too many errors to correct")
+        return bytes(repaired[:-self.parity]), len(positions)
+    
+    def _error_locator(self, syndromes):
+        """Error locator polynomial (Berlekamp-Massey)"""
+        locator = [1]
+        previous = [1]
+        for index in range(self.parity):
+            k = index + 1
+            delta = syndromes[k]
+            for j in range(1, len(locator)):
+                delta ^= _mul(locator[-(j + 1)], syndromes[k - j])
+            previous = previous + [0]
+            if delta:
+                if len(previous) > len(locator):
+                    scaled = _poly_scale(previous, delta)
+                    previous = _poly_scale(locator, _div(1, delta))
+                    locator = scaled
+                locator = _poly_add(locator, _poly_scale(previous, delta))
+        
+        while locator and locator[0] == 0:
+            locator = locator[1:]
+        if 2 * (len(locator) - 1) > self.parity:
+            raise ValueError("Too many errors to correct")
+        return locator
+    
+    def _error_positions(self, locator, length):
+        """Byte positions whose locator root is in the codeword (Chien search)"""
+        positions = [length - 1 - index for index in range(length)
+                     if _poly_eval(locator, _pow(2, index)) == 0]
+        if len(positions) != len(locator) - 1:
+            raise ValueError("Could not locate the errors")
+        return positions
+    
+    def _correct(self, codeword, syndromes, positions):
+        """Codeword with the error magnitudes at the given positions removed (Forney)"""
+        coef_positions = [len(codeword) - 1 - position for position in positions]
+        locator = [1]
+        for coef_position in coef_positions:
+            locator = _poly_mul(locator, _poly_add([1], [_pow(2, coef_position), 0]))
+        
+        # Error evaluator: syndromes times locator, modulo x^(errors + 1)
+        product = _poly_mul(syndromes[::-1], locator)
+        evaluator = product[len(product) - len(locator):][::-1]
+        
+        roots = [_pow(2, coef_position - 255) for coef_position in coef_positions]
+        for index, root in enumerate(roots):
+            root_inverse = _div(1, root)
+            derivative = 1
+            for other_index, other in enumerate(roots):
+                if other_index != index:
+                    derivative = _mul(derivative, 1 ^ _mul(root_inverse, other))
+            if derivative == 0:
+                raise ValueError("Could not correct the errors")
+            magnitude = _mul(root, _poly_eval(evaluator[::-1], root_inverse))
+            codeword[positions[index]] ^= _div(magnitude, derivative)
+        return codeword
+
+def _body_layout(length, level):
+    """(codewords, data bytes per codeword, parity per codeword) of a frame body"""
+    parity = fec_parity(level)
+    body = length + CRC_SIZE
+    codewords = -(-body // (CODEWORD_SIZE - parity))
+    return codewords, -(-body // codewords), parity
+
+def air_size(flags, length):
+    """Bytes a frame occupies on the link, with or without FEC"""
+    level = flags & FLAG_FEC_MASK
+    if not level:
+        return frame_size(length)
+    codewords, data_size, parity = _body_layout(length, level)
+    return FEC_HEADER_SIZE + codewords * (data_size + parity)
+
+def protect_frame(frame):
+    """Add the Reed-Solomon parity asked for by the frame's flags
+    
+    Every codeword of the body is interleaved byte by byte with the others,
+    so a burst of errors is shared out between them.
+    """
+    flags, _, length = parse_header(frame)
+    level = flags & FLAG_FEC_MASK
+    if not level:
+        return bytes(frame)
+    
+    codewords, data_size, parity = _body_layout(length, level)
+    body = bytes(frame[HEADER_SIZE:]).ljust(codewords * data_size, b'\0')
+    codec = ReedSolomonCodec(parity)
+    blocks = np.array([list(codec.encode(body[index * data_size:(index + 1) * data_size]))
+                       for index in range(codewords)], dtype=np.uint8)
+    header = ReedSolomonCodec(HEADER_PARITY).encode(frame[:HEADER_SIZE])
+    return header + blocks.T.tobytes()
+
+def _repair_header(data):
+    """(header bytes, corrected) of the header a frame starts with"""
+    try:
+        parse_header(data)
+        return bytes(data[:HEADER_SIZE]), 0
+    except ValueError:
+        if len(data) < FEC_HEADER_SIZE:
+            raise
+    # A damaged header may still be repaired if the frame carries FEC
+    header, corrected = ReedSolomonCodec(HEADER_PARITY).decode(bytes(data[:FEC_HEADER_SIZE]))
+    if not parse_header(header)[0] & FLAG_FEC_MASK:
+        raise ValueError("Frame header CRC mismatch")
+    return header, corrected
+
+def read_header(data):
+    """(flags, sequence, length, corrected) of the header a frame starts with"""
+    header, corrected = _repair_header(data)
+    return parse_header(header) + (corrected,)
+
+def open_frame(data):
+    """(payload, sequence, corrected byte errors) of a received frame, ValueError if it is corrupt"""
+    header, corrected = _repair_header(data)
+    flags, _, length = parse_header(header)
+    level = flags & FLAG_FEC_MASK
+    if not level:
+        payload, sequence, _ = parse_frame(data)
+        return payload, sequence, 0
+    size = air_size(flags, length)
+    if len(data) < size:
+        raise ValueError("Frame is truncated")
+    
+    codewords, data_size, parity = _body_layout(length, level)
+    blocks = np.frombuffer(bytes(data[FEC_HEADER_SIZE:size]), dtype=np.uint8)
+    blocks = blocks.reshape(data_size + parity, codewords).T
+    
+    codec = ReedSolomonCodec(parity)
+    body = bytearray()
+    for block in blocks:
+        block_data, block_corrected = codec.decode(block.tobytes())
+        body += block_data
+        corrected += block_corrected
+    payload, sequence, _ = parse_frame(header + bytes(body))
+    return payload, sequence, corrected
+
+def unwrap_frame(data):
+    """(payload, sequence, corrected) for framed data, (data, None, 0) for plain payloads"""
+    try:
+        read_header(data)
+    except ValueError:
+        if is_frame(data):
+            raise  # Starts like a frame, so a corrupt one rather than plain text
+        return bytes(data), None, 0
+    return open_frame(data)
@@ -0,0 +1,245 @@
+import bisect
+import math
+import os
+import struct
+from collections import defaultdict
+from chunking import ChunkAssembler, pack_transfer, is_chunk, DEFAULT_CHUNK_SIZE, MAX_CHUNKS
+
+# Fountain symbol layout, one per frame: magic, transfer id, source block count,
+# transfer length, symbol seed, then the XOR of the blocks the seed picks.
+# 0xFD never occurs in UTF-8 either.
+SYMBOL_MAGIC = 0xFD
+SYMBOL_FORMAT = '>BHHII'
+SYMBOL_HEADER_SIZE = struct.calcsize(SYMBOL_FORMAT)
+SOLITON_C = 0.1      # Robust soliton tuning: expected ripple size ...
+SOLITON_DELTA = 0.5  # ... and the bound on the decoder getting stuck
+
+def _random_words(seed):
+    """Endless 32-bit pseudo-random words for a seed (xorshift32, identical on every platform)"""
+    state = (seed * 0x9E3779B1 + 0x7F4A7C15) & 0xFFFFFFFF or 1
+    while True:
+        state ^= (state << 13) & 0xFFFFFFFF
+        state ^= state >> 17
+        state ^= (state << 5) & 0xFFFFFFFF
+        yield state
+
+def robust_soliton(k, c=SOLITON_C, delta=SOLITON_DELTA):
+    """Cumulative robust soliton distribution over degrees 1..k"""
+    # Ideal soliton, plus extra low degrees to keep the ripple going and a
+    # spike at k / ripple so every block ends up covered
+    ripple = c * math.log(k / delta) * math.sqrt(k)
+    spike = min(k, max(1, int(round(k / ripple))))
+    weights = [1.0 / k] + [1.0 / (degree * (degree - 1)) for degree in range(2, k + 1)]
+    for degree in range(1, spike):
+        weights[degree - 1] += ripple / (degree * k)
+    weights[spike - 1] += max(0.0, ripple * math.log(ripple / delta) / k)
+    total = sum(weights)
+    cumulative, running = [], 0.0
+    for weight in weights:
+        running += weight / total
+        cumulative.append(running)
+    cumulative[-1] = 1.0
+    return cumulative
+
+def symbol_blocks(seed, k, distribution):
+    """Source blocks a symbol seed XORs together, the same on sender and receiver"""
+    words = _random_words(seed)
+    degree = min(k, bisect.bisect_left(distribution, next(words) / 0x100000000) + 1)
+    blocks = set()
+    while len(blocks) < degree:
+        blocks.add(next(words) % k)
+    return blocks
+
+def _block_shape(length, block_size):
+    """Source block count for a transfer length"""
+    k = -(-length // block_size)
+    if k > MAX_CHUNKS:
+        raise ValueError(f"Transfer too large: {k} blocks of {block_size} bytes")
+    return k
+
+class FountainEncoder:
+    """Rateless LT encoder: any seed gives a fresh symbol, the receiver needs about K(1+e) of them"""
+    def __init__(self, data, name='', block_size=DEFAULT_CHUNK_SIZE, transfer_id=None):
+        blob = pack_transfer(data, name)
+        self.length = len(blob)
+        self.block_size = block_size
+        self.k = _block_shape(self.length, block_size)
+        if transfer_id is None:
+            transfer_id = int.from_bytes(os.urandom(2), 'big')
+        self.transfer_id = transfer_id
+        self.distribution = robust_soliton(self.k)
+        # Blocks as integers, XOR of whole blocks is then a single operation
+        blob = blob.ljust(self.k * block_size, b'\0')
+        self._blocks = [int.from_bytes(blob[index * block_size:(index + 1) * block_size], 'big')
+                        for index in range(self.k)]
+    
+    def symbol(self, seed):
+        """Payload of the symbol with the given seed"""
+        value = 0
+        for index in symbol_blocks(seed, self.k, self.distribution):
+            value ^= self._blocks[index]
+        header = struct.pack(SYMBOL_FORMAT, SYMBOL_MAGIC, self.transfer_id, self.k, self.length, seed)
+        return header + value.to_bytes(self.block_size, 'big')
+    
+    def symbols(self, count=None):
+        """Symbol payloads for seeds 0, 1, 2, ... (forever without a count)"""
+        seed = 0
+        while count is None or seed < count:
+            yield self.symbol(seed)
+            seed += 1
+
+def is_symbol(payload):
+    """Whether a payload starts like a fountain symbol"""
+    return len(payload) > 0 and payload[0] == SYMBOL_MAGIC
+
+def parse_symbol(payload):
+    """(transfer id, seed, (k, length), data) of a symbol payload, ValueError if it is malformed"""
+    if len(payload) <= SYMBOL_HEADER_SIZE or not is_symbol(payload):
+        raise ValueError("Not a fountain symbol")
+    _, transfer_id, k, length, seed = struct.unpack_from(SYMBOL_FORMAT, payload)
+    data = bytes(payload[SYMBOL_HEADER_SIZE:])
+    if k == 0 or _block_shape(length, len(data)) != k:
+        raise ValueError("Fountain symbol does not match its transfer")
+    return transfer_id, seed, (k, length), data
+
+class FountainTransfer:
+    """Incremental peeling decoder for one fountain transfer
+    
+    A symbol is reduced by every block already known. When one unknown
+    block is left it is solved, and that block is peeled off every symbol
+    waiting on it, which may solve more blocks in turn. Peeling alone
+    stalls often with few blocks, so once enough symbols wait, the rest is
+    solved by Gaussian elimination (as Raptor decoders do).
+    """
+    def __init__(self, k, length):
+        self.shape = (k, length)
+        self.total = k
+        self.length = length
+        self.block_size = None  # Taken from the first symbol
+        self.distribution = robust_soliton(k)
+        self.blocks = {}                 # Solved block index -> value
+        self.symbols = 0                 # Distinct symbols received
+        self.size = 0                    # Bytes held in solved blocks and waiting symbols
+        self._seeds = set()
+        self._pending = {}               # Seed -> [unknown blocks, value]
+        self._waiting = defaultdict(set)  # Block index -> seeds of pending symbols that include it
+    
+    @property
+    def received(self):
+        """Number of blocks solved"""
+        return len(self.blocks)
+    
+    @property
+    def missing(self):
+        """Number of blocks still unknown"""
+        return self.total - len(self.blocks)
+    
+    def add(self, seed, data):
+        """Take one symbol in and peel whatever it unlocks"""
+        if seed in self._seeds or not self.missing:
+            return
+        if self.block_size is None:
+            self.block_size = len(data)
+        elif len(data) != self.block_size:
+            return
+        self._seeds.add(seed)
+        self.symbols += 1
+        
+        unknown = symbol_blocks(seed, self.total, self.distribution)
+        value = int.from_bytes(data, 'big')
+        for index in unknown & self.blocks.keys():
+            value ^= self.blocks[index]
+        unknown -= self.blocks.keys()
+        
+        if len(unknown) == 1:
+            self._solve(unknown.pop(), value)
+        elif unknown:
+            self._pending[seed] = [unknown, value]
+            self.size += self.block_size
+            for index in unknown:
+                self._waiting[index].add(seed)
+        if self.missing and len(self._pending) >= self.missing:
+            self._eliminate()
+    
+    def blob(self):
+        """Decoded transfer once nothing is missing"""
+        data = b''.join(self.blocks[index].to_bytes(self.block_size, 'big') for index in range(self.total))
+        return data[:self.length]
+    
+    def _solve(self, index, value):
+        """Record a solved block and peel it off every waiting symbol"""
+        ripple = [(index, value)]
+        while ripple:
+            index, value = ripple.pop()
+            if index in self.blocks:
+                continue
+            self.blocks[index] = value
+            self.size += self.block_size
+            for seed in self._waiting.pop(index, ()):
+                entry = self._pending[seed]
+                entry[0].discard(index)
+                entry[1] ^= value
+                if len(entry[0]) == 1:
+                    del self._pending[seed]
+                    self.size -= self.block_size
+                    last = entry[0].pop()
+                    self._waiting[last].discard(seed)
+                    ripple.append((last, entry[1]))
+    
+    def _eliminate(self):
+        """Solve every remaining block from the waiting symbols if they have full rank over GF(2)"""
+        unknown = sorted(self._waiting)
+        if len(unknown) < self.missing:
+            return  # Some block is in no symbol yet
+        bits = {index: 1 << position for position, index in enumerate(unknown)}
+        
+        # Rows keyed by their lowest set bit; reducing a row by the pivot of
+        # its lowest bit only ever leaves higher bits set
+        pivots = {}
+        for blocks, value in self._pending.values():
+            mask = 0
+            for index in blocks:
+                mask |= bits[index]
+            while mask:
+                low = mask & -mask
+                if low not in pivots:
+                    pivots[low] = (mask, value)
+                    break
+                mask ^= pivots[low][0]
+                value ^= pivots[low][1]
+        if len(pivots) < len(unknown):
+            return
+        
+        # Back substitution from the highest pivot down
+        solved = {}
+        for low in sorted(pivots, reverse=True):
+            mask, value = pivots[low]
+            rest = mask ^ low
+            while rest:
+                high = rest & -rest
+                value ^= solved[high]
+                rest ^= high
+            solved[low] = value
+        for index in unknown:
+            self.blocks[index] = solved[bits[index]]
+        self._pending.clear()
+        self._waiting.clear()
+        self.size = len(self.blocks) * self.block_size
+
+class TransferAssembler(ChunkAssembler):
+    """Reassembly table for carousel chunks and fountain symbols alike"""
+    def _parse(self, payload):
+        """(transfer id, packet key, transfer shape, data) of a chunk or a symbol"""
+        if is_symbol(payload):
+            return parse_symbol(payload)
+        return super()._parse(payload)
+    
+    def _new_transfer(self, payload, shape):
+        """Peeling decoder for a fountain transfer, a plain chunk table otherwise"""
+        if is_symbol(payload):
+            return FountainTransfer(*shape)
+        return super()._new_transfer(payload, shape)
+
+def is_transfer_packet(payload):
+    """Whether a payload belongs to a file transfer of either kind"""
+    return is_chunk(payload) or is_symbol(payload)
@@ -0,0 +1,68 @@
+import binascii
+import struct
+from compression import compress_payload, decompress_payload
+
+# Frame layout: magic, version and flags, sequence, payload length, header CRC-16,
+# then the payload and its CRC-32. 0xA5 can not start UTF-8 text, so framed and
+# plain messages are told apart by their first byte.
+FRAME_MAGIC = 0xA5
+FRAME_VERSION = 1
+FLAG_FEC_MASK = 0x07  # Reed-Solomon redundancy level of the body, 0 without FEC (see fec.py)
+FLAG_COMPRESSED = 0x08  # Payload is deflated against the chat dictionary (see compression.py)
+HEADER_FORMAT = '>BBBH'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT) + 2  # Plus the header CRC-16
+CRC_SIZE = 4
+MAX_PAYLOAD = 0xFFFF
+
+def build_frame(payload, sequence=0, flags=0, compress=False):
+    """Wrap payload bytes in a frame, compressed first if asked and if that makes them shorter"""
+    payload = bytes(payload)
+    if compress:
+        packed = compress_payload(payload)
+        if len(packed) < len(payload):
+            payload, flags = packed, flags | FLAG_COMPRESSED
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload too long for one frame: {len(payload)} bytes")
+    if not 0 <= flags < 16:
+        raise ValueError("Frame flags must fit in 4 bits")
+    
+    header = struct.pack(HEADER_FORMAT, FRAME_MAGIC, (FRAME_VERSION << 4) | flags, sequence & 0xFF, len(payload))
+    header += struct.pack('>H', binascii.crc_hqx(header, 0xFFFF))
+    return header + payload + struct.pack('>I', binascii.crc32(payload))
+
+def is_frame(data):
+    """Whether bytes start like a frame"""
+    return len(data) > 0 and data[0] == FRAME_MAGIC
+
+def parse_header(header):
+    """(flags, sequence, payload length) of a frame header, ValueError if it is corrupt"""
+    header = bytes(header[:HEADER_SIZE])
+    if len(header) < HEADER_SIZE:
+        raise ValueError("Frame header is truncated")
+    
+    magic, version_flags, sequence, length = struct.unpack_from(HEADER_FORMAT, header)
+    if magic != FRAME_MAGIC:
+        raise ValueError("Not a frame")
+    if struct.unpack_from('>H', header, HEADER_SIZE - 2)[0] != binascii.crc_hqx(header[:-2], 0xFFFF):
+        raise ValueError("Frame header CRC mismatch")
+    if version_flags >> 4 != FRAME_VERSION:
+        raise ValueError(f"Unsupported frame version: {version_flags >> 4}")
+    return version_flags & 15, sequence, length
+
+def frame_size(length):
+    """Total frame bytes for a payload length"""
+    return HEADER_SIZE + length + CRC_SIZE
+
+def parse_frame(data):
+    """(payload, sequence, flags) of a frame, decompressed, ignoring any padding after it"""
+    flags, sequence, length = parse_header(data)
+    size = frame_size(length)
+    if len(data) < size:
+        raise ValueError("Frame is truncated")
+    
+    payload = bytes(data[HEADER_SIZE:HEADER_SIZE + length])
+    if struct.unpack_from('>I', data, size - CRC_SIZE)[0] != binascii.crc32(payload):
+        raise ValueError("Frame CRC mismatch")
+    if flags & FLAG_COMPRESSED:
+        payload = decompress_payload(payload)
+    return payload, sequence, flags
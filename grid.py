@@ -0,0 +1,41 @@
+from lanes import lane_symbols
+from framing import build_frame
+from fec import protect_frame
+
+def parse_grid(text):
+    """Parse ROWSxCOLS, e.g. '3x3'"""
+    rows, cols = (int(part) for part in text.lower().split('x'))
+    if rows < 1 or cols < 1:
+        raise ValueError("Grid must have at least one row and one column")
+    return rows, cols
+
+def grid_symbols(message, rows, cols, encoder=None, sequence=None, fec_level=0, compress=False):
+    """Symbols for every cell, shape (symbols, rows * cols), cells in row-major order
+    
+    With a sequence number the message is framed (compressed and FEC
+    protected if asked) before it is striped.
+    """
+    data = message.encode('utf-8') if isinstance(message, str) else bytes(message)
+    if sequence is not None:
+        data = protect_frame(build_frame(data, sequence, fec_level, compress))
+    return lane_symbols(data, rows * cols, encoder)
+
+def cell_bounds(bounds, rows, cols, fill=0.5):
+    """Bounds of the middle of each grid cell inside (x1, y1, x2, y2), row-major"""
+    x1, y1, x2, y2 = bounds
+    cell_w = (x2 - x1) / cols
+    cell_h = (y2 - y1) / rows
+    # Only the middle of a cell is read: the ROI edges are approximate and
+    # neighbouring cells blur into each other
+    pad_x = cell_w * (1 - fill) / 2
+    pad_y = cell_h * (1 - fill) / 2
+    
+    regions = []
+    for row in range(rows):
+        for col in range(cols):
+            left = x1 + col * cell_w
+            top = y1 + row * cell_h
+            regions.append((int(left + pad_x), int(top + pad_y),
+                            max(int(left + pad_x) + 1, int(left + cell_w - pad_x)),
+                            max(int(top + pad_y) + 1, int(top + cell_h - pad_y))))
+    return regions
@@ -0,0 +1,93 @@
+import numpy as np
+from encoder_decoder import ManchesterEncoder, StreamingDecoder
+from utils import AdaptiveSlicer, ClockRecovery, SymbolIntegrator
+from framing import is_frame
+
+def split_stripes(data, lanes):
+    """Deal bytes round-robin onto lanes, NUL-padded so every stripe has the same length"""
+    data = bytes(data) + b'\0' * (-len(data) % lanes)
+    return [data[index::lanes] for index in range(lanes)]
+
+def merge_stripes(stripes):
+    """Interleave stripes back into the original bytes"""
+    lanes = len(stripes)
+    data = bytearray(sum(len(stripe) for stripe in stripes))
+    for index, stripe in enumerate(stripes):
+        data[index::lanes] = stripe
+    # A frame knows its own length, and its CRC may well end in NUL bytes
+    return bytes(data) if is_frame(data) else bytes(data).rstrip(b'\0')
+
+def lane_symbols(data, lanes, encoder=None):
+    """Manchester frames for every lane, shape (symbols, lanes)"""
+    encoder = encoder or ManchesterEncoder()
+    # Equal stripe lengths give every lane the same number of symbols, so
+    # all lanes start and end their frames together
+    return np.stack([encoder.encode_bytes(stripe) for stripe in split_stripes(data, lanes)], axis=1)
+
+class LaneDecoder:
+    """Slicing, clock recovery and framing for one independently modulated lane"""
+    def __init__(self, bit_duration_ms=None, soft_decision=True):
+        self.slicer = AdaptiveSlicer()
+        self.clock_recovery = ClockRecovery(
+            nominal_period=bit_duration_ms / 1000.0 if bit_duration_ms else None
+        )
+        self.symbol_integrator = SymbolIntegrator() if soft_decision else None
+        # Stripes of a framed message are not frames themselves, the
+        # merged message is checked (and repaired) instead, so damaged
+        # symbols are guessed rather than dropping the stripe
+        self.stream_decoder = StreamingDecoder(framing=False, lenient=True)
+        self.bit = 0
+    
+    def reset(self):
+        """Forget levels, clock and any partial frame"""
+        self.slicer.reset()
+        self.clock_recovery.reset()
+        if self.symbol_integrator is not None:
+            self.symbol_integrator.clear()
+        self.stream_decoder.reset()
+        self.bit = 0
+    
+    def push(self, timestamp, brightness):
+        """Add one brightness sample, return (symbols recovered, completed stripes)"""
+        self.bit, _ = self.slicer.slice(brightness)
+        if self.symbol_integrator is not None:
+            soft = self.slicer.soft_value(brightness)
+            self.symbol_integrator.add(timestamp, soft)
+            symbols = self.symbol_integrator.decide(self.clock_recovery.push(self.bit, timestamp, soft),
+                                                    self.clock_recovery.slots)
+        else:
+            symbols = [(symbol, None) for symbol in self.clock_recovery.push(self.bit, timestamp)]
+        stripes = []
+        for symbol, soft in symbols:
+            stripe = self.stream_decoder.feed_bit(symbol, soft)
+            if stripe is not None:
+                stripes.append(stripe)
+        return len(symbols), stripes
+
+class StripeAssembler:
+    """Collect one stripe per lane and merge them into messages"""
+    def __init__(self, lanes):
+        self.lanes = lanes
+        self.incomplete = 0  # Messages abandoned because a lane missed its stripe
+        self.reset()
+    
+    def reset(self):
+        """Drop a partially collected message"""
+        self._stripes = [None] * self.lanes
+    
+    def add(self, lane, stripe):
+        """Add a lane's stripe, return the merged bytes once every lane has one"""
+        if not stripe:
+            return None  # Every real stripe holds at least one (padding) byte
+        if self._stripes[lane] is not None:
+            # This lane already finished the previous message, so some other
+            # lane lost its stripe: that message can not be completed
+            self._stripes = [None] * self.lanes
+            self.incomplete += 1
+        self._stripes[lane] = stripe
+        
+        if any(stripe is None for stripe in self._stripes):
+            return None
+        data = merge_stripes(self._stripes)
+        self._stripes = [None] * self.lanes
+        return data
@@ -0,0 +1,149 @@
+import numpy as np
+
+# 4B5B code group for every data nibble: at most three zeros in a row
+# anywhere in the coded stream, so NRZI never holds a level for more than 4 symbols
+FOUR_FIVE_GROUPS = ['11110', '01001', '10100', '10101', '01010', '01011', '01110', '01111',
+                    '10010', '10011', '10110', '10111', '11010', '11011', '11100', '11101']
+
+# 8b/10b sub-blocks for a negative running disparity, abcdei and fghj in send order.
+# The positive disparity column is the complement of every unbalanced entry
+# (plus D.07 and D.x.3, which alternate although they are balanced)
+FIVE_SIX_BLOCKS = ['100111', '011101', '101101', '110001', '110101', '101001', '011001', '111000',
+                   '111001', '100101', '010101', '110100', '001101', '101100', '011100', '010111',
+                   '011011', '100011', '010011', '110010', '001011', '101010', '011010', '111010',
+                   '110011', '100110', '010110', '110110', '001110', '101110', '011110', '101011']
+THREE_FOUR_BLOCKS = ['1011', '1001', '0101', '1100', '1101', '1010', '0110', '1110']
+ALTERNATE_SEVEN = '0111'  # D.x.A7, avoids a run of five after some 6b blocks
+
+def _pattern(text):
+    """'0'/'1' string to a uint8 symbol array"""
+    return np.array([int(char) for char in text], dtype=np.uint8)
+
+def _pack(groups):
+    """Integer value of every row of symbols, first symbol most significant"""
+    width = groups.shape[1]
+    return groups.astype(np.int64) @ (1 << np.arange(width - 1, -1, -1))
+
+def _sub_block(text, negative, alternates):
+    """Sub-block for the running disparity, and whether it flips the disparity"""
+    disparity = 2 * text.count('1') - len(text)
+    if not negative and (disparity != 0 or alternates):
+        text = ''.join('1' if char == '0' else '0' for char in text)
+    return text, disparity != 0
+
+def _eight_ten_tables():
+    """(encode table [disparity, byte] -> 10 symbols, next disparity table, decode table)"""
+    encode = np.empty((2, 256, 10), dtype=np.uint8)
+    next_disparity = np.empty((2, 256), dtype=np.uint8)
+    decode = np.full(1 << 10, -1, dtype=np.int16)
+    
+    for start in (0, 1):  # 0: negative running disparity, 1: positive
+        for byte in range(256):
+            low, high = byte & 31, byte >> 5
+            negative = start == 0
+            six, flips = _sub_block(FIVE_SIX_BLOCKS[low], negative, low == 7)
+            negative ^= flips
+            
+            alternate = high == 7 and ((negative and low in (17, 18, 20)) or
+                                       (not negative and low in (11, 13, 14)))
+            four = ALTERNATE_SEVEN if alternate else THREE_FOUR_BLOCKS[high]
+            four, flips = _sub_block(four, negative, high == 3 or alternate)
+            negative ^= flips
+            
+            encode[start, byte] = _pattern(six + four)
+            next_disparity[start, byte] = 0 if negative else 1
+            decode[int(six + four, 2)] = byte
+    return encode, next_disparity, decode
+
+class FourBFiveBCode:
+    """4B5B groups sent with NRZI (a 1 toggles the screen), 80% efficient but not DC balanced"""
+    def __init__(self):
+        self.name = '4b5b'
+        self.code_id = 1
+        self.symbols_per_byte = 10
+        self.dc_balanced = False  # The screen may stay mostly dark or bright for a while
+        self._groups = np.array([_pattern(group) for group in FOUR_FIVE_GROUPS])
+        self._nibbles = np.full(1 << 5, -1, dtype=np.int16)
+        self._nibbles[_pack(self._groups)] = np.arange(16)
+    
+    @property
+    def efficiency(self):
+        """Data bits per transmitted symbol"""
+        return 8 / self.symbols_per_byte
+    
+    def encode(self, data, previous=0):
+        """Symbols for bytes (high nibble first), continuing from the previous screen level"""
+        data = np.frombuffer(bytes(data), dtype=np.uint8)
+        nibbles = np.stack((data >> 4, data & 15), axis=1).reshape(-1)
+        groups = self._groups[nibbles].reshape(-1)
+        # NRZI: the level flips on every 1 and holds on every 0
+        return ((np.cumsum(groups) + previous) & 1).astype(np.uint8)
+    
+    def decode(self, symbols, previous=0, strict=True):
+        """Bytes of a symbol array that followed the given screen level, invalid groups read as 0 unless strict"""
+        symbols = np.asarray(symbols, dtype=np.uint8)
+        if len(symbols) % self.symbols_per_byte != 0:
+            raise ValueError("4B5B data length must be a multiple of 10 symbols")
+        
+        groups = symbols ^ np.concatenate(([previous], symbols[:-1])).astype(np.uint8)
+        nibbles = self._nibbles[_pack(groups.reshape(-1, 5))]
+        if (nibbles < 0).any():
+            if strict:
+                raise ValueError("Invalid 4B5B code group")
+            nibbles = np.maximum(nibbles, 0)
+        nibbles = nibbles.astype(np.uint8).reshape(-1, 2)
+        return ((nibbles[:, 0] << 4) | nibbles[:, 1]).astype(np.uint8).tobytes()
+
+class EightBTenBCode:
+    """8b/10b with running disparity: DC balanced, runs of at most 5, 80% efficient"""
+    def __init__(self):
+        self.name = '8b10b'
+        self.code_id = 2
+        self.symbols_per_byte = 10
+        self.dc_balanced = True  # Running disparity never strays more than one symbol
+        self._encode, self._next_disparity, self._decode = _eight_ten_tables()
+    
+    @property
+    def efficiency(self):
+        """Data bits per transmitted symbol"""
+        return 8 / self.symbols_per_byte
+    
+    def encode(self, data, previous=0):
+        """Symbols for bytes, starting from a negative running disparity"""
+        data = bytes(data)
+        symbols = np.empty((len(data), 10), dtype=np.uint8)
+        disparity = 0
+        for index, byte in enumerate(data):
+            symbols[index] = self._encode[disparity, byte]
+            disparity = self._next_disparity[disparity, byte]
+        return symbols.reshape(-1)
+    
+    def decode(self, symbols, previous=0, strict=True):
+        """Bytes of a symbol array (only code groups are checked), invalid groups read as 0 unless strict"""
+        symbols = np.asarray(symbols, dtype=np.uint8)
+        if len(symbols) % self.symbols_per_byte != 0:
+            raise ValueError("8b/10b data length must be a multiple of 10 symbols")
+        
+        data = self._decode[_pack(symbols.reshape(-1, 10))]
+        if (data < 0).any():
+            if strict:
+                raise ValueError("Invalid 8b/10b code group")
+            data = np.maximum(data, 0)
+        return data.astype(np.uint8).tobytes()
+
+# Block codes by name; Manchester is the default and keeps its own framing
+LINE_CODES = {code.name: code for code in (FourBFiveBCode(), EightBTenBCode())}
+
+def get_line_code(name):
+    """Block line code by name"""
+    try:
+        return LINE_CODES[name.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown line code: {name}")
+
+def line_code_by_id(code_id):
+    """Block line code announced in a frame header, None if unknown"""
+    for code in LINE_CODES.values():
+        if code.code_id == code_id:
+            return code
+    return None
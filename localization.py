@@ -0,0 +1,161 @@
+from collections import deque
+import numpy as np
+from utils import LUMA_WEIGHTS_BGR
+
+LUMA = (LUMA_WEIGHTS_BGR / 256.0).astype(np.float32)
+
+class TransmitterLocator:
+    """Find the flickering transmitter in the camera image and keep the ROI on it"""
+    def __init__(self, downsample=8, window=24, noise_floor=12.0, min_reversals=3, min_score=4.0, relock_ratio=1.5,
+                 smoothing=0.5, margin=0.2):
+        self.downsample = downsample      # Pixel stride of the search grid
+        self.window = window              # Frames accumulated per search
+        self.noise_floor = noise_floor    # Frame-to-frame change ignored as sensor noise
+        self.min_reversals = min_reversals  # Up/down reversals per window that make a flicker
+        self.min_score = min_score        # Weakest flicker (brightness units) worth locking
+        self.relock_ratio = relock_ratio  # How much stronger a new spot must be to move the ROI
+        self.smoothing = smoothing        # Weight of the new bounds when the ROI moves
+        self.margin = margin              # Fraction trimmed off each side of the found region
+        # Downsampled frames kept for replay after a new lock. Block line codes
+        # flicker little during their preamble and sync, so a lock can come
+        # several windows after the frame started.
+        self.history_length = 6 * window
+        self.reset()
+    
+    def reset(self):
+        """Drop the lock and the accumulated flicker map"""
+        self.roi = None
+        self.score = 0.0
+        self.relocked = False  # Set by the feed() that moved the ROI to a new spot
+        self._history = deque(maxlen=self.history_length)
+        self._previous = None
+        self._swing = None
+        self._flicker = None
+        self._reversals = None
+        self._frames = 0
+    
+    def feed(self, frame, pixel_format='bgr'):
+        """Add one frame, return the current ROI bounds (x1, y1, x2, y2) or None"""
+        # Strided copy touching only one pixel in downsample**2. BGR keeps all
+        # channels for per-channel replay, YUYV keeps just Y.
+        step = self.downsample
+        if frame.ndim == 3 and pixel_format != 'bgr':
+            raw = frame[::step, ::step, 0].copy()
+        else:
+            raw = frame[::step, ::step].copy()
+        small = raw.astype(np.float32)
+        if small.ndim == 3:
+            small = small @ LUMA
+        self._history.append(raw)
+        self.relocked = False
+        
+        if self._previous is not None and self._previous.shape == small.shape:
+            diff = small - self._previous
+            significant = np.abs(diff) > self.noise_floor
+            if self._flicker is None:
+                self._flicker = np.zeros_like(small)
+                self._reversals = np.zeros(small.shape, dtype=np.uint8)
+            
+            # A flicker keeps swinging up and down. Changes in the same
+            # direction (a slow edge spread over frames) add to the current
+            # swing; a change the other way completes it and scores its size.
+            # Motion and exposure changes move one way and hardly score.
+            turn = significant & ((diff * self._swing) < 0)
+            self._flicker += np.where(turn, np.abs(self._swing), 0.0)
+            self._reversals += turn
+            self._swing = np.where(turn, diff, np.where(significant, self._swing + diff, self._swing))
+        else:
+            self._flicker = None
+            self._reversals = None
+            self._swing = np.zeros_like(small)
+        self._previous = small
+        
+        self._frames += 1
+        if self._frames >= self.window and self._flicker is not None:
+            self._update_lock(frame.shape)
+            self._flicker = None
+            self._reversals = None
+            self._frames = 0
+        
+        return self.roi
+    
+    def history_brightness(self, bounds):
+        """Brightness of bounds in the recent downsampled frames, oldest first"""
+        # Lets the caller replay the frames that were read from the wrong
+        # spot while the lock was still being found
+        rows, cols = self._history_slices(bounds)
+        if self._history and self._history[0].ndim == 3:
+            return list(self.history_color(bounds) @ LUMA)
+        return [float(raw[rows, cols].mean()) for raw in self._history]
+    
+    def history_color(self, bounds):
+        """Per-channel brightness of bounds in the recent frames, shape (frames, channels)"""
+        rows, cols = self._history_slices(bounds)
+        return np.array([raw[rows, cols].reshape(-1, raw.shape[2]).mean(axis=0) for raw in self._history])
+    
+    def _history_slices(self, bounds):
+        """Rows and columns of the downsampled frames covering full-resolution bounds"""
+        step = self.downsample
+        x1, y1, x2, y2 = bounds
+        rows = slice(y1 // step, max(y1 // step + 1, -(-y2 // step)))
+        cols = slice(x1 // step, max(x1 // step + 1, -(-x2 // step)))
+        return rows, cols
+    
+    def _update_lock(self, shape):
+        """Pick the strongest flicker region from the accumulated map"""
+        import cv2
+        # Something passing by reverses once, a transmitter keeps reversing
+        flicker = self._flicker / self._frames
+        flicker[self._reversals < self.min_reversals] = 0.0
+        smoothed = cv2.blur(flicker, (3, 3))
+        peak_y, peak_x = np.unravel_index(int(np.argmax(smoothed)), smoothed.shape)
+        peak = float(smoothed[peak_y, peak_x])
+        if peak < self.min_score:
+            return
+        
+        # Keep the current lock unless the new spot is clearly stronger
+        if self.roi is not None:
+            current = self._region_score(smoothed, self.roi)
+            if peak < self.relock_ratio * current:
+                self.score = current
+                return
+        
+        bounds = self._region_bounds(smoothed, peak_x, peak_y, peak, shape)
+        if self.roi is not None and self._overlaps(self.roi, bounds):
+            # Same transmitter: ease towards the new bounds instead of jumping
+            bounds = tuple(int(round(old + self.smoothing * (new - old)))
+                           for old, new in zip(self.roi, bounds))
+        else:
+            self.relocked = True
+        self.roi = bounds
+        self.score = peak
+    
+    def _region_bounds(self, smoothed, peak_x, peak_y, peak, shape):
+        """Full-resolution bounds of the connected flicker region around a peak"""
+        import cv2
+        mask = (smoothed >= 0.5 * peak).astype(np.uint8)
+        _, labels = cv2.connectedComponents(mask)
+        ys, xs = np.nonzero(labels == labels[peak_y, peak_x])
+        
+        step = self.downsample
+        h, w = shape[:2]
+        x1, x2 = int(xs.min()) * step, (int(xs.max()) + 1) * step
+        y1, y2 = int(ys.min()) * step, (int(ys.max()) + 1) * step
+        
+        # Trim the edges, where the screen border and blur mix in background
+        trim_x = int((x2 - x1) * self.margin)
+        trim_y = int((y2 - y1) * self.margin)
+        return (max(0, x1 + trim_x), max(0, y1 + trim_y),
+                min(w, max(x1 + trim_x + 1, x2 - trim_x)), min(h, max(y1 + trim_y + 1, y2 - trim_y)))
+    
+    def _region_score(self, smoothed, bounds):
+        """Strongest flicker inside full-resolution bounds"""
+        step = self.downsample
+        x1, y1, x2, y2 = bounds
+        region = smoothed[y1 // step:max(y1 // step + 1, y2 // step),
+                          x1 // step:max(x1 // step + 1, x2 // step)]
+        return float(region.max()) if region.size else 0.0
+    
+    def _overlaps(self, a, b):
+        """Whether two bounds overlap"""
+        return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
@@ -1,8 +1,17 @@
 import tkinter as tk
-from tkinter import ttk, scrolledtext, messagebox
+from tkinter import ttk, scrolledtext, messagebox, filedialog
 import threading
+import os
 from sender import ScreenFlicker
-from receiver import CameraReceiver
+from receiver import CameraReceiver, GridReceiver, ColorReceiver, PamReceiver, RollingShutterReceiver
+from sources import open_source
+from grid import parse_grid
+from metrics import export_json, export_csv, format_snapshot
+from chunking import save_transfer
+from config import (LANE_CHOICES, LINE_CODE_CHOICES, FEC_LEVELS, FILE_LAPS, FOUNTAIN_SYMBOLS_PER_BLOCK, RECEIVED_DIR,
+                    MIN_SPEED_MS, MAX_SPEED_MS)
+
+METRICS_REFRESH_MS = 500  # Live metrics panel update interval
 
 class WhisprNetApp:
     def __init__(self, root):
@@ -44,6 +53,9 @@ class WhisprNetApp:
         receive_btn = ttk.Button(button_frame, text="📥 Receive Message", command=self.open_receiver_mode, width=20)
         receive_btn.pack(side=tk.LEFT)
         
+        metrics_btn = ttk.Button(button_frame, text="📈 Metrics", command=self.open_metrics_panel, width=12)
+        metrics_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Status area
         status_frame = ttk.LabelFrame(main_frame, text="Status", padding="10")
         status_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(20, 0))
@@ -102,6 +114,30 @@ class WhisprNetApp:
         speed_entry = ttk.Entry(controls_frame, textvariable=self.speed_var, width=10)
         speed_entry.pack(side=tk.LEFT, padx=(5, 20))
         
+        # Grid of flicker cells or RGB color lanes, each carrying its own stripe of the
+        # message, or PAM gray levels carrying several bits per symbol
+        ttk.Label(controls_frame, text="Mode:").pack(side=tk.LEFT)
+        self.send_lanes_var = tk.StringVar(value=LANE_CHOICES[0])
+        ttk.Combobox(controls_frame, textvariable=self.send_lanes_var, values=LANE_CHOICES,
+                     width=5, state="readonly").pack(side=tk.LEFT, padx=(5, 20))
+        
+        # Line code, the receiver reads it from the frame header (binary modes only, PAM sends gray levels).
+        # 8B10B is the dense DC-balanced choice, 4B5B's average brightness follows the data
+        ttk.Label(controls_frame, text="Code:").pack(side=tk.LEFT)
+        self.send_code_var = tk.StringVar(value=LINE_CODE_CHOICES[0])
+        ttk.Combobox(controls_frame, textvariable=self.send_code_var, values=LINE_CODE_CHOICES,
+                     width=10, state="readonly").pack(side=tk.LEFT, padx=(5, 20))
+        
+        # Forward error correction, the frame header tells the receiver how much
+        ttk.Label(controls_frame, text="FEC:").pack(side=tk.LEFT)
+        self.send_fec_var = tk.StringVar(value="Off")
+        ttk.Combobox(controls_frame, textvariable=self.send_fec_var, values=list(FEC_LEVELS),
+                     width=7, state="readonly").pack(side=tk.LEFT, padx=(5, 20))
+        
+        # Deflate short chat text against a preset dictionary, the frame flags tell the receiver
+        self.send_compress_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(controls_frame, text="Compress", variable=self.send_compress_var).pack(side=tk.LEFT, padx=(0, 20))
+        
         # Send button
         send_btn = ttk.Button(controls_frame, text="🚀 Start Transmission", command=self.start_transmission)
         send_btn.pack(side=tk.RIGHT)
@@ -111,6 +147,15 @@ class WhisprNetApp:
         self.progress_bar = ttk.Progressbar(main_frame, variable=self.progress_var, maximum=100)
         self.progress_bar.pack(fill=tk.X, pady=(10, 0))
         
+        # Files go out as numbered chunks on a carousel instead of one message,
+        # or as fountain-coded symbols that never repeat themselves
+        file_frame = ttk.Frame(main_frame)
+        file_frame.pack(fill=tk.X, pady=(10, 0))
+        file_btn = ttk.Button(file_frame, text="📁 Send File", command=self.send_file)
+        file_btn.pack(side=tk.RIGHT)
+        self.send_fountain_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(file_frame, text="Fountain code", variable=self.send_fountain_var).pack(side=tk.RIGHT, padx=(0, 10))
+        
     def start_transmission(self):
         """Start message transmission"""
         message = self.message_text.get(1.0, tk.END).strip()
@@ -118,26 +163,70 @@ class WhisprNetApp:
             messagebox.showwarning("Warning", "Please enter a message to send!")
             return
             
+        speed = self.configure_sender()
+        if speed is None:
+            return
+        self.log_message(f"Starting transmission: '{message[:50]}{'...' if len(message) > 50 else ''}'")
+        
+        # The scheduler drives the flicker window from the Tk main loop, so no thread is needed
+        def done(completed):
+            if completed:
+                self.log_message("✅ Transmission completed successfully!")
+        
+        try:
+            self.screen_flicker.send_message(message, speed, self.update_progress, self.log_message, done)
+        except Exception as e:
+            self.log_message(f"❌ Transmission failed: {str(e)}")
+        
+    def send_file(self):
+        """Send a file as a chunked transfer"""
+        path = filedialog.askopenfilename(title="Send file")
+        if not path:
+            return
+        speed = self.configure_sender()
+        if speed is None:
+            return
+        with open(path, 'rb') as f:
+            data = f.read()
+        name = os.path.basename(path)
+        self.log_message(f"Starting file transfer: '{name}' ({len(data)} bytes)")
+        
+        def done(completed):
+            if completed:
+                self.log_message("✅ File transfer completed!")
+        
+        try:
+            if self.send_fountain_var.get():
+                self.screen_flicker.send_fountain(data, name, speed, FOUNTAIN_SYMBOLS_PER_BLOCK,
+                                                  self.update_progress, self.log_message, done)
+            else:
+                self.screen_flicker.send_data(data, name, speed, FILE_LAPS, self.update_progress, self.log_message, done)
+        except Exception as e:
+            self.log_message(f"❌ File transfer failed: {str(e)}")
+        
+    def configure_sender(self):
+        """Apply the sender settings, return the flicker speed in ms or None if it is invalid"""
+        lanes = self.send_lanes_var.get()
         try:
             speed = int(self.speed_var.get())
-            if speed < 50 or speed > 1000:
-                raise ValueError("Speed must be between 50-1000ms")
+            # Rows mode ignores the speed, it sends one symbol per display refresh
+            if lanes != "Rows" and (speed < MIN_SPEED_MS or speed > MAX_SPEED_MS):
+                raise ValueError(f"Speed must be between {MIN_SPEED_MS}-{MAX_SPEED_MS}ms")
         except ValueError as e:
             messagebox.showerror("Error", f"Invalid speed: {e}")
-            return
+            return None
             
-        self.log_message(f"Starting transmission: '{message[:50]}{'...' if len(message) > 50 else ''}'")
-        
-        # Start transmission in separate thread
-        def transmit():
-            try:
-                self.screen_flicker.send_message(message, speed, self.update_progress, self.log_message)
-                self.log_message("✅ Transmission completed successfully!")
-            except Exception as e:
-                self.log_message(f"❌ Transmission failed: {str(e)}")
-                
-        thread = threading.Thread(target=transmit, daemon=True)
-        thread.start()
+        if lanes.startswith("PAM-") and self.send_code_var.get() != "Manchester":
+            messagebox.showerror("Error", "Line codes apply to binary modes, PAM sends its own levels")
+            return None
+        self.screen_flicker.color = lanes == "RGB"
+        self.screen_flicker.fullscreen = lanes == "Rows"
+        self.screen_flicker.levels = int(lanes[4:]) if lanes.startswith("PAM-") else 2
+        self.screen_flicker.line_code = self.send_code_var.get().lower()
+        self.screen_flicker.fec_level = FEC_LEVELS[self.send_fec_var.get()]
+        self.screen_flicker.compress = self.send_compress_var.get()
+        self.screen_flicker.rows, self.screen_flicker.cols = parse_grid(lanes) if "x" in lanes else (1, 1)
+        return speed
         
     def update_progress(self, percentage):
         """Update progress bar"""
@@ -172,6 +261,15 @@ class WhisprNetApp:
         self.stop_receive_btn = ttk.Button(controls_frame, text="⏹️ Stop Camera", command=self.stop_receiving, state=tk.DISABLED)
         self.stop_receive_btn.pack(side=tk.LEFT, padx=(10, 0))
         
+        self.replay_btn = ttk.Button(controls_frame, text="📂 Replay File", command=self.replay_file)
+        self.replay_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Must match the sender's mode
+        ttk.Label(controls_frame, text="Mode:").pack(side=tk.LEFT, padx=(10, 0))
+        self.receive_lanes_var = tk.StringVar(value=LANE_CHOICES[0])
+        ttk.Combobox(controls_frame, textvariable=self.receive_lanes_var, values=LANE_CHOICES,
+                     width=5, state="readonly").pack(side=tk.LEFT, padx=(5, 0))
+        
         # Camera status
         self.camera_status_label = ttk.Label(controls_frame, text="Camera: Stopped", foreground="red")
         self.camera_status_label.pack(side=tk.RIGHT)
@@ -195,6 +293,9 @@ class WhisprNetApp:
         self.stop_receive_btn.config(state=tk.NORMAL)
         self.camera_status_label.config(text="Camera: Starting...", foreground="orange")
         
+        self.configure_receiver()
+        self.camera_receiver.transfer_callback = self.on_transfer_received
+        
         def receive():
             try:
                 self.camera_receiver.start_receiving(self.on_message_received, self.update_detection_info)
@@ -209,6 +310,58 @@ class WhisprNetApp:
         thread = threading.Thread(target=receive, daemon=True)
         thread.start()
         
+    def replay_file(self):
+        """Decode a recorded video file or brightness trace"""
+        path = filedialog.askopenfilename(
+            title="Open recording",
+            filetypes=[("Recordings", "*.npy *.avi *.mp4 *.mkv *.mov"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+            
+        self.start_receive_btn.config(state=tk.DISABLED)
+        self.stop_receive_btn.config(state=tk.NORMAL)
+        self.camera_status_label.config(text="Replay: Active", foreground="green")
+        self.configure_receiver()
+        self.camera_receiver.transfer_callback = self.on_transfer_received
+        
+        try:
+            self.camera_receiver.start_receiving(
+                self.on_message_received, self.update_detection_info, source=open_source(path)
+            )
+            self.log_message(f"📂 Replaying {path}")
+        except Exception as e:
+            self.log_message(f"❌ Replay error: {str(e)}")
+            self.camera_status_label.config(text="Replay: Error", foreground="red")
+            self.start_receive_btn.config(state=tk.NORMAL)
+            self.stop_receive_btn.config(state=tk.DISABLED)
+        
+    def configure_receiver(self):
+        """Pick the receiver matching the selected mode: PAM, color, grid, rolling shutter rows or a single cell"""
+        lanes = self.receive_lanes_var.get()
+        if lanes == "Rows":
+            if not isinstance(self.camera_receiver, RollingShutterReceiver):
+                self.camera_receiver = RollingShutterReceiver()
+            return
+        if lanes.startswith("PAM-"):
+            levels = int(lanes[4:])
+            if getattr(self.camera_receiver, 'levels', None) != levels:
+                self.camera_receiver = PamReceiver(levels)
+            return
+        if lanes == "RGB":
+            if not isinstance(self.camera_receiver, ColorReceiver):
+                self.camera_receiver = ColorReceiver()
+            return
+        
+        rows, cols = parse_grid(lanes)
+        current = (getattr(self.camera_receiver, 'rows', 1), getattr(self.camera_receiver, 'cols', 1))
+        if current == (rows, cols) and not isinstance(self.camera_receiver, (ColorReceiver, PamReceiver, RollingShutterReceiver)):
+            return
+        if rows * cols > 1:
+            self.camera_receiver = GridReceiver(rows, cols)
+        else:
+            self.camera_receiver = CameraReceiver()
+        
     def stop_receiving(self):
         """Stop camera and message reception"""
         self.camera_receiver.stop_receiving()
@@ -224,6 +377,62 @@ class WhisprNetApp:
         self.received_text.see(tk.END)
         self.log_message(f"✅ Message received: '{message[:50]}{'...' if len(message) > 50 else ''}'")
         
+    def on_transfer_received(self, name, data):
+        """Save a completed file transfer"""
+        path = save_transfer(RECEIVED_DIR, name, data)
+        
+        self.received_text.insert(tk.END, f"📦 {name} ({len(data)} bytes) saved to {path}\n" + "="*50 + "\n")
+        self.received_text.see(tk.END)
+        self.log_message(f"✅ File received: '{name}' ({len(data)} bytes)")
+        
+    def metrics_snapshot(self):
+        """Current receiver and sender metrics"""
+        return {
+            'receiver': self.camera_receiver.metrics_snapshot(),
+            'sender': self.screen_flicker.metrics.snapshot(),
+        }
+        
+    def open_metrics_panel(self):
+        """Open a live view of the link metrics"""
+        metrics_window = tk.Toplevel(self.root)
+        metrics_window.title("WhisprNet - Link Metrics")
+        metrics_window.geometry("520x600")
+        
+        main_frame = ttk.Frame(metrics_window, padding="10")
+        main_frame.pack(fill=tk.BOTH, expand=True)
+        
+        metrics_text = scrolledtext.ScrolledText(main_frame, height=30, width=60, font=("Courier", 9))
+        metrics_text.pack(fill=tk.BOTH, expand=True)
+        
+        # Export buttons
+        export_frame = ttk.Frame(main_frame)
+        export_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(export_frame, text="💾 Export JSON", command=lambda: self.export_metrics('json')).pack(side=tk.LEFT)
+        ttk.Button(export_frame, text="💾 Export CSV", command=lambda: self.export_metrics('csv')).pack(side=tk.LEFT, padx=(10, 0))
+        
+        def refresh():
+            if not metrics_window.winfo_exists():
+                return
+            position = metrics_text.yview()[0]
+            metrics_text.delete(1.0, tk.END)
+            metrics_text.insert(tk.END, format_snapshot(self.metrics_snapshot()))
+            metrics_text.yview_moveto(position)
+            metrics_window.after(METRICS_REFRESH_MS, refresh)
+        
+        refresh()
+        
+    def export_metrics(self, kind):
+        """Save a metrics snapshot as JSON or CSV"""
+        path = filedialog.asksaveasfilename(
+            title="Export metrics",
+            defaultextension=f".{kind}",
+            filetypes=[(kind.upper(), f"*.{kind}"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        (export_json if kind == 'json' else export_csv)(self.metrics_snapshot(), path)
+        self.log_message(f"📈 Metrics exported to {path}")
+        
     def update_detection_info(self, info):
         """Update detection information"""
         self.detection_info.config(text=info)
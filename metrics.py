@@ -0,0 +1,143 @@
+import bisect
+import csv
+import json
+import threading
+import time
+
+# Histogram bucket upper bounds, roughly 1-2-5 steps from 10 us to 10 s.
+# Latencies are recorded in ms, so this covers everything from a slice to a stall.
+DEFAULT_BOUNDS = [0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+class Histogram:
+    """Fixed-bucket histogram with count, sum, min and max, cheap enough for every sample"""
+    def __init__(self, bounds=DEFAULT_BOUNDS):
+        self.bounds = bounds
+        self.reset()
+    
+    def reset(self):
+        """Forget every observation"""
+        self.buckets = [0] * (len(self.bounds) + 1)  # The last bucket holds everything above the bounds
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+    
+    def observe(self, value):
+        """Record one value"""
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+    
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (the max for the top bucket)"""
+        if not self.count:
+            return None
+        rank = q / 100.0 * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+        return self.max
+    
+    def snapshot(self):
+        """Summary statistics as a dict"""
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'min': self.min,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
+
+class Metrics:
+    """Named counters, gauges and histograms for one component
+    
+    The hot-path calls are a dict lookup and an addition. They are not
+    locked: the capture and decode threads write different names, and a
+    lost increment in a snapshot is harmless. Snapshots and resets lock.
+    """
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+    
+    def reset(self):
+        """Zero everything and restart the clock used for rates"""
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.histograms.clear()
+            self.started = time.perf_counter()
+    
+    def count(self, name, amount=1):
+        """Add to a counter"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def gauge(self, name, value):
+        """Set a gauge to its current value"""
+        self.gauges[name] = value
+    
+    def observe(self, name, value):
+        """Add one value to a histogram"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+    
+    def snapshot(self):
+        """Flat {name: value} of every metric, counters also as per-second rates"""
+        with self._lock:
+            elapsed = time.perf_counter() - self.started
+            values = {'elapsed_s': elapsed}
+            for name, value in list(self.counters.items()):
+                values[name] = value
+                values[f"{name}_per_s"] = value / elapsed if elapsed > 0 else 0.0
+            values.update(self.gauges)
+            for name, histogram in list(self.histograms.items()):
+                for statistic, value in histogram.snapshot().items():
+                    values[f"{name}.{statistic}"] = value
+            return values
+
+def export_json(snapshot, path):
+    """Write a snapshot (or a dict of them) as JSON"""
+    with open(path, 'w') as f:
+        json.dump(snapshot, f, indent=2, sort_keys=True)
+
+def export_csv(snapshot, path):
+    """Write a snapshot as metric,value rows, nested dicts get dotted names"""
+    rows = []
+    
+    def flatten(prefix, values):
+        for name, value in sorted(values.items()):
+            if isinstance(value, dict):
+                flatten(f"{prefix}{name}.", value)
+            else:
+                rows.append((prefix + name, value))
+    
+    flatten('', snapshot)
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(('metric', 'value'))
+        writer.writerows(rows)
+
+def format_snapshot(snapshot):
+    """Readable multi-line text of a snapshot for the live panel"""
+    lines = []
+    for name, value in sorted(snapshot.items()):
+        if isinstance(value, dict):
+            lines.append(f"[{name}]")
+            lines.extend("  " + line for line in format_snapshot(value).splitlines())
+        elif isinstance(value, float):
+            lines.append(f"{name}: {value:.3f}")
+        else:
+            lines.append(f"{name}: {value}")
+    return "\n".join(lines)
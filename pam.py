@@ -0,0 +1,223 @@
+import numpy as np
+from encoder_decoder import bytes_to_bits, bits_to_bytes
+from framing import build_frame
+from fec import FEC_HEADER_SIZE, read_header, air_size, protect_frame
+
+FLASH_SYMBOLS = 2  # Top-level flash that opens the calibration ramp
+RAMP_SYMBOLS = 2   # Symbols per ramp step
+GAP_SYMBOLS = 2    # Black gap between the ramp and the start marker
+DISPLAY_GAMMA = 2.2  # Typical sRGB display response, pre-compensated by the sender
+
+def bits_per_symbol(levels):
+    """Bits carried by one symbol of a PAM alphabet"""
+    if levels < 2 or levels & (levels - 1):
+        raise ValueError("PAM levels must be a power of two")
+    return levels.bit_length() - 1
+
+def gray_tables(levels):
+    """(value -> level, level -> value) lookup tables for Gray-coded levels"""
+    # Neighbouring levels differ in a single bit, so the most likely slicing
+    # error (an adjacent level) costs one bit instead of several
+    level_to_value = np.array([level ^ (level >> 1) for level in range(levels)], dtype=np.uint8)
+    value_to_level = np.argsort(level_to_value).astype(np.uint8)
+    return value_to_level, level_to_value
+
+def bits_to_levels(bits, levels):
+    """Group bits MSB first into Gray-coded symbol levels, zero-padding the last one"""
+    width = bits_per_symbol(levels)
+    bits = np.asarray(bits, dtype=np.uint8)
+    bits = np.concatenate((bits, np.zeros(-len(bits) % width, dtype=np.uint8)))
+    values = bits.reshape(-1, width) @ (1 << np.arange(width - 1, -1, -1))
+    return gray_tables(levels)[0][values]
+
+def levels_to_bits(symbols, levels):
+    """Bits carried by a sequence of symbol levels"""
+    width = bits_per_symbol(levels)
+    values = gray_tables(levels)[1][np.asarray(symbols, dtype=np.uint8)]
+    return ((values[:, np.newaxis] >> np.arange(width - 1, -1, -1)) & 1).astype(np.uint8).ravel()
+
+def calibration_ramp(levels):
+    """Flash, one step per level from black to white, then the black gap"""
+    top = levels - 1
+    ramp = np.repeat(np.arange(levels, dtype=np.uint8), RAMP_SYMBOLS)
+    return np.concatenate(([top] * FLASH_SYMBOLS, ramp, [0] * GAP_SYMBOLS)).astype(np.uint8)
+
+def pam_symbols(message, levels=4, sequence=0, fec_level=0, compress=False):
+    """Ramp, start marker and a frame (compressed and FEC protected if asked) as symbol levels
+    
+    The frame is the same one binary modes send, so its header tells the
+    receiver how long it is and its CRC vouches for the payload.
+    """
+    data = message.encode('utf-8') if isinstance(message, str) else bytes(message)
+    frame = protect_frame(build_frame(data, sequence, fec_level, compress))
+    top = levels - 1
+    # The closing marker gives the last frame symbol an edge to end on
+    return np.concatenate((calibration_ramp(levels), [top], bits_to_levels(bytes_to_bits(frame), levels),
+                           [top])).astype(np.uint8)
+
+def level_color(level, levels):
+    """Tk gray of one symbol level"""
+    # Spread the levels evenly in emitted light rather than in pixel values,
+    # otherwise the display gamma crowds the dark levels together. The ramp
+    # calibrates away whatever mismatch is left.
+    value = int(round(255 * (level / (levels - 1)) ** (1.0 / DISPLAY_GAMMA)))
+    return f"#{value:02x}{value:02x}{value:02x}"
+
+class PamCalibrator:
+    """Learn the symbol clock and the brightness of every level from the ramp"""
+    def __init__(self, levels=4, min_contrast=30.0, min_step=4.0, idle_rate=0.1, drift_rate=0.05):
+        self.levels = levels
+        self.min_contrast = min_contrast  # The flash must rise this far above black
+        self.min_step = min_step          # Closest two learned levels may be
+        self.idle_rate = idle_rate        # Tracking rate of the black level between messages
+        self.drift_rate = drift_rate      # Tracking rate of room light drift during a frame
+        self.black = None
+        self.reset()
+    
+    def reset(self):
+        """Wait for the next ramp, keeping the black level"""
+        self.level_means = None  # Brightness of every level, dark to bright
+        self.thresholds = None   # Decision boundaries between neighbouring levels
+        self.offset = 0.0        # Room light drift since the ramp, common to all levels
+        self.symbol_period = None
+        self._state = 'idle'
+        self._samples = []
+        self._flash = []
+        self._started = None
+        self._flash_end = None
+        self._high_again = False
+        self._last_timestamp = None
+    
+    @property
+    def collecting(self):
+        """Whether a ramp is being collected right now"""
+        return self._state != 'idle'
+    
+    def feed(self, brightness, timestamp):
+        """Add one sample, return True when it completed a calibration"""
+        previous, self._last_timestamp = self._last_timestamp, timestamp
+        if self.black is None:
+            self.black = brightness
+            return False
+        
+        if self._state == 'idle':
+            if brightness - self.black >= self.min_contrast:
+                self._state = 'flash'
+                self._started = (previous + timestamp) / 2.0 if previous is not None else timestamp
+                self._flash = [brightness]
+                self._samples = [(timestamp, brightness)]
+            else:
+                self.black += self.idle_rate * (brightness - self.black)
+            return False
+        
+        self._samples.append((timestamp, brightness))
+        contrast = np.median(self._flash) - self.black
+        middle = self.black + 0.5 * contrast
+        
+        if self._state == 'flash':
+            if brightness >= middle:
+                self._flash.append(brightness)
+            else:
+                self._state = 'ramp'
+                self._flash_end = timestamp
+            return False
+        
+        # The ramp climbs back above the middle for its top steps, and the
+        # gap after it is the first drop close to black again (a step near
+        # the middle may dither across it)
+        rough_period = (self._flash_end - self._started) / FLASH_SYMBOLS
+        if timestamp - self._started > 2 * (FLASH_SYMBOLS + self.levels * RAMP_SYMBOLS) * rough_period:
+            self.reset()  # Not a ramp
+            return False
+        if brightness >= middle:
+            self._high_again = True
+            return False
+        if not self._high_again or brightness - self.black >= 0.25 * contrast:
+            return False
+        return self._solve((previous + timestamp) / 2.0)
+    
+    def slice(self, brightness):
+        """Level of one brightness sample"""
+        level = int(np.searchsorted(self.thresholds, brightness - self.offset))
+        
+        # Room light adds to every level alike, so follow it using samples
+        # that sit clearly on a level (not blends caught mid-transition)
+        error = brightness - self.offset - self.level_means[level]
+        if abs(error) < 0.25 * self._spacing:
+            self.offset += self.drift_rate * error
+        return level
+    
+    def _solve(self, ramp_end):
+        """Measure the clock and every level from the collected ramp"""
+        samples = np.array(self._samples)
+        started = self._started
+        self.reset()
+        
+        period = (ramp_end - started) / (FLASH_SYMBOLS + self.levels * RAMP_SYMBOLS)
+        means = []
+        for level in range(self.levels):
+            # Only the middle half of each step: its edges blend with neighbours
+            step_start = started + (FLASH_SYMBOLS + level * RAMP_SYMBOLS) * period
+            step_length = RAMP_SYMBOLS * period
+            inside = ((samples[:, 0] >= step_start + 0.25 * step_length) &
+                      (samples[:, 0] <= step_start + 0.75 * step_length))
+            if not inside.any():
+                return False
+            means.append(float(np.median(samples[inside, 1])))
+        
+        means = np.array(means)
+        if np.any(np.diff(means) < self.min_step):
+            return False  # Levels too close to tell apart, or not a ramp at all
+        
+        self.symbol_period = period
+        self.level_means = means
+        self.thresholds = (means[1:] + means[:-1]) / 2.0
+        self._spacing = float(np.diff(means).min())
+        return True
+
+class PamDecoder:
+    """Turn recovered symbol levels into the frame that follows the start marker"""
+    def __init__(self, levels=4, max_message_bytes=1250):
+        self.levels = levels
+        self.width = bits_per_symbol(levels)
+        self.max_message_bytes = max_message_bytes  # Reject corrupted length headers
+        # Every frame, even an empty one without FEC, is at least this long
+        self.header_symbols = -(-FEC_HEADER_SIZE * 8 // self.width)
+        self.rejected_frames = 0
+        self.reset()
+    
+    def reset(self):
+        """Wait for the next start marker"""
+        self.active = False  # Inside a frame: marker seen
+        self.size = None     # Frame bytes on the link, known once the header is read
+        self._symbols = []
+    
+    def feed(self, level):
+        """Feed one symbol level, return the frame bytes once it completes"""
+        if not self.active:
+            if level == self.levels - 1:
+                self.active = True
+            return None
+        
+        self._symbols.append(level)
+        if self.size is None:
+            if len(self._symbols) < self.header_symbols:
+                return None
+            header = levels_to_bits(self._symbols, self.levels)[:FEC_HEADER_SIZE * 8]
+            try:
+                flags, _, length, _ = read_header(bits_to_bytes(header))
+            except ValueError:
+                self.rejected_frames += 1
+                self.reset()
+                return None
+            if length > self.max_message_bytes:
+                self.rejected_frames += 1
+                self.reset()
+                return None
+            self.size = air_size(flags, length)
+        
+        if len(self._symbols) * self.width < self.size * 8:
+            return None
+        bits = levels_to_bits(self._symbols, self.levels)[:self.size * 8]
+        self.reset()
+        return bits_to_bytes(bits)
@@ -1,161 +1,755 @@
-import cv2
 import numpy as np
 import time
 import threading
-from encoder_decoder import ManchesterDecoder
-from utils import BrightnessDetector, SyncDetector
+import queue
+from encoder_decoder import ManchesterDecoder, StreamingDecoder
+from utils import BrightnessDetector, SyncDetector, ClockRecovery, RingBuffer, SampleBuffer, SymbolIntegrator
+from sources import CameraSource, TraceRecorder
+from localization import TransmitterLocator
+from lanes import LaneDecoder, StripeAssembler
+from grid import cell_bounds
+from color import CrossTalkCalibrator
+from pam import PamCalibrator, PamDecoder
+from fec import unwrap_frame, open_frame
+from fountain import TransferAssembler, is_transfer_packet
+from metrics import Metrics
+from scheduler import DEFAULT_REFRESH_HZ
+from rolling_shutter import RowTimingEstimator, row_profile, row_samples, DEFAULT_ROW_STEP, DEFAULT_READOUT_FRACTION
 
 class CameraReceiver:
-    def __init__(self):
+    def __init__(self, camera_fps=30, show_preview=True, preview_fps=10, queue_size=512, bit_duration_ms=None,
+                 auto_locate=True, max_transfer_bytes=1 << 20, soft_decision=True):
         self.decoder = ManchesterDecoder()
+        self.stream_decoder = StreamingDecoder()
+        self.chunk_assembler = TransferAssembler(max_transfer_bytes)  # Partial file transfers, bounded in memory
+        self.clock_recovery = ClockRecovery(
+            nominal_period=bit_duration_ms / 1000.0 if bit_duration_ms else None
+        )
+        self.soft_decision = soft_decision  # Decide symbols from their integrated samples, not the sliced runs
+        self.symbol_integrator = SymbolIntegrator() if soft_decision else None
         self.brightness_detector = BrightnessDetector()
         self.sync_detector = SyncDetector()
-        self.cap = None
+        self.locator = TransmitterLocator() if auto_locate else None
+        self.source = None
+        self.trace_recorder = None
+        self.record_path = None
+        self.bit_callback = None  # Optional tap on every recovered bit
+        self.transfer_callback = None  # Called with (name, data) when a chunked transfer completes
+        self.metrics = Metrics()       # Per-session counters and stage latencies, see metrics_snapshot()
         self.is_receiving = False
-        self.receive_thread = None
+        self.camera_fps = camera_fps
+        self.show_preview = show_preview
+        self.preview_fps = preview_fps  # Preview is throttled, decoding never waits on it
+        
+        # Capture -> decode pipeline
+        self.sample_queue = queue.Queue(maxsize=queue_size)
+        self.dropped_samples = 0
+        self.capture_thread = None
+        self.decode_thread = None
+        self.preview_thread = None
+        self._preview_frame = None
+        self._preview_brightness = 0.0
+        self._current_bit = 0
+        self._current_confidence = 0.0
+        self._recent_timestamps = RingBuffer(self.locator.history_length if self.locator else 1, np.float64)
         
-    def start_receiving(self, message_callback, info_callback):
-        """Start camera and begin receiving messages"""
+    def start_receiving(self, message_callback, info_callback, source=None, record_path=None):
+        """Start camera (or another receive source) and begin receiving messages"""
         if self.is_receiving:
             return
             
-        # Initialize camera
-        self.cap = cv2.VideoCapture(0)
-        if not self.cap.isOpened():
-            raise Exception("Could not open camera")
-            
-        # Set camera properties for better performance
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
+        # Initialize the source, the live camera unless told otherwise
+        self.source = source or CameraSource(0, fps=self.camera_fps)
+        self.source.open()
+        if self.source.provides_frames:
+            self.brightness_detector.pixel_format = self.source.pixel_format
+        
+        # Optionally keep a brightness trace of the session for offline replay
+        self.record_path = record_path
+        self.trace_recorder = TraceRecorder() if record_path else None
         
         self.is_receiving = True
         self.message_callback = message_callback
         self.info_callback = info_callback
+        self._reset_pipeline()
         
-        # Start receiving thread
-        self.receive_thread = threading.Thread(target=self._receive_loop, daemon=True)
-        self.receive_thread.start()
+        # Start pipeline threads: capture -> decode, preview runs on the side
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.decode_thread = threading.Thread(target=self._decode_loop, daemon=True)
+        self.capture_thread.start()
+        self.decode_thread.start()
+        
+        if self.show_preview and self.source.provides_frames:
+            self.preview_thread = threading.Thread(target=self._preview_loop, daemon=True)
+            self.preview_thread.start()
     
     def stop_receiving(self):
         """Stop receiving and release camera"""
         self.is_receiving = False
         
-        if self.receive_thread:
-            self.receive_thread.join(timeout=2.0)
+        for thread in (self.capture_thread, self.decode_thread, self.preview_thread):
+            if thread:
+                thread.join(timeout=2.0)
+        self.capture_thread = self.decode_thread = self.preview_thread = None
+            
+        if self.source:
+            self.source.close()
             
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        if self.trace_recorder:
+            self.trace_recorder.save(self.record_path)
+            self.trace_recorder = None
             
-        cv2.destroyAllWindows()
+        if self.show_preview and self.source and self.source.provides_frames:
+            import cv2
+            cv2.destroyAllWindows()
+        self.source = None
     
-    def _receive_loop(self):
-        """Main receiving loop"""
-        bit_buffer = []
-        last_brightness = None
-        frame_count = 0
+    def decode_source(self, source, message_callback=None):
+        """Decode a recorded source as fast as possible, return the messages found"""
+        messages = []
+        
+        def collect(message):
+            messages.append(message)
+            if message_callback:
+                message_callback(message)
         
-        # Detection parameters
-        stable_frames_needed = 3  # Frames needed to confirm bit transition
-        current_bit_frames = 0
-        current_bit_value = None
+        self.message_callback = collect
+        self.info_callback = None
+        self._reset_pipeline()
         
+        source.open()
+        if source.provides_frames:
+            self.brightness_detector.pixel_format = source.pixel_format
+        try:
+            if hasattr(source, 'iter_samples'):
+                # Traces skip the per-read overhead entirely
+                for timestamp, brightness in source.iter_samples():
+                    self._handle_sample((timestamp, brightness))
+            else:
+                while True:
+                    ret, timestamp, data = source.read()
+                    if not ret:
+                        if source.at_end():
+                            break
+                        continue
+                    for sample in self._source_samples(timestamp, data, source):
+                        self._handle_sample(sample)
+        finally:
+            source.close()
+        
+        return messages
+    
+    def _reset_pipeline(self):
+        """Clear queued samples and per-session decoding state"""
+        while True:
+            try:
+                self.sample_queue.get_nowait()
+            except queue.Empty:
+                break
+        
+        self.dropped_samples = 0
+        self.metrics.reset()
+        self.stream_decoder.reset()
+        self._preview_frame = None
+        self._bits_received = 0
+        self._capture_finished = False
+        self._current_confidence = 0.0
+        self.clock_recovery.reset()
+        self.brightness_detector.slicer.reset()
+        if self.symbol_integrator is not None:
+            self.symbol_integrator.clear()
+        self.brightness_detector.roi = None
+        self._recent_timestamps.clear()
+        if self.locator:
+            self.locator.reset()
+    
+    def _resync(self):
+        """Restart slicing, clock recovery and framing, e.g. after the ROI moved"""
+        self.stream_decoder.reset()
+        self.clock_recovery.reset()
+        self.brightness_detector.slicer.reset()
+        if self.symbol_integrator is not None:
+            self.symbol_integrator.clear()
+    
+    def _capture_loop(self):
+        """Read frames and push timestamped ROI samples to the decode queue"""
         try:
             while self.is_receiving:
-                ret, frame = self.cap.read()
+                started = time.perf_counter()
+                ret, timestamp, data = self.source.read()
                 if not ret:
+                    if self.source.at_end():
+                        break
                     continue
-                    
-                frame_count += 1
+                read = time.perf_counter()
+                self.metrics.count('frames_captured')
+                self.metrics.observe('capture_ms', (read - started) * 1000)
                 
-                # Extract brightness from center region
-                brightness = self.brightness_detector.get_center_brightness(frame)
+                # Extract brightness from the transmitter region
+                samples = self._source_samples(timestamp, data, self.source)
+                self.metrics.observe('brightness_ms', (time.perf_counter() - read) * 1000)
+                for sample in samples:
+                    self._enqueue_sample(sample)
                 
-                # Convert brightness to binary (threshold-based)
-                current_binary = 1 if brightness > 128 else 0
+                if self.trace_recorder:
+                    for timestamp, brightness in self._new_samples(samples):
+                        self.trace_recorder.add(timestamp, brightness)
+                timestamp, brightness = samples[-1]
                 
-                # Show camera feed with overlay
-                self._show_camera_feed(frame, brightness, current_binary)
+                # Hand the latest frame to the preview, older ones are simply replaced
+                if self.show_preview and self.source.provides_frames:
+                    self._preview_frame = data
+                    self._preview_brightness = brightness
                 
-                # Detect bit transitions
-                if current_bit_value is None:
-                    current_bit_value = current_binary
-                    current_bit_frames = 1
-                elif current_bit_value == current_binary:
-                    current_bit_frames += 1
-                else:
-                    # Bit transition detected
-                    if current_bit_frames >= stable_frames_needed:
-                        bit_buffer.append(str(current_bit_value))
-                        
-                        # Update info
+        except Exception as e:
+            if self.info_callback:
+                self.info_callback(f"Error: {str(e)}")
+        finally:
+            self._capture_finished = True
+    
+    def _source_samples(self, timestamp, data, source):
+        """Decoder samples for one source reading, None marks a resync"""
+        brightness = self._sample_brightness(data, source)
+        self._recent_timestamps.append(timestamp)
+        if not (self.locator and self.locator.relocked):
+            return [(timestamp, brightness)]
+        
+        # The transmitter was found only now: decode the last frames again
+        # from the new ROI so the start of the message is not lost
+        history = self._history_brightness()
+        replay = list(zip(self._recent_timestamps.window(), history[-len(self._recent_timestamps):]))
+        return [None] + replay[:-1] + [(timestamp, brightness)]
+    
+    def _new_samples(self, samples):
+        """Samples of the latest reading alone, replayed ones were recorded before"""
+        return samples[-1:]
+    
+    def _history_brightness(self):
+        """Brightness of the new ROI in the locator's recent frames"""
+        return self.locator.history_brightness(self.brightness_detector.roi)
+    
+    def _sample_brightness(self, data, source):
+        """Brightness of one source reading, frames go through the ROI detector"""
+        if not source.provides_frames:
+            return data
+        
+        # Keep the ROI locked onto the transmitter, then read only the ROI
+        if self.locator:
+            self.brightness_detector.roi = self.locator.feed(data, self.brightness_detector.pixel_format)
+        return self.brightness_detector.get_roi_brightness(data)
+    
+    def _enqueue_sample(self, sample):
+        """Queue a sample, dropping the oldest one if the decoder falls behind"""
+        # Recorded sources wait for the decoder instead, nothing is lost
+        if not self.source.realtime:
+            while self.is_receiving:
+                try:
+                    self.sample_queue.put(sample, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+            return
+        
+        while True:
+            try:
+                self.sample_queue.put_nowait(sample)
+                return
+            except queue.Full:
+                try:
+                    self.sample_queue.get_nowait()
+                    self.dropped_samples += 1
+                    self.metrics.count('dropped_samples')
+                except queue.Empty:
+                    pass
+    
+    def _decode_loop(self):
+        """Consume brightness samples and run them through the decoder"""
+        try:
+            while self.is_receiving:
+                try:
+                    sample = self.sample_queue.get(timeout=0.1)
+                except queue.Empty:
+                    if self._capture_finished:
+                        # Recorded source fully decoded
                         if self.info_callback:
-                            self.info_callback(f"Bits received: {len(bit_buffer)} | Current: {current_bit_value} | Brightness: {brightness:.1f}")
-                        
-                        # Check for complete message
-                        if len(bit_buffer) >= 16:  # Minimum for start + end sync
-                            message = self._try_decode_message(bit_buffer)
-                            if message:
-                                if self.message_callback:
-                                    self.message_callback(message)
-                                bit_buffer = []  # Clear buffer after successful decode
-                    
-                    current_bit_value = current_binary
-                    current_bit_frames = 1
-                
-                # Limit buffer size to prevent memory issues
-                if len(bit_buffer) > 10000:  # Max ~1250 characters
-                    bit_buffer = bit_buffer[-5000:]  # Keep last half
+                            self.info_callback(f"Replay finished | Bits received: {self._bits_received}")
+                        break
+                    continue
                 
-                # Small delay to prevent excessive CPU usage
-                time.sleep(0.01)
+                self._handle_sample(sample)
                 
         except Exception as e:
             if self.info_callback:
                 self.info_callback(f"Error: {str(e)}")
     
+    def _handle_sample(self, sample):
+        """Process a queued (timestamp, brightness) sample or resync marker"""
+        if sample is None:
+            self._resync()
+        else:
+            started = time.perf_counter()
+            self._process_sample(*sample)
+            self.metrics.observe('decode_ms', (time.perf_counter() - started) * 1000)
+    
+    def _process_sample(self, timestamp, brightness):
+        """Turn one brightness sample into bits and feed the streaming decoder"""
+        # Convert brightness to binary with the adaptive slicer
+        started = time.perf_counter()
+        current_binary, confidence = self.brightness_detector.slice_brightness(brightness)
+        self.metrics.observe('slice_ms', (time.perf_counter() - started) * 1000)
+        self._current_bit = current_binary
+        self._current_confidence = confidence
+        
+        # Recover the symbol clock and expand each run into its symbols,
+        # then decide each symbol again from the samples in its slot
+        if self.symbol_integrator is not None:
+            soft = self.brightness_detector.slicer.soft_value(brightness)
+            self.symbol_integrator.add(timestamp, soft)
+            symbols = self.symbol_integrator.decide(self.clock_recovery.push(current_binary, timestamp, soft),
+                                                    self.clock_recovery.slots)
+        else:
+            symbols = [(bit, None) for bit in self.clock_recovery.push(current_binary, timestamp)]
+        
+        for bit, soft in symbols:
+            self._bits_received += 1
+            if self.bit_callback:
+                self.bit_callback(bit)
+            
+            # Feed the streaming decoder, it reports complete payloads
+            payload = self.stream_decoder.feed_bit(bit, soft)
+            if payload:
+                self.metrics.count('symbols_guessed', self.stream_decoder.guessed)
+                self.metrics.count('pairs_soft_decided', self.stream_decoder.soft_decided)
+                self.metrics.count('fec_corrected_bytes', self.stream_decoder.corrected)
+                self._deliver(payload)
+            
+            # Update info
+            if self.info_callback:
+                period = self.clock_recovery.symbol_period
+                period_text = f"{period * 1000:.1f}ms" if period else "locking"
+                self.info_callback(f"Bits received: {self._bits_received} | Current: {bit} | Brightness: {brightness:.1f} | Confidence: {self._current_confidence:.2f} | Symbol: {period_text} | FEC fixed: {self.stream_decoder.corrected}{self._transfer_summary()} | Dropped: {self.dropped_samples}")
+    
+    def _deliver(self, payload):
+        """Pass a chunk or fountain symbol on to its transfer and anything else on as text, False if it is neither"""
+        self.metrics.count('payload_bits', 8 * len(payload))
+        if is_transfer_packet(payload):
+            self.metrics.count('transfer_packets')
+            transfer = self.chunk_assembler.add(payload)
+            if transfer and self.transfer_callback:
+                self.transfer_callback(*transfer)
+            return True
+        
+        try:
+            message = payload.decode('utf-8')
+        except UnicodeDecodeError:
+            return False
+        self.metrics.count('messages')
+        if self.message_callback:
+            self.message_callback(message)
+        return True
+    
+    def metrics_snapshot(self):
+        """Counters, rates and stage latencies of this session, plus link state read off the decoders"""
+        decoders = self._stream_decoders()
+        syncs = sum(decoder.syncs for decoder in decoders)
+        self.metrics.gauge('bits_received', self._bits_received)
+        self.metrics.gauge('sync_hits', syncs)
+        self.metrics.gauge('rejected_frames', sum(decoder.rejected_frames for decoder in decoders))
+        self.metrics.gauge('queue_depth', self.sample_queue.qsize())
+        snapshot = self.metrics.snapshot()
+        
+        # Every delivered payload took one sync per stream, the rest were lost on the way
+        delivered = snapshot.get('messages', 0) + snapshot.get('transfer_packets', 0)
+        snapshot['sync_misses'] = max(0, syncs - delivered * len(decoders))
+        # Guessed symbols, settled pairs and repaired bytes are errors that were noticed, so this is a lower bound
+        noticed = (snapshot.get('symbols_guessed', 0) + snapshot.get('pairs_soft_decided', 0) +
+                   snapshot.get('fec_corrected_bytes', 0))
+        snapshot['symbol_error_estimate'] = noticed / self._bits_received if self._bits_received else 0.0
+        return snapshot
+    
+    def _stream_decoders(self):
+        """Streaming decoders whose sync counts make up the link statistics"""
+        return [self.stream_decoder]
+    
+    def _transfer_summary(self):
+        """Block progress of the most recently fed transfer for the detection info, if there is one"""
+        progress = self.chunk_assembler.progress()
+        if not progress:
+            return ""
+        _, received, total = progress[-1]
+        return f" | Chunks: {received}/{total}"
+    
+    def _preview_loop(self):
+        """Render the camera preview at a low, fixed rate"""
+        interval = 1.0 / self.preview_fps
+        while self.is_receiving:
+            started = time.monotonic()
+            
+            frame = self._preview_frame
+            if frame is not None:
+                self._preview_frame = None
+                self._show_camera_feed(frame, self._preview_brightness, self._current_bit)
+            
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    
+    def _detection_regions(self, shape):
+        """Regions outlined in the preview"""
+        return [self.brightness_detector.roi_bounds(shape)]
+    
     def _show_camera_feed(self, frame, brightness, current_bit):
         """Show camera feed with detection overlay"""
-        # Create a copy for display
-        display_frame = frame.copy()
+        import cv2
+        # The preview owns this frame (capture never reuses it), so draw in place
+        display_frame = frame
         h, w = display_frame.shape[:2]
         
-        # Draw center detection region (100x100 equivalent)
-        center_x, center_y = w // 2, h // 2
-        region_size = 50  # 50 pixels radius for detection region
-        
+        # Draw the detection regions
         color = (0, 255, 0) if current_bit else (0, 0, 255)  # Green for 1, Red for 0
-        cv2.rectangle(
-            display_frame,
-            (center_x - region_size, center_y - region_size),
-            (center_x + region_size, center_y + region_size),
-            color,
-            2
-        )
+        for x1, y1, x2, y2 in self._detection_regions(display_frame.shape):
+            cv2.rectangle(display_frame, (x1, y1), (x2, y2), color, 2)
         
         # Add text overlay
-        cv2.putText(display_frame, f"Brightness: {brightness:.1f}", (10, 30), 
+        cv2.putText(display_frame, f"Brightness: {np.mean(brightness):.1f}", (10, 30), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
         cv2.putText(display_frame, f"Bit: {current_bit}", (10, 60), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
-        cv2.putText(display_frame, "Point at flicker area", (10, h - 20), 
+        hint = "Locked on transmitter" if self.brightness_detector.roi else "Point at flicker area"
+        cv2.putText(display_frame, hint, (10, h - 20), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 0), 2)
         
         # Show frame
         cv2.imshow('WhisprNet - Camera Feed', display_frame)
         cv2.waitKey(1)
+
+class LaneReceiver(CameraReceiver):
+    """Receive several independently modulated bit lanes and merge their stripes"""
+    def __init__(self, lanes, bit_duration_ms=None, **kwargs):
+        super().__init__(bit_duration_ms=bit_duration_ms, **kwargs)
+        self.lanes = [LaneDecoder(bit_duration_ms, self.soft_decision) for _ in range(lanes)]
+        self.assembler = StripeAssembler(lanes)
+        self._corrected = 0  # Byte errors FEC repaired in the last merged frame
     
-    def _try_decode_message(self, bit_buffer):
-        """Try to decode message from bit buffer"""
-        try:
-            # Convert bit list to string
-            bit_string = ''.join(bit_buffer)
+    def _reset_pipeline(self):
+        """Clear queued samples and the state of every lane"""
+        super()._reset_pipeline()
+        for lane in self.lanes:
+            lane.reset()
+        self.assembler.reset()
+        self.assembler.incomplete = 0
+    
+    def _resync(self):
+        """Restart every lane, e.g. after the ROI moved"""
+        super()._resync()
+        for lane in self.lanes:
+            lane.reset()
+        self.assembler.reset()
+    
+    def _lane_summary(self):
+        """Short description of the lane layout for the detection info"""
+        return f"Lanes: {len(self.lanes)}"
+    
+    def _stream_decoders(self):
+        """Every lane's streaming decoder"""
+        return [lane.stream_decoder for lane in self.lanes]
+    
+    def _process_sample(self, timestamp, brightness):
+        """Run every lane's sample through its own pipeline and merge the stripes"""
+        for index, lane in enumerate(self.lanes):
+            count, stripes = lane.push(timestamp, brightness[index])
+            self._bits_received += count
+            for stripe in stripes:
+                data = self.assembler.add(index, stripe)
+                if data is None:
+                    continue
+                try:
+                    data, sequence, self._corrected = unwrap_frame(data)
+                except ValueError:
+                    if self.info_callback:
+                        self.info_callback("Lane frame failed its CRC check")
+                    continue
+                if sequence is None and any(lane.stream_decoder.guessed for lane in self.lanes):
+                    continue  # Unframed, so nothing can vouch for the guessed symbols
+                self.metrics.count('symbols_guessed', sum(lane.stream_decoder.guessed for lane in self.lanes))
+                self.metrics.count('pairs_soft_decided', sum(lane.stream_decoder.soft_decided for lane in self.lanes))
+                self.metrics.count('fec_corrected_bytes', self._corrected)
+                if not self._deliver(data) and self.info_callback:
+                    self.info_callback("Lane message failed to decode")
+        
+        self._current_bit = self.lanes[0].bit
+        if self.info_callback:
+            period = self.lanes[0].clock_recovery.symbol_period
+            period_text = f"{period * 1000:.1f}ms" if period else "locking"
+            self.info_callback(f"Bits received: {self._bits_received} | {self._lane_summary()} | Symbol: {period_text} | Incomplete: {self.assembler.incomplete} | FEC fixed: {self._corrected}{self._transfer_summary()} | Dropped: {self.dropped_samples}")
+
+class GridReceiver(LaneReceiver):
+    """Receive from a sender showing a grid of independently modulated cells"""
+    def __init__(self, rows=2, cols=2, bit_duration_ms=None, **kwargs):
+        super().__init__(rows * cols, bit_duration_ms, **kwargs)
+        self.rows = rows
+        self.cols = cols
+        if self.locator:
+            self.locator.margin = 0.0  # Cells are laid out over the whole flicker region
+        self._regions_key = None
+        self._regions = None
+        self._frame_shape = None
+    
+    def grid_bounds(self, shape):
+        """Bounds of the whole grid: the locked ROI, or a centered square"""
+        if self.brightness_detector.roi:
+            return self.brightness_detector.roi
+        h, w = shape[:2]
+        half = min(h, w) // 4
+        return (w // 2 - half, h // 2 - half, w // 2 + half, h // 2 + half)
+    
+    def cell_regions(self, shape):
+        """Sampled region of every cell, recomputed only when the grid moves"""
+        bounds = self.grid_bounds(shape)
+        if bounds != self._regions_key:
+            self._regions = cell_bounds(bounds, self.rows, self.cols)
+            self._regions_key = bounds
+        return self._regions
+    
+    def _lane_summary(self):
+        """Grid layout for the detection info"""
+        return f"Cells: {self.rows}x{self.cols}"
+    
+    def _history_brightness(self):
+        """Per-cell brightness of the new grid in the locator's recent frames"""
+        regions = self.cell_regions(self._frame_shape)
+        return np.column_stack([self.locator.history_brightness(region) for region in regions])
+    
+    def _sample_brightness(self, data, source):
+        """Brightness of every cell, all read from the same frame in one pass"""
+        if not source.provides_frames:
+            return np.asarray(data, dtype=np.float64)
+        
+        if self.locator:
+            self.brightness_detector.roi = self.locator.feed(data, self.brightness_detector.pixel_format)
+        self._frame_shape = data.shape
+        return self.brightness_detector.get_regions_brightness(data, self.cell_regions(data.shape))
+    
+    def _detection_regions(self, shape):
+        """Every sampled cell"""
+        return self.cell_regions(shape)
+
+class ColorReceiver(LaneReceiver):
+    """Receive three bit lanes sent on the red, green and blue channels"""
+    def __init__(self, bit_duration_ms=None, replay_samples=256, **kwargs):
+        super().__init__(3, bit_duration_ms, **kwargs)
+        self.bit_duration_ms = bit_duration_ms
+        self.calibrator = CrossTalkCalibrator()
+        self._raw_samples = SampleBuffer(replay_samples, 3)  # BGR samples kept for decoding again after calibration
+    
+    def start_receiving(self, message_callback, info_callback, source=None, record_path=None):
+        """Start receiving, color lanes need frames with all three channels"""
+        if source and source.provides_frames and source.pixel_format != 'bgr':
+            raise ValueError("Color lanes need BGR frames")
+        super().start_receiving(message_callback, info_callback, source, record_path)
+    
+    def _reset_pipeline(self):
+        """Clear queued samples, lanes and the calibration"""
+        super()._reset_pipeline()
+        self.calibrator.reset()
+        self._raw_samples.clear()
+        for lane in self.lanes:
+            lane.clock_recovery.nominal_period = self.bit_duration_ms / 1000.0 if self.bit_duration_ms else None
+            lane.clock_recovery.reset()
+    
+    def _resync(self):
+        """Restart the lanes and look for a new preamble, e.g. after the ROI moved"""
+        super()._resync()
+        self.calibrator.reset()
+        self._raw_samples.clear()
+    
+    def _lane_summary(self):
+        """Calibration state for the detection info"""
+        return "Lanes: RGB" + (" (calibrated)" if self.calibrator.calibrated else " (uncalibrated)")
+    
+    def _history_brightness(self):
+        """Per-channel (BGR) brightness of the new ROI in the locator's recent frames"""
+        return self.locator.history_color(self.brightness_detector.roi)
+    
+    def _sample_brightness(self, data, source):
+        """Mean B, G and R of the ROI"""
+        if not source.provides_frames:
+            return np.asarray(data, dtype=np.float64)
+        
+        if self.locator:
+            self.brightness_detector.roi = self.locator.feed(data, self.brightness_detector.pixel_format)
+        return self.brightness_detector.get_region_color(data, self.brightness_detector.roi_bounds(data.shape))
+    
+    def _process_sample(self, timestamp, bgr):
+        """Calibrate on the preamble, then unmix each sample into the three lanes"""
+        self._raw_samples.append(timestamp, bgr)
+        
+        # A preamble only starts between messages, never look for one inside
+        # a frame. Once started, keep collecting: its plateaus can look like
+        # a start sync on a lane.
+        idle = not any(lane.stream_decoder.in_frame for lane in self.lanes)
+        if (idle or self.calibrator.collecting) and self.calibrator.feed(bgr, timestamp):
+            # The levels and the symbol clock are known now: decode the
+            # buffered samples again, the frames start right after them
+            for lane in self.lanes:
+                if not self.bit_duration_ms:
+                    lane.clock_recovery.nominal_period = self.calibrator.symbol_period
+                lane.reset()
+            self.assembler.reset()
+            for replay_timestamp, replay_bgr in zip(*self._raw_samples.window()):
+                super()._process_sample(replay_timestamp, self.calibrator.unmix(replay_bgr))
+            return
+        
+        super()._process_sample(timestamp, self.calibrator.unmix(bgr))
+
+class RollingShutterReceiver(CameraReceiver):
+    """Read several symbols per frame from the stripes a rolling shutter makes of a fast flicker
+    
+    CMOS sensors read their rows one after another, so each band of rows
+    is a brightness sample of its own, taken at the frame time plus the
+    band's readout delay. The bands go through the usual slicer, clock
+    recovery and decoder. The flicker has to fill the view (the sender's
+    Rows mode), and a symbol must outlast the blanking between frames,
+    which no row sees.
+    """
+    def __init__(self, refresh_hz=DEFAULT_REFRESH_HZ, row_step=DEFAULT_ROW_STEP, readout_fraction=DEFAULT_READOUT_FRACTION,
+                 **kwargs):
+        # The sender shows one symbol per display refresh
+        if not kwargs.get('bit_duration_ms'):
+            kwargs['bit_duration_ms'] = 1000.0 / refresh_hz
+        kwargs['auto_locate'] = False  # The whole view is the transmitter
+        super().__init__(**kwargs)
+        self.row_step = row_step
+        self.readout_fraction = readout_fraction  # Guess for the row time until the stripes are measured
+        self.row_timing = RowTimingEstimator(1.0 / refresh_hz)
+        self._frame_interval = None
+        self._last_frame = None
+    
+    def _reset_pipeline(self):
+        """Clear queued samples and the row timing of the last session"""
+        super()._reset_pipeline()
+        self.row_timing.reset()
+        self._frame_interval = None
+        self._last_frame = None
+    
+    def columns(self, shape):
+        """Column range the rows are averaged over: the middle half, clear of any bezel"""
+        w = shape[1]
+        return w // 4, w - w // 4
+    
+    def row_time(self, rows):
+        """Measured row readout time, or a guess from the frame interval"""
+        # A guess that is somewhat off only shifts edges by part of a
+        # symbol, and the clock recovery takes that up
+        if self.row_timing.row_time:
+            return self.row_timing.row_time
+        interval = self._frame_interval or 1.0 / self.camera_fps
+        return self.readout_fraction * interval / rows
+    
+    def _source_samples(self, timestamp, data, source):
+        """One sample per band of rows"""
+        if not source.provides_frames:
+            return [(timestamp, data)]  # A trace of an earlier session already holds the band samples
+        
+        if self._last_frame is not None and timestamp > self._last_frame:
+            interval = timestamp - self._last_frame
+            self._frame_interval = interval if self._frame_interval is None else \
+                self._frame_interval + 0.05 * (interval - self._frame_interval)
+        self._last_frame = timestamp
+        
+        profile = row_profile(data, self.columns(data.shape), source.pixel_format)
+        self.row_timing.feed(timestamp, profile, self._frame_interval)
+        return row_samples(timestamp, profile, self.row_time(len(profile)), self.row_step)
+    
+    def _new_samples(self, samples):
+        """Every band of the latest frame"""
+        return samples
+    
+    def _detection_regions(self, shape):
+        """The column band, over the full height"""
+        x1, x2 = self.columns(shape)
+        return [(x1, 0, x2, shape[0])]
+    
+    def metrics_snapshot(self):
+        """Link metrics plus the measured row readout time"""
+        if self.row_timing.row_time:
+            self.metrics.gauge('row_time_us', self.row_timing.row_time * 1e6)
+        return super().metrics_snapshot()
+
+class PamReceiver(CameraReceiver):
+    """Receive multi-level (PAM) symbols calibrated by the sender's ramp"""
+    def __init__(self, levels=4, bit_duration_ms=None, **kwargs):
+        super().__init__(bit_duration_ms=bit_duration_ms, **kwargs)
+        self.levels = levels
+        self.bit_duration_ms = bit_duration_ms  # Known symbol time, otherwise measured on the ramp
+        self.pam_calibrator = PamCalibrator(levels)
+        self.pam_decoder = PamDecoder(levels)
+        # Equal neighbouring symbols leave no edge, so runs get much longer than in Manchester
+        self.clock_recovery = ClockRecovery(
+            nominal_period=bit_duration_ms / 1000.0 if bit_duration_ms else None, max_run_symbols=32
+        )
+        self._last_symbol_time = None
+        self._current_level = 0
+    
+    def _reset_pipeline(self):
+        """Clear queued samples, the calibration and any partial frame"""
+        super()._reset_pipeline()
+        self.pam_calibrator.black = None
+        self.pam_calibrator.reset()
+        self.pam_decoder.reset()
+    
+    def _resync(self):
+        """Wait for a new ramp, e.g. after the ROI moved"""
+        super()._resync()
+        self.pam_calibrator.black = None
+        self.pam_calibrator.reset()
+        self.pam_decoder.reset()
+    
+    def _process_sample(self, timestamp, brightness):
+        """Calibrate on the ramp, then slice levels and decode the frame that follows"""
+        if self.pam_calibrator.thresholds is None:
+            if not self.pam_calibrator.feed(brightness, timestamp):
+                return
             
-            # Try to find and decode message
-            message = self.decoder.decode_message(bit_string)
-            return message
+            # Levels and clock are known, the frame starts after this gap sample
+            if not self.bit_duration_ms:
+                self.clock_recovery.nominal_period = self.pam_calibrator.symbol_period
+            self.clock_recovery.reset()
+            self.pam_decoder.reset()
+            self._last_symbol_time = timestamp
+            if self.info_callback:
+                self.info_callback(f"PAM-{self.levels} calibrated | Symbol: {self.pam_calibrator.symbol_period * 1000:.1f}ms")
+        
+        self._current_level = self.pam_calibrator.slice(brightness)
+        self._current_bit = int(self._current_level > (self.levels - 1) / 2)
+        symbols = self.clock_recovery.push(self._current_level, timestamp)
+        if symbols:
+            self._last_symbol_time = timestamp
+        elif timestamp - self._last_symbol_time > (self.clock_recovery.max_run_symbols + 2) * self.clock_recovery.symbol_period:
+            self._end_frame("PAM frame timed out")
+            return
+        
+        for level in symbols:
+            self._bits_received += self.pam_decoder.width
+            if self.bit_callback:
+                self.bit_callback(level)
             
-        except Exception as e:
-            # Decoding failed, continue collecting bits
-            return None
+            frame = self.pam_decoder.feed(level)
+            if frame is None:
+                continue
+            try:
+                payload, _, corrected = open_frame(frame)
+            except ValueError:
+                self._end_frame("PAM frame failed its CRC check")
+                return
+            self.metrics.count('fec_corrected_bytes', corrected)
+            self._end_frame(None if self._deliver(payload) else "PAM message failed to decode")
+            return
+        
+        if self.info_callback and symbols:
+            self.info_callback(f"Bits received: {self._bits_received} | PAM-{self.levels} | Level: {self._current_level} | Brightness: {brightness:.1f} | Symbol: {self.clock_recovery.symbol_period * 1000:.1f}ms | Dropped: {self.dropped_samples}")
+    
+    def _end_frame(self, problem):
+        """Go back to waiting for the next ramp"""
+        if problem and self.info_callback:
+            self.info_callback(problem)
+        self.pam_calibrator.reset()
+        self.pam_decoder.reset()
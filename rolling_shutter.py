@@ -0,0 +1,101 @@
+import numpy as np
+from collections import deque
+from utils import LUMA_WEIGHTS_BGR
+
+DEFAULT_ROW_STEP = 8             # Rows averaged into one sample
+DEFAULT_READOUT_FRACTION = 0.75  # Share of the frame interval spent reading rows, until it is measured
+MIN_CONTRAST = 12.0              # Frames with a flatter profile hold no stripes
+
+def row_profile(frame, columns=None, pixel_format='bgr'):
+    """Mean luma of every row of a frame, over an (x1, x2) column range"""
+    x1, x2 = columns or (0, frame.shape[1])
+    band = frame[:, x1:x2]
+    if band.ndim == 2:
+        return band.mean(axis=1)
+    if pixel_format != 'bgr':
+        return band[..., 0].mean(axis=1)  # Y plane of YUYV
+    # Channel means per row, then the luma weights: a single pass over the pixels
+    return band.mean(axis=1) @ LUMA_WEIGHTS_BGR / 256.0
+
+def bin_rows(profile, row_step=DEFAULT_ROW_STEP):
+    """(center row, mean) of every group of row_step rows"""
+    usable = len(profile) // row_step * row_step
+    values = profile[:usable].reshape(-1, row_step).mean(axis=1)
+    centers = np.arange(len(values)) * row_step + (row_step - 1) / 2.0
+    return centers, values
+
+def edge_rows(profile, min_contrast=MIN_CONTRAST):
+    """Rows where a profile crosses halfway between its extremes, interpolated between rows"""
+    low, high = float(profile.min()), float(profile.max())
+    if high - low < min_contrast:
+        return np.zeros(0)
+    middle = (low + high) / 2.0
+    above = profile > middle
+    index = np.nonzero(above[1:] != above[:-1])[0]
+    before, after = profile[index], profile[index + 1]
+    return index + (middle - before) / (after - before)
+
+class RowTimingEstimator:
+    """Row readout time of a rolling shutter, found from where the stripe edges fall
+    
+    Every stripe edge is a symbol boundary at the frame time plus its row
+    times the row time, and two edges are always a whole number of symbol
+    periods apart. The row time that puts consecutive edges closest to
+    whole periods wins. Consecutive edges are close in time, so a sender
+    clock running slightly off the nominal period does not matter. When
+    every edge lands on the same row (camera and display rates locked)
+    the row time makes no difference to decoding and stays unmeasured.
+    """
+    def __init__(self, symbol_period, min_fraction=0.25, candidates=256, min_pairs=24, min_score=0.7, min_contrast=0.3,
+                 history=128):
+        self.symbol_period = symbol_period
+        self.min_fraction = min_fraction  # Shortest readout considered, as a share of the frame interval
+        self.candidates = candidates
+        self.min_pairs = min_pairs        # Edge pairs on different rows needed for an estimate
+        self.min_score = min_score        # Phase coherence an estimate needs, 1 when every pair fits exactly
+        self.min_contrast = min_contrast  # How far the best fit has to stand out from the typical one
+        self._pairs = deque(maxlen=history)  # (time between frames, rows between edges) of consecutive edges
+        self.reset()
+    
+    def reset(self):
+        """Forget the edges seen so far"""
+        self._pairs.clear()
+        self._last_edge = None
+        self._fresh = 0
+        self.row_time = None
+        self.score = 0.0
+    
+    def feed(self, timestamp, profile, frame_interval):
+        """Take in the stripe edges of one row profile, True when the row time was updated"""
+        for row in edge_rows(profile).tolist():
+            if self._last_edge is not None:
+                elapsed = timestamp - self._last_edge[0]
+                if elapsed < 8 * self.symbol_period:
+                    self._pairs.append((elapsed, row - self._last_edge[1]))
+                    self._fresh += 1
+            self._last_edge = (timestamp, row)
+        
+        # Refit every few new pairs, not every frame
+        if self._fresh < self.min_pairs // 2 or not frame_interval:
+            return False
+        self._fresh = 0
+        pairs = np.array(self._pairs)
+        pairs = pairs[np.abs(pairs[:, 1]) > len(profile) / 8]  # Edges on nearby rows say little about the row time
+        if len(pairs) < self.min_pairs:
+            return False
+        
+        row_times = np.linspace(self.min_fraction, 1.0, self.candidates) * frame_interval / len(profile)
+        phases = (pairs[:, 0] + row_times[:, None] * pairs[:, 1]) / self.symbol_period
+        scores = np.abs(np.exp(2j * np.pi * phases).mean(axis=1))
+        best = int(np.argmax(scores))
+        # A flat score fits every row time about equally well, e.g. when the edges sit on few rows
+        if scores[best] < self.min_score or scores[best] - np.median(scores) < self.min_contrast:
+            return False
+        self.row_time = float(row_times[best])
+        self.score = float(scores[best])
+        return True
+
+def row_samples(timestamp, profile, row_time, row_step=DEFAULT_ROW_STEP):
+    """(timestamp, brightness) of every row band: the frame time plus the band's readout delay"""
+    centers, values = bin_rows(profile, row_step)
+    return list(zip((timestamp + centers * row_time).tolist(), values.tolist()))
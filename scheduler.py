@@ -0,0 +1,127 @@
+import time
+
+DEFAULT_REFRESH_HZ = 60.0  # Tk can not query the display, most panels run at 60 Hz
+SPIN_SECONDS = 0.002       # after() wakes up to a few ms late, so the last stretch is spun
+
+def frames_per_symbol(duration, refresh_hz=DEFAULT_REFRESH_HZ):
+    """Whole display frames closest to a symbol duration in seconds, at least one"""
+    return max(1, int(round(duration * refresh_hz)))
+
+def quantize_duration(duration, refresh_hz=DEFAULT_REFRESH_HZ):
+    """Symbol duration rounded to a whole number of display frames"""
+    # A symbol that ends mid-refresh is shown for one frame more or less than
+    # the next, which is exactly the jitter the receiver's clock has to fight
+    return frames_per_symbol(duration, refresh_hz) / refresh_hz
+
+class TimingStats:
+    """Running error between when symbols were due and when they were drawn"""
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self.reset()
+    
+    def reset(self):
+        """Forget every measurement"""
+        self.count = 0
+        self.total_error = 0.0  # Sum of absolute errors in seconds
+        self.max_error = 0.0
+        self.late = 0           # Symbols drawn a whole refresh or more after their deadline
+    
+    def add(self, error):
+        """Record one symbol's error in seconds, positive when late"""
+        self.count += 1
+        self.total_error += abs(error)
+        self.max_error = max(self.max_error, abs(error))
+        if error >= self.refresh_interval:
+            self.late += 1
+    
+    @property
+    def mean_error(self):
+        """Mean absolute error in seconds"""
+        return self.total_error / self.count if self.count else 0.0
+    
+    def summary(self):
+        """One line for the sender log"""
+        return (f"mean {self.mean_error * 1000:.2f}ms, max {self.max_error * 1000:.2f}ms, "
+                f"{self.late} of {self.count} symbols a frame or more late")
+
+class TransmissionScheduler:
+    """Show symbols on absolute monotonic deadlines, driven from the Tk main loop
+    
+    Deadlines are start + index * duration, never the previous symbol's
+    time plus a sleep, so a late symbol does not push the rest back. Tk's
+    after() gets close to each deadline and a short spin on perf_counter
+    covers the rest. Tk has no vsync hook, so symbols are aligned with the
+    display only in duration: whole frames at the configured refresh rate.
+    """
+    def __init__(self, widget, refresh_hz=DEFAULT_REFRESH_HZ, lead_time=0.1, metrics=None):
+        self.widget = widget          # Any Tk widget, used for after()
+        self.metrics = metrics        # Optional metrics.Metrics that also gets every symbol's error
+        self.refresh_hz = refresh_hz
+        self.lead_time = lead_time    # Head start before the first deadline, lets the window settle
+        self.stats = TimingStats(1.0 / refresh_hz)
+        self.running = False
+        self._job = None
+    
+    def run(self, symbols, duration, show, progress_callback=None, done_callback=None, total=None):
+        """Start showing an iterable of symbols, one every duration seconds
+        
+        show(symbol) draws one symbol, progress_callback gets the percentage
+        done and done_callback(completed) runs once the last symbol has had
+        its full duration or the run was cancelled.
+        """
+        self.stats.reset()
+        self.running = True
+        self._symbols = iter(symbols)
+        self._duration = duration
+        self._show = show
+        self._progress_callback = progress_callback
+        self._done_callback = done_callback
+        self._total = total
+        self._index = 0
+        self._start = time.perf_counter() + self.lead_time
+        self._schedule(self._start)
+    
+    def cancel(self):
+        """Stop before the next symbol"""
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+        if self.running:
+            self._finish(False)
+    
+    def _schedule(self, deadline):
+        """Wake up just before a deadline"""
+        delay = deadline - time.perf_counter() - SPIN_SECONDS
+        self._job = self.widget.after(max(0, int(delay * 1000)), self._tick)
+    
+    def _tick(self):
+        """Draw the symbol that is due, then aim at the next deadline"""
+        self._job = None
+        if not self.running:
+            return
+        deadline = self._start + self._index * self._duration
+        while time.perf_counter() < deadline:
+            pass
+        
+        symbol = next(self._symbols, None)
+        if symbol is None:
+            self._finish(True)  # The last symbol has now been up for its full duration
+            return
+        self._show(symbol)
+        error = time.perf_counter() - deadline
+        self.stats.add(error)
+        if self.metrics:
+            self.metrics.count('symbols_shown')
+            self.metrics.observe('timing_error_ms', abs(error) * 1000)
+            if error >= self.stats.refresh_interval:
+                self.metrics.count('late_symbols')
+        self._index += 1
+        if self._progress_callback and self._total:
+            self._progress_callback(min(100.0, self._index / self._total * 100))
+        self._schedule(self._start + self._index * self._duration)
+    
+    def _finish(self, completed):
+        """Hand the result to the done callback"""
+        self.running = False
+        if self._done_callback:
+            self._done_callback(completed)
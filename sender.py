@@ -1,115 +1,291 @@
-import tkinter as tk
+import math
 import time
-from encoder_decoder import ManchesterEncoder
+import itertools
+from encoder_decoder import make_encoder, bits_to_string
+from line_codes import get_line_code
+from framing import build_frame
+from fec import protect_frame
 from utils import create_sync_pattern
+from grid import grid_symbols
+from color import color_symbols, symbol_color
+from pam import pam_symbols, bits_per_symbol, level_color
+from chunking import split_transfer, carousel, DEFAULT_CHUNK_SIZE
+from fountain import FountainEncoder
+from scheduler import TransmissionScheduler, DEFAULT_REFRESH_HZ, quantize_duration, frames_per_symbol
+from metrics import Metrics
 
 class ScreenFlicker:
-    def __init__(self):
-        self.encoder = ManchesterEncoder()
+    def __init__(self, rows=1, cols=1, cell_size=100, color=False, levels=2, line_code='manchester'):
+        self.line_code = line_code  # Manchester, or a denser block code announced in the frame header
+        self.sequence = 0           # Frame sequence number of the next message
+        self.fec_level = 0          # Reed-Solomon redundancy level, 0 sends no parity
+        self.compress = False       # Deflate the payload when that makes it shorter
+        self.chunk_size = DEFAULT_CHUNK_SIZE  # Data bytes per chunk of a file transfer
+        self.rows = rows            # Grid of independently modulated cells, 1x1 is a single square
+        self.cols = cols
+        self.cell_size = cell_size  # Edge of one flicker cell in pixels
+        self.color = color          # Send three lanes on the red, green and blue channels
+        self.levels = levels        # Brightness levels per symbol, more than 2 sends PAM
+        self.fullscreen = False     # Rows mode: one cell filling the screen, one symbol per display refresh
         self.flicker_window = None
+        self.flicker_rects = []
         self.is_transmitting = False
+        self.refresh_hz = DEFAULT_REFRESH_HZ  # Symbol durations are whole frames at this rate
+        self.scheduler = None
+        self.metrics = Metrics()  # Encode times and symbol timing error across transmissions
         
-    def send_message(self, message, bit_duration_ms=100, progress_callback=None, log_callback=None):
-        """Send message using screen flickers"""
+    def send_message(self, message, bit_duration_ms=100, progress_callback=None, log_callback=None, done_callback=None):
+        """Send message using screen flickers, from the Tk main loop (returns right away)"""
         if self.is_transmitting:
             return
-            
-        self.is_transmitting = True
         
-        try:
-            # Encode message
-            if log_callback:
-                log_callback("🔄 Encoding message...")
-            
-            encoded_bits = self.encoder.encode_message(message)
-            total_bits = len(encoded_bits)
-            
-            if log_callback:
+        # Encode message
+        if log_callback:
+            log_callback("🔄 Encoding message...")
+        
+        cells = self.rows * self.cols
+        encoded_bits = self.encode_payload(message)
+        total_bits = len(encoded_bits)
+        duration = self.symbol_duration(bit_duration_ms, log_callback)
+        
+        if log_callback:
+            if self.levels > 2:
+                log_callback(f"📊 Encoded {len(message)} characters into {total_bits} symbols of {bits_per_symbol(self.levels)} bits")
+            elif self.color:
+                log_callback(f"📊 Encoded {len(message)} characters into {total_bits} bits on each of 3 color lanes")
+            elif cells > 1:
+                log_callback(f"📊 Encoded {len(message)} characters into {total_bits} bits on each of {cells} cells")
+            else:
                 log_callback(f"📊 Encoded {len(message)} characters into {total_bits} bits")
-                log_callback(f"⏱️ Estimated transmission time: {(total_bits * bit_duration_ms) / 1000:.1f} seconds")
-            
-            # Create flicker window
-            self.create_flicker_window()
-            
-            # Convert bit duration to seconds
-            bit_duration = bit_duration_ms / 1000.0
-            
-            # Transmit bits
-            if log_callback:
-                log_callback("🚀 Starting transmission...")
-            
-            for i, bit in enumerate(encoded_bits):
-                if not self.is_transmitting:  # Check for cancellation
-                    break
-                    
-                # Update flicker window
-                self.update_flicker(bit == '1')
-                
-                # Update progress
-                if progress_callback:
-                    progress = (i + 1) / total_bits * 100
-                    progress_callback(progress)
-                
-                # Wait for bit duration
-                time.sleep(bit_duration)
-            
-            # Final black screen
-            self.update_flicker(False)
-            time.sleep(bit_duration)
-            
+            if self.levels <= 2 and self.line_code != 'manchester':
+                balance = "DC balanced" if get_line_code(self.line_code).dc_balanced else "not DC balanced, 8B10B is"
+                log_callback(f"📐 Line code: {self.line_code.upper()} ({balance}), announced in the frame header")
+            log_callback(f"⏱️ Estimated transmission time: {(total_bits + 1) * duration:.1f} seconds")
+            log_callback("🚀 Starting transmission...")
+        
+        self.start_transmission(self.packet_symbols([encoded_bits]), duration, total_bits + 1,
+                                progress_callback, log_callback, done_callback)
+    
+    def send_data(self, data, name='', bit_duration_ms=100, rounds=3, progress_callback=None, log_callback=None, done_callback=None):
+        """Send bytes (e.g. a file) as numbered chunks, looping the carousel so missed chunks come round again"""
+        if self.is_transmitting:
+            return
+        
+        # Every chunk is framed on its own, so the receiver checks each one separately
+        packets = [self.encode_payload(chunk) for chunk in split_transfer(data, name, self.chunk_size)]
+        lap_bits = sum(len(packet) + 1 for packet in packets)  # Plus the black gap after each
+        duration = self.symbol_duration(bit_duration_ms, log_callback)
+        if log_callback:
+            log_callback(f"📦 Split {len(data)} bytes into {len(packets)} chunks of up to {self.chunk_size} bytes")
+            log_callback(f"⏱️ Estimated time per lap: {lap_bits * duration:.1f} seconds, {rounds} laps")
+        
+        def laps():
+            for lap, index, packet in carousel(packets, rounds):
+                if index == 0 and log_callback:
+                    log_callback(f"🔁 Lap {lap + 1} of {rounds}")
+                yield packet
+        
+        self.start_transmission(self.packet_symbols(laps()), duration, rounds * lap_bits,
+                                progress_callback, log_callback, done_callback)
+    
+    def send_fountain(self, data, name='', bit_duration_ms=100, symbols_per_block=2.0, progress_callback=None, log_callback=None, done_callback=None):
+        """Send bytes as fountain-coded symbols, any K(1+e) of which rebuild the K source blocks"""
+        if self.is_transmitting:
+            return
+        
+        # Without a back-channel the sender can not tell when to stop, so it sends a
+        # fixed number of symbols. Every one of them is new to the receiver, unlike a
+        # carousel lap, which repeats chunks it may already have.
+        encoder = FountainEncoder(data, name, self.chunk_size)
+        count = math.ceil(encoder.k * symbols_per_block)
+        packets = (self.encode_payload(symbol) for symbol in encoder.symbols(count))
+        first = next(packets)
+        total = count * (len(first) + 1)
+        duration = self.symbol_duration(bit_duration_ms, log_callback)
+        if log_callback:
+            log_callback(f"⛲ Split {len(data)} bytes into {encoder.k} blocks of {self.chunk_size} bytes, sending {count} fountain symbols")
+            log_callback(f"⏱️ Estimated transmission time: {total * duration:.1f} seconds")
+        
+        self.start_transmission(self.packet_symbols(itertools.chain([first], packets)), duration, total,
+                                progress_callback, log_callback, done_callback)
+    
+    def symbol_duration(self, bit_duration_ms, log_callback=None):
+        """Symbol duration in seconds, rounded to whole display frames"""
+        if self.fullscreen:
+            # The rolling shutter receiver reads several symbols per camera frame and expects exactly this
             if log_callback:
-                log_callback("✅ Transmission sequence completed")
-                
-        finally:
+                log_callback(f"🖥️ Rows mode: one symbol per display refresh ({1000.0 / self.refresh_hz:.1f}ms)")
+            return 1.0 / self.refresh_hz
+        duration = quantize_duration(bit_duration_ms / 1000.0, self.refresh_hz)
+        if log_callback and abs(duration * 1000 - bit_duration_ms) >= 0.05:
+            log_callback(f"🖥️ Symbol time rounded to {duration * 1000:.1f}ms "
+                         f"({frames_per_symbol(duration, self.refresh_hz)} frames at {self.refresh_hz:g} Hz)")
+        return duration
+    
+    def packet_symbols(self, packets):
+        """Every symbol of every packet, each packet followed by one black symbol"""
+        for packet in packets:
+            yield from packet
+            yield self.blank_symbol()
+    
+    def blank_symbol(self):
+        """All-black symbol for the current mode"""
+        if self.levels > 2:
+            return 0
+        if self.color:
+            return (0, 0, 0)
+        if self.rows * self.cols > 1:
+            return [0] * (self.rows * self.cols)
+        return '0'
+    
+    def start_transmission(self, symbols, duration, total=None, progress_callback=None, log_callback=None, done_callback=None):
+        """Open the flicker window and let the scheduler show the symbols"""
+        self.is_transmitting = True
+        self.create_flicker_window()
+        self.scheduler = TransmissionScheduler(self.flicker_window, self.refresh_hz, metrics=self.metrics)
+        
+        def finished(completed):
             self.is_transmitting = False
             self.close_flicker_window()
+            if log_callback:
+                log_callback(f"⏲️ Timing error: {self.scheduler.stats.summary()}")
+                log_callback("✅ Transmission sequence completed" if completed else "⏹️ Transmission cancelled")
+            if done_callback:
+                done_callback(completed)
+        
+        self.scheduler.run(symbols, duration, self.show_symbol, progress_callback, finished, total)
+    
+    def show_symbol(self, symbol):
+        """Draw one symbol of the current mode"""
+        if self.levels > 2:
+            self.update_level(symbol)
+        elif self.color:
+            self.update_color(symbol)
+        elif self.rows * self.cols > 1:
+            self.update_cells(symbol)
+        else:
+            self.update_flicker(symbol == '1')
+    
+    def encode_payload(self, message):
+        """Symbols of one message (text, or bytes such as a chunk) for the current mode"""
+        started = time.perf_counter()
+        encoder = make_encoder(self.line_code)
+        if self.levels > 2:
+            # Calibration ramp, then several bits per symbol on gray levels
+            encoded_bits = pam_symbols(message, self.levels, self.sequence, self.fec_level, self.compress)
+        elif self.color:
+            # Calibration preamble, then one stripe per color channel
+            encoded_bits = color_symbols(message, encoder, self.sequence, self.fec_level, self.compress)
+        elif self.rows * self.cols > 1:
+            # A grid sends one stripe of the message per cell, all in parallel
+            encoded_bits = grid_symbols(message, self.rows, self.cols, encoder, self.sequence, self.fec_level, self.compress)
+        else:
+            # Framed, so the receiver knows the length up front and can check the CRC
+            data = message.encode('utf-8') if isinstance(message, str) else bytes(message)
+            frame = protect_frame(build_frame(data, self.sequence, self.fec_level, self.compress))
+            encoded_bits = bits_to_string(encoder.encode_bytes(frame))
+        self.sequence = (self.sequence + 1) & 0xFF
+        self.metrics.count('packets_encoded')
+        self.metrics.observe('encode_ms', (time.perf_counter() - started) * 1000)
+        return encoded_bits
     
     def create_flicker_window(self):
         """Create the flicker window"""
+        import tkinter as tk  # Imported here so symbols can be encoded without a display
         self.flicker_window = tk.Toplevel()
         self.flicker_window.title("WhisprNet - Transmitting")
-        self.flicker_window.geometry("200x200+100+100")  # 200x200 window at position 100,100
-        self.flicker_window.resizable(False, False)
         self.flicker_window.attributes('-topmost', True)  # Keep on top
+        if self.fullscreen:
+            self.create_fullscreen_cell()
+            return
+        # Cells sit 50px in from every edge, a single cell gives the classic 200x200 window
+        width = self.cols * self.cell_size + 100
+        height = self.rows * self.cell_size + 100
+        self.flicker_window.geometry(f"{width}x{height}+100+100")
+        self.flicker_window.resizable(False, False)
         
         # Create flicker area (canvas)
         self.flicker_canvas = tk.Canvas(
             self.flicker_window, 
-            width=200, 
-            height=200, 
+            width=width, 
+            height=height, 
             highlightthickness=0
         )
         self.flicker_canvas.pack()
         
-        # Create the flicker rectangle (100x100 in center)
-        self.flicker_rect = self.flicker_canvas.create_rectangle(
-            50, 50, 150, 150,  # 100x100 rectangle in center
-            fill='black',
-            outline='gray',
-            width=2
-        )
+        # Create the flicker cells, row by row (one 100x100 rectangle in center by default)
+        self.flicker_rects = []
+        for row in range(self.rows):
+            for col in range(self.cols):
+                x = 50 + col * self.cell_size
+                y = 50 + row * self.cell_size
+                self.flicker_rects.append(self.flicker_canvas.create_rectangle(
+                    x, y, x + self.cell_size, y + self.cell_size,
+                    fill='black',
+                    outline='gray',
+                    width=2
+                ))
+        self.flicker_rect = self.flicker_rects[0]
         
         # Add instruction text
         self.flicker_canvas.create_text(
-            100, 25, 
+            width // 2, 25, 
             text="Transmitting...", 
             fill='blue',
             font=('Arial', 10, 'bold')
         )
         
         self.flicker_canvas.create_text(
-            100, 175, 
+            width // 2, height - 25, 
             text="Point camera here", 
             fill='blue',
             font=('Arial', 8)
         )
     
+    def create_fullscreen_cell(self):
+        """Fill the whole screen with one cell, the camera's rows all have to see it"""
+        import tkinter as tk
+        width = self.flicker_window.winfo_screenwidth()
+        height = self.flicker_window.winfo_screenheight()
+        self.flicker_window.attributes('-fullscreen', True)
+        self.flicker_window.configure(cursor='none')
+        self.flicker_canvas = tk.Canvas(self.flicker_window, width=width, height=height, highlightthickness=0, bg='black')
+        self.flicker_canvas.pack(fill=tk.BOTH, expand=True)
+        self.flicker_rects = [self.flicker_canvas.create_rectangle(0, 0, width, height, fill='black', width=0)]
+        self.flicker_rect = self.flicker_rects[0]
+        # Escape is the only way out of a full-screen window
+        self.flicker_window.bind('<Escape>', lambda event: self.stop_transmission())
+    
     def update_flicker(self, is_high):
         """Update flicker state"""
         if self.flicker_window and self.flicker_canvas:
             color = 'white' if is_high else 'black'
-            self.flicker_canvas.itemconfig(self.flicker_rect, fill=color)
-            self.flicker_window.update()
+            for rect in self.flicker_rects:
+                self.flicker_canvas.itemconfig(rect, fill=color)
+            self.flicker_window.update_idletasks()  # Draw now, not when the main loop gets round to it
+    
+    def update_cells(self, levels):
+        """Set every grid cell from its own symbol"""
+        if self.flicker_window and self.flicker_canvas:
+            for rect, level in zip(self.flicker_rects, levels):
+                self.flicker_canvas.itemconfig(rect, fill='white' if level else 'black')
+            self.flicker_window.update_idletasks()
+    
+    def update_color(self, levels):
+        """Show one (r, g, b) symbol on every cell"""
+        if self.flicker_window and self.flicker_canvas:
+            color = symbol_color(levels)
+            for rect in self.flicker_rects:
+                self.flicker_canvas.itemconfig(rect, fill=color)
+            self.flicker_window.update_idletasks()
+    
+    def update_level(self, level):
+        """Show one PAM symbol level on every cell"""
+        if self.flicker_window and self.flicker_canvas:
+            color = level_color(level, self.levels)
+            for rect in self.flicker_rects:
+                self.flicker_canvas.itemconfig(rect, fill=color)
+            self.flicker_window.update_idletasks()
     
     def close_flicker_window(self):
         """Close the flicker window"""
@@ -119,4 +295,6 @@ class ScreenFlicker:
     
     def stop_transmission(self):
         """Stop ongoing transmission"""
+        if self.scheduler and self.scheduler.running:
+            self.scheduler.cancel()
         self.is_transmitting = False
@@ -0,0 +1,207 @@
+import numpy as np
+from encoder_decoder import ManchesterEncoder, string_to_bits
+
+ROW_EXPOSURE_MS = 4.0  # Short exposure a camera settles on close to a bright screen
+
+class OpticalChannelSimulator:
+    """Turn a transmitted symbol stream into camera brightness samples"""
+    def __init__(self, fps=30.0, exposure_ms=None, low=30.0, high=220.0, noise_std=3.0,
+                 ambient_drift=2.0, sleep_overshoot_ms=1.0, jitter_ms=0.5, frame_jitter_ms=0.2,
+                 lead_ms=500.0, tail_ms=1000.0, scheduled=False, seed=None):
+        self.fps = fps
+        self.exposure_ms = exposure_ms                # Defaults to half the frame interval
+        self.low = low                                # ROI brightness of a black symbol
+        self.high = high                              # ROI brightness of a white symbol
+        self.noise_std = noise_std                    # Per-frame sensor noise
+        self.ambient_drift = ambient_drift            # Random walk of room light, units per sqrt(s)
+        self.sleep_overshoot_ms = sleep_overshoot_ms  # Mean time.sleep() overshoot per symbol
+        self.jitter_ms = jitter_ms                    # Extra symbol timing jitter (std)
+        self.frame_jitter_ms = frame_jitter_ms        # Camera frame timestamp jitter (std)
+        self.lead_ms = lead_ms                        # Idle black screen before the frame
+        self.tail_ms = tail_ms                        # Idle black screen after the frame
+        self.scheduled = scheduled                    # Sender runs on absolute deadlines (see scheduler.py)
+        self.rng = np.random.default_rng(seed)
+    
+    def symbol_edges(self, count, bit_duration_ms):
+        """Start times of each symbol plus the end of the last one, in seconds"""
+        if self.scheduled:
+            # Every symbol aims at its own deadline, so lateness stays with the
+            # symbol it happened to instead of pushing the rest back
+            lateness = np.zeros(count + 1)
+            if self.sleep_overshoot_ms > 0:
+                lateness += self.rng.exponential(self.sleep_overshoot_ms, count + 1)
+            if self.jitter_ms > 0:
+                lateness += self.rng.normal(0.0, self.jitter_ms, count + 1)
+            edges = self.lead_ms + np.arange(count + 1) * bit_duration_ms + np.maximum(lateness, 0.0)
+            return np.maximum.accumulate(edges) / 1000.0
+        
+        # A sender that sleeps once per symbol lets every overshoot push all
+        # later symbols back: the drift accumulates instead of averaging out
+        durations = np.full(count, bit_duration_ms, dtype=np.float64)
+        if self.sleep_overshoot_ms > 0:
+            durations += self.rng.exponential(self.sleep_overshoot_ms, count)
+        if self.jitter_ms > 0:
+            durations += self.rng.normal(0.0, self.jitter_ms, count)
+        durations = np.maximum(durations, 0.0) / 1000.0
+        
+        edges = np.empty(count + 1, dtype=np.float64)
+        edges[0] = self.lead_ms / 1000.0
+        np.cumsum(durations, out=edges[1:])
+        edges[1:] += edges[0]
+        return edges
+    
+    def simulate(self, symbols, bit_duration_ms):
+        """Return (timestamps, brightness) arrays for a '0'/'1' string or bit array
+        
+        A (symbols, cells) array simulates a grid: every cell shares the
+        symbol timing and brightness gets one column per cell.
+        """
+        if isinstance(symbols, str):
+            symbols = string_to_bits(symbols)
+        levels = np.asarray(symbols, dtype=np.float64)
+        
+        edges = self.symbol_edges(len(levels), bit_duration_ms)
+        end_time = edges[-1] + self.tail_ms / 1000.0
+        
+        # Frame capture times, starting at a random phase of the symbol clock
+        interval = 1.0 / self.fps
+        timestamps = self.rng.uniform(0.0, interval) + np.arange(0.0, end_time, interval)
+        if self.frame_jitter_ms > 0:
+            timestamps += self.rng.normal(0.0, self.frame_jitter_ms / 1000.0, len(timestamps))
+        
+        # Each frame integrates the screen over its exposure window, so
+        # frames straddling a symbol boundary see a mix of both levels
+        exposure = (self.exposure_ms / 1000.0) if self.exposure_ms else interval / 2.0
+        on_fraction = (self._on_time(edges, levels, timestamps) -
+                       self._on_time(edges, levels, timestamps - exposure)) / exposure
+        
+        brightness = self.low + (self.high - self.low) * on_fraction
+        if self.ambient_drift > 0:
+            steps = self.rng.normal(0.0, self.ambient_drift * np.sqrt(interval), len(timestamps))
+            brightness += np.cumsum(steps).reshape((-1,) + (1,) * (levels.ndim - 1))
+        if self.noise_std > 0:
+            brightness += self.rng.normal(0.0, self.noise_std, brightness.shape)
+        
+        return timestamps, np.clip(brightness, 0.0, 255.0)
+    
+    def simulate_rows(self, symbols, bit_duration_ms, rows=480, readout_fraction=0.8, width=16):
+        """Return (timestamps, gray frames) of a rolling shutter camera filled by the flicker
+        
+        Rows are read one after another over readout_fraction of the frame
+        interval, so a fast flicker shows up as stripes; the blanking gap
+        in the rest of the interval is seen by no row. Each row integrates
+        the screen over the exposure (ROW_EXPOSURE_MS unless set).
+        """
+        if isinstance(symbols, str):
+            symbols = string_to_bits(symbols)
+        levels = np.asarray(symbols, dtype=np.float64)
+        
+        edges = self.symbol_edges(len(levels), bit_duration_ms)
+        end_time = edges[-1] + self.tail_ms / 1000.0
+        interval = 1.0 / self.fps
+        timestamps = self.rng.uniform(0.0, interval) + np.arange(0.0, end_time, interval)
+        if self.frame_jitter_ms > 0:
+            timestamps += self.rng.normal(0.0, self.frame_jitter_ms / 1000.0, len(timestamps))
+        
+        # Row r starts its exposure r row times after the frame's first row
+        row_times = (timestamps[:, np.newaxis] + np.arange(rows) * (readout_fraction * interval / rows)).ravel()
+        exposure = (self.exposure_ms or ROW_EXPOSURE_MS) / 1000.0
+        on_fraction = (self._on_time(edges, levels, row_times) -
+                       self._on_time(edges, levels, row_times - exposure)) / exposure
+        profiles = self.low + (self.high - self.low) * on_fraction.reshape(len(timestamps), rows)
+        if self.ambient_drift > 0:
+            steps = self.rng.normal(0.0, self.ambient_drift * np.sqrt(interval), len(timestamps))
+            profiles += np.cumsum(steps)[:, np.newaxis]
+        
+        # Frame by frame, so pixel noise never needs the whole capture in floats
+        frames = np.empty((len(timestamps), rows, width), dtype=np.uint8)
+        for index, profile in enumerate(profiles):
+            noise = self.rng.normal(0.0, self.noise_std, (rows, width)) if self.noise_std > 0 else 0.0
+            frames[index] = np.clip(profile[:, np.newaxis] + noise, 0.0, 255.0)
+        return timestamps, frames
+    
+    def simulate_message(self, message, bit_duration_ms, encoder=None):
+        """Encode a message like the sender does and run it through the channel"""
+        encoder = encoder or ManchesterEncoder()
+        return self.simulate(encoder.encode_message(message), bit_duration_ms)
+    
+    def _on_time(self, edges, levels, times):
+        """Total time the screen was white between the first edge and each time"""
+        # Cumulative on-time at every edge, then linear inside the symbol.
+        # Grid levels carry one column per cell, times broadcast over them.
+        durations = np.diff(edges).reshape((-1,) + (1,) * (levels.ndim - 1))
+        on_at_edges = np.concatenate((np.zeros((1,) + levels.shape[1:]), np.cumsum(levels * durations, axis=0)))
+        index = np.clip(np.searchsorted(edges, times, side='right') - 1, 0, len(levels))
+        
+        current_level = np.zeros((len(times),) + levels.shape[1:])
+        inside = index < len(levels)
+        current_level[inside] = levels[index[inside]]
+        
+        column = (-1,) + (1,) * (levels.ndim - 1)
+        elapsed = np.maximum(times - edges[index], 0.0).reshape(column)
+        on_time = on_at_edges[index] + current_level * elapsed
+        return np.where((times < edges[0]).reshape(column), 0.0, on_time)
+
+def decode_samples(timestamps, brightness, receiver=None, bit_duration_ms=None, soft_decision=True):
+    """Run simulated samples through the receiver decode path, return (messages, bits)"""
+    # Imported here so the channel model itself stays free of OpenCV
+    from receiver import CameraReceiver
+    from sources import ArraySource
+    
+    receiver = receiver or CameraReceiver(show_preview=False, bit_duration_ms=bit_duration_ms, soft_decision=soft_decision)
+    bits = []
+    receiver.bit_callback = bits.append
+    try:
+        messages = receiver.decode_source(ArraySource(timestamps, brightness))
+    finally:
+        receiver.bit_callback = None
+    return messages, bits
+
+def symbol_error_rate(sent, received, sync="11110000"):
+    """Symbol error rate of a received bit list, aligned on the start sync"""
+    sent = sent if isinstance(sent, str) else ''.join(str(int(b)) for b in sent)
+    received = ''.join(str(int(b)) for b in received)
+    
+    start = received.find(sync)
+    if start == -1:
+        return 1.0
+    
+    expected = sent[sent.find(sync):]
+    observed = received[start:start + len(expected)]
+    errors = sum(1 for a, b in zip(expected, observed) if a != b)
+    errors += len(expected) - len(observed)  # Missing symbols count as errors
+    return errors / len(expected)
+
+def sweep(message, bit_durations_ms, trials=10, seed=0, nominal_clock=False, encoder=None, soft_decision=True,
+          **channel_options):
+    """Measure delivery rate, goodput and symbol error rate against bit duration"""
+    encoder = encoder or ManchesterEncoder()
+    symbols = encoder.encode_message(message)
+    payload_bits = len(message.encode('utf-8')) * 8
+    results = []
+    
+    for index, bit_duration_ms in enumerate(bit_durations_ms):
+        simulator = OpticalChannelSimulator(seed=seed + index, **channel_options)
+        delivered = 0
+        error_rates = []
+        
+        for _ in range(trials):
+            timestamps, brightness = simulator.simulate(symbols, bit_duration_ms)
+            messages, bits = decode_samples(
+                timestamps, brightness, bit_duration_ms=bit_duration_ms if nominal_clock else None,
+                soft_decision=soft_decision
+            )
+            delivered += int(message in messages)
+            error_rates.append(symbol_error_rate(symbols, bits))
+        
+        airtime = len(symbols) * bit_duration_ms / 1000.0
+        success_rate = delivered / trials
+        results.append({
+            'bit_duration_ms': bit_duration_ms,
+            'frames_per_symbol': bit_duration_ms / 1000.0 * simulator.fps,
+            'success_rate': success_rate,
+            'symbol_error_rate': float(np.mean(error_rates)),
+            'goodput_bps': success_rate * payload_bits / airtime,
+        })
+    
+    return results
@@ -0,0 +1,240 @@
+import time
+import numpy as np
+
+# OpenCV is only needed to read camera or video frames. This module and the
+# frame handling in utils, localization and receiver import cv2 inside the
+# methods that use it, so only camera and video sources ever load it
+
+class CameraSource:
+    """Live camera frames from cv2.VideoCapture"""
+    realtime = True        # Samples arrive at camera speed and may be dropped
+    provides_frames = True
+    
+    def __init__(self, index=0, width=640, height=480, fps=30, raw_yuv=False):
+        self.index = index
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.raw_yuv = raw_yuv  # Skip the backend's BGR conversion, read luma from Y
+        self.pixel_format = 'yuyv' if raw_yuv else 'bgr'
+        self.cap = None
+        self._use_camera_clock = None
+    
+    def open(self):
+        """Open the camera"""
+        import cv2
+        self.cap = cv2.VideoCapture(self.index)
+        if not self.cap.isOpened():
+            self.cap = None
+            raise Exception("Could not open camera")
+        
+        # Set camera properties for better performance
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        self.cap.set(cv2.CAP_PROP_FPS, self.fps)
+        if self.raw_yuv:
+            self.cap.set(cv2.CAP_PROP_CONVERT_RGB, 0)
+        self._use_camera_clock = None
+    
+    def read(self):
+        """Read one frame, return (ok, timestamp, frame)"""
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None, None
+        return True, self._frame_timestamp(), frame
+    
+    def at_end(self):
+        """A camera never runs out of frames"""
+        return False
+    
+    def close(self):
+        """Release the camera"""
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+    
+    def _frame_timestamp(self):
+        """Timestamp of the frame just read, in seconds"""
+        import cv2
+        # Prefer the camera's own clock when the backend provides one,
+        # decided once per session so timestamps never mix clocks
+        if self._use_camera_clock is None:
+            self._use_camera_clock = self.cap.get(cv2.CAP_PROP_POS_MSEC) > 0
+        
+        if self._use_camera_clock:
+            return self.cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0
+        return time.monotonic()
+
+class VideoFileSource:
+    """Frames from a recorded video file, read as fast as they decode"""
+    realtime = False
+    provides_frames = True
+    pixel_format = 'bgr'
+    
+    def __init__(self, path):
+        self.path = path
+        self.cap = None
+        self.fps = None
+        self._frame_index = 0
+        self._finished = False
+    
+    def open(self):
+        """Open the video file"""
+        import cv2
+        self.cap = cv2.VideoCapture(self.path)
+        if not self.cap.isOpened():
+            self.cap = None
+            raise Exception(f"Could not open video file: {self.path}")
+        
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._frame_index = 0
+        self._finished = False
+    
+    def read(self):
+        """Read one frame, return (ok, timestamp, frame)"""
+        import cv2
+        ret, frame = self.cap.read()
+        if not ret:
+            self._finished = True
+            return False, None, None
+        
+        # Container timestamps survive variable frame rate recordings,
+        # fall back to the nominal rate when the backend has none
+        pos_msec = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if pos_msec > 0 or self._frame_index == 0:
+            timestamp = pos_msec / 1000.0
+        else:
+            timestamp = self._frame_index / self.fps
+        self._frame_index += 1
+        return True, timestamp, frame
+    
+    def at_end(self):
+        """Whether the whole file has been read"""
+        return self._finished
+    
+    def close(self):
+        """Release the video file"""
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+class ArraySource:
+    """In-memory (timestamp, brightness) samples, e.g. from the channel simulator
+    
+    Brightness may have one column per lane (grid cells, or B, G and R),
+    read() then returns each sample's lanes as an array.
+    """
+    realtime = False
+    provides_frames = False  # read() returns brightness values, not frames
+    
+    def __init__(self, timestamps, brightness):
+        self._timestamps = timestamps
+        self._brightness = brightness
+        self.samples = None
+        self._position = 0
+    
+    def open(self):
+        """Stack the sample arrays"""
+        self.samples = np.column_stack((self._timestamps, self._brightness))
+        self._position = 0
+    
+    def read(self):
+        """Read one sample, return (ok, timestamp, brightness)"""
+        if self._position >= len(self.samples):
+            return False, None, None
+        
+        sample = self.samples[self._position]
+        self._position += 1
+        if len(sample) == 2:
+            return True, float(sample[0]), float(sample[1])
+        return True, float(sample[0]), np.array(sample[1:])
+    
+    def iter_samples(self, chunk_size=65536):
+        """Yield the remaining samples as plain floats (lane arrays), a chunk at a time"""
+        while self._position < len(self.samples):
+            chunk = self.samples[self._position:self._position + chunk_size]
+            self._position += len(chunk)
+            if chunk.shape[1] == 2:
+                yield from chunk.tolist()
+            else:
+                yield from zip(chunk[:, 0].tolist(), np.array(chunk[:, 1:]))
+    
+    def at_end(self):
+        """Whether every sample has been read"""
+        return self.samples is not None and self._position >= len(self.samples)
+    
+    def close(self):
+        """Drop the samples"""
+        self.samples = None
+
+class TraceSource(ArraySource):
+    """Recorded (timestamp, brightness...) samples from a .npy trace file"""
+    def __init__(self, path):
+        super().__init__(None, None)
+        self.path = path
+    
+    def open(self):
+        """Memory-map the trace so hours of samples never load at once"""
+        self.samples = load_trace(self.path)
+        self._position = 0
+
+class TraceRecorder:
+    """Collect (timestamp, brightness) samples and save them as a trace, one column per lane"""
+    def __init__(self, chunk_size=4096):
+        self.chunk_size = chunk_size
+        self.clear()
+    
+    def clear(self):
+        """Discard recorded samples"""
+        self._chunks = []
+        self._chunk = None  # Sized by the first sample, single or multi-lane
+        self._fill = 0
+    
+    def add(self, timestamp, brightness):
+        """Record one sample"""
+        if self._chunk is None:
+            self._chunk = np.empty((self.chunk_size, 1 + np.size(brightness)), dtype=np.float64)
+        self._chunk[self._fill, 0] = timestamp
+        self._chunk[self._fill, 1:] = brightness
+        self._fill += 1
+        
+        if self._fill == self.chunk_size:
+            self._chunks.append(self._chunk)
+            self._chunk = np.empty_like(self._chunk)
+            self._fill = 0
+    
+    def size(self):
+        """Number of recorded samples"""
+        return len(self._chunks) * self.chunk_size + self._fill
+    
+    def to_array(self):
+        """All recorded samples as an (N, 1 + lanes) array"""
+        if self._chunk is None:
+            return np.empty((0, 2), dtype=np.float64)
+        return np.concatenate(self._chunks + [self._chunk[:self._fill]])
+    
+    def save(self, path):
+        """Write the trace as a .npy file"""
+        save_trace(path, self.to_array())
+
+def save_trace(path, samples):
+    """Save an (N, 1 + lanes) array of (timestamp, brightness...) samples"""
+    samples = np.asarray(samples, dtype=np.float64)
+    if samples.ndim != 2 or samples.shape[1] < 2:
+        raise ValueError("Trace must be an (N, 1 + lanes) array of (timestamp, brightness...)")
+    np.save(path, samples)
+
+def load_trace(path):
+    """Memory-map a trace saved with save_trace"""
+    samples = np.load(path, mmap_mode='r')
+    if samples.ndim != 2 or samples.shape[1] < 2:
+        raise ValueError("Trace must be an (N, 1 + lanes) array of (timestamp, brightness...)")
+    return samples
+
+def open_source(path=None, camera_index=0, fps=30):
+    """Pick a source for a path: .npy traces, other files as video, None for the camera"""
+    if path is None:
+        return CameraSource(camera_index, fps=fps)
+    if str(path).lower().endswith('.npy'):
+        return TraceSource(path)
+    return VideoFileSource(path)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+from chunking import ChunkAssembler, split_transfer, unpack_transfer, pack_transfer, CHUNK_HEADER_SIZE
+
+DATA = bytes(range(256)) * 3
+
+def test_out_of_order_with_duplicates():
+    chunks = split_transfer(DATA, "notes.txt", 64, transfer_id=5)
+    rng = np.random.default_rng(1)
+    order = list(chunks) + [chunks[index] for index in rng.integers(0, len(chunks), 10)]
+    rng.shuffle(order)
+    
+    assembler = ChunkAssembler()
+    results = [assembler.add(chunk) for chunk in order]
+    complete = [index for index, result in enumerate(results) if result]
+    assert [results[index] for index in complete] == [("notes.txt", DATA)]
+    # Delivered by the chunk that filled the last gap, later repeats are ignored
+    assert len({chunk for chunk in order[:complete[0] + 1]}) == len(chunks)
+    assert assembler.transfers == {} and assembler.size == 0
+
+def test_later_laps_are_ignored():
+    chunks = split_transfer(b"lap", "lap.bin", 64, transfer_id=8)
+    assembler = ChunkAssembler()
+    assert assembler.add(chunks[0]) == ("lap.bin", b"lap")
+    assert assembler.add(chunks[0]) is None
+    assert assembler.progress() == []
+
+def test_interleaved_transfers():
+    first = split_transfer(DATA, "a", 64, transfer_id=1)
+    second = split_transfer(DATA[::-1], "b", 64, transfer_id=2)
+    assembler = ChunkAssembler()
+    results = [assembler.add(chunk) for pair in zip(first, second[::-1]) for chunk in pair]
+    assert [result for result in results if result] == [("a", DATA), ("b", DATA[::-1])]
+
+def test_corrupt_transfer_starts_over():
+    chunks = split_transfer(DATA, "crc", 64, transfer_id=3)
+    damaged = chunks[2][:CHUNK_HEADER_SIZE] + bytes(64)
+    assembler = ChunkAssembler()
+    assert [assembler.add(chunk) for chunk in chunks[:2] + [damaged] + chunks[3:]] == [None] * len(chunks)
+    assert assembler.rejected == 1
+    # The next lap brings the damaged chunk in cleanly
+    assert [result for result in map(assembler.add, chunks) if result] == [("crc", DATA)]
+
+def test_eviction_keeps_the_table_bounded():
+    # Room for one transfer, but not for the fresh one and the stale one's start
+    assembler = ChunkAssembler(max_bytes=800)
+    stale = split_transfer(DATA, "stale", 64, transfer_id=1)
+    fresh = split_transfer(DATA, "fresh", 64, transfer_id=2)
+    for chunk in stale[:3]:
+        assembler.add(chunk)
+    results = [assembler.add(chunk) for chunk in fresh]
+    assert results[-1] == ("fresh", DATA)
+    assert assembler.evicted >= 1
+    assert 1 not in assembler.transfers
+
+def test_malformed_chunks():
+    assembler = ChunkAssembler()
+    assert assembler.add(b"\xfe\x00") is None
+    assert assembler.add(b"\xfe\x00\x01\x00\x05\x00\x05data") is None  # Index past the count
+    assert assembler.rejected == 2
+
+def test_transfer_packing():
+    assert unpack_transfer(pack_transfer(b"", "")) == ("", b"")
+    blob = bytearray(pack_transfer(b"payload", "name"))
+    blob[3] ^= 1
+    with pytest.raises(ValueError, match="^Transfer CRC mismatch$"):
+        unpack_transfer(bytes(blob))
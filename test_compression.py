@@ -0,0 +1,49 @@
+import zlib
+import pytest
+from compression import compress_payload, decompress_payload, CHAT_DICTIONARY
+from framing import build_frame, parse_frame, FLAG_COMPRESSED, HEADER_SIZE
+
+CHAT = ["Hello, are you there? I'm on my way.", "Meeting tomorrow morning at the office, see you later.",
+        "ok", "héllo wörld ✓ 日本語", ""]
+
+@pytest.mark.parametrize("message", CHAT)
+def test_round_trip(message):
+    data = message.encode('utf-8')
+    assert decompress_payload(compress_payload(data)) == data
+
+def test_dictionary_shortens_chat_text():
+    data = "Hello, are you there? I'm on my way.".encode('utf-8')
+    plain = zlib.compressobj(9, zlib.DEFLATED, -15)
+    without = plain.compress(data) + plain.flush()
+    assert len(compress_payload(data)) < len(data) // 2 < len(without)
+
+def test_needs_the_dictionary():
+    packed = compress_payload(b"thank you, see you tomorrow morning")
+    with pytest.raises(zlib.error):
+        zlib.decompressobj(-15).decompress(packed)
+    assert zlib.decompressobj(-15, zdict=CHAT_DICTIONARY).decompress(packed) == b"thank you, see you tomorrow morning"
+
+def test_corrupt_and_truncated_payloads():
+    packed = compress_payload(b"please let me know when you are home")
+    with pytest.raises(ValueError, match="^Compressed payload is truncated or too long$"):
+        decompress_payload(packed[:-3])
+    with pytest.raises(ValueError, match="^Compressed payload is corrupt$"):
+        decompress_payload(b"\xff" * 8)
+
+def test_inflated_size_is_capped():
+    packed = compress_payload(bytes(5000))
+    assert len(packed) < 50
+    with pytest.raises(ValueError):
+        decompress_payload(packed, max_length=1000)
+
+def test_frame_compresses_only_when_shorter():
+    text = b"Hello, how are you? see you later."
+    frame = build_frame(text, 2, compress=True)
+    assert len(frame) < len(build_frame(text, 2))
+    assert parse_frame(frame) == (text, 2, FLAG_COMPRESSED)
+    
+    # Random-looking bytes would grow, so they go out as they are
+    noise = bytes(range(0, 256, 7))
+    frame = build_frame(noise, 3, compress=True)
+    assert parse_frame(frame) == (noise, 3, 0)
+    assert frame[HEADER_SIZE:HEADER_SIZE + len(noise)] == noise
@@ -0,0 +1,184 @@
+import time
+import numpy as np
+import pytest
+from encoder_decoder import ManchesterEncoder, ManchesterDecoder, StreamingDecoder, make_encoder, bits_to_string
+from framing import build_frame
+from fec import protect_frame
+
+MESSAGES = ["Hello, WhisprNet!", "héllo wörld ✓ 日本語", ""]
+
+def reference_encode(message):
+    """Per-character Manchester encoder the array path replaced"""
+    binary_data = ''.join(format(byte, '08b') for byte in message.encode('utf-8'))
+    encoded = ""
+    for bit in binary_data:
+        if bit == '0':
+            encoded += "10"
+        elif bit == '1':
+            encoded += "01"
+    return "11110000" + encoded + "00001111"
+
+def reference_decode(bit_string):
+    """Per-character Manchester decoder the array path replaced"""
+    start_pos = bit_string.find("11110000")
+    end_pos = bit_string.find("00001111", start_pos + 8)
+    manchester_data = bit_string[start_pos + 8:end_pos]
+    
+    decoded = ""
+    for i in range(0, len(manchester_data), 2):
+        pair = manchester_data[i:i+2]
+        if pair == "10":
+            decoded += "0"
+        elif pair == "01":
+            decoded += "1"
+        else:
+            raise ValueError(f"Invalid Manchester pair: {pair}")
+    
+    message_bytes = bytes(int(decoded[i:i+8], 2) for i in range(0, len(decoded), 8))
+    return message_bytes.decode('utf-8')
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_encode_message_matches_reference(message):
+    assert ManchesterEncoder().encode_message(message) == reference_encode(message)
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_decode_message_matches_reference(message):
+    encoded = reference_encode(message)
+    assert ManchesterDecoder().decode_message(encoded) == reference_decode(encoded) == message
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_bytes_round_trip(message):
+    data = message.encode('utf-8')
+    symbols = ManchesterEncoder().encode_bytes(data)
+    assert symbols.dtype == np.uint8
+    assert ''.join(map(str, symbols)) == reference_encode(message)
+    assert ManchesterDecoder().decode_bytes(symbols) == data
+
+@pytest.mark.parametrize("message", MESSAGES)
+def test_string_wrappers_round_trip(message):
+    binary = ''.join(format(byte, '08b') for byte in message.encode('utf-8'))
+    manchester = ManchesterEncoder().manchester_encode(binary)
+    assert manchester == reference_encode(message)[8:-8]
+    
+    decoder = ManchesterDecoder()
+    assert decoder.manchester_decode(manchester) == binary
+    assert decoder.binary_to_message(binary) == message
+
+@pytest.mark.parametrize("manchester, pair", [("1011", "11"), ("0100", "00"), ("10ab", "ab"), ("1é01", "1é")])
+def test_invalid_pair_quotes_input(manchester, pair):
+    with pytest.raises(ValueError, match=f"^Invalid Manchester pair: {pair}$"):
+        ManchesterDecoder().manchester_decode(manchester)
+
+def test_invalid_pair_in_message():
+    with pytest.raises(ValueError, match="^Invalid Manchester pair: 11$"):
+        ManchesterDecoder().decode_message("11110000" + "1011" + "00001111")
+
+def test_invalid_symbol_array():
+    symbols = np.array([1, 1, 1, 1, 0, 0, 0, 0, 1, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1], dtype=np.uint8)
+    with pytest.raises(ValueError, match="^Invalid Manchester pair: 00$"):
+        ManchesterDecoder().decode_bytes(symbols)
+
+def test_odd_length():
+    with pytest.raises(ValueError, match="^Manchester data length must be even$"):
+        ManchesterDecoder().manchester_decode("101")
+
+def test_invalid_utf8():
+    encoded = ManchesterEncoder().encode_message("abc")
+    invalid = encoded[:8] + ManchesterEncoder().manchester_encode("11111111") + encoded[8:]
+    with pytest.raises(ValueError, match="^Invalid UTF-8 data$"):
+        ManchesterDecoder().decode_message(invalid)
+    with pytest.raises(ValueError, match="^Invalid UTF-8 data$"):
+        ManchesterDecoder().binary_to_message("11111111")
+
+def test_invalid_binary_data():
+    decoder = ManchesterDecoder()
+    with pytest.raises(ValueError, match="^Binary data length must be multiple of 8$"):
+        decoder.binary_to_message("0101")
+    with pytest.raises(ValueError, match="^Invalid binary data$"):
+        decoder.binary_to_message("0100000x")
+
+def framed_symbols(payload, sequence=0, fec_level=0, line_code='manchester'):
+    """Symbols of one framed payload, as the sender flickers them"""
+    frame = protect_frame(build_frame(payload, sequence, fec_level))
+    return bits_to_string(make_encoder(line_code).encode_bytes(frame))
+
+def feed_string(decoder, symbols):
+    """Raw payloads the streaming decoder returns for a '0'/'1' string"""
+    payloads = [decoder.feed_bit(bit) for bit in symbols]
+    return [payload for payload in payloads if payload is not None]
+
+@pytest.mark.parametrize("line_code", ['manchester', '4b5b', '8b10b'])
+def test_sync_split_across_feeds(line_code):
+    symbols = "0" * 20 + framed_symbols(b"split sync", 4, line_code=line_code) + "0" * 20
+    # The decoder keeps its sync window between calls, wherever the stream is cut
+    for cut in range(18, 36):
+        decoder = StreamingDecoder()
+        assert feed_string(decoder, symbols[:cut]) + feed_string(decoder, symbols[cut:]) == [b"split sync"]
+        assert decoder.sequence == 4
+
+def test_streamed_message_matches_block_decoder():
+    symbols = ManchesterEncoder().encode_message("Hello, WhisprNet!")
+    assert StreamingDecoder(framing=False).feed_bits("0101" + symbols) == ["Hello, WhisprNet!"]
+
+def test_start_sync_inside_a_frame():
+    # A burst that happens to read as a start sync restarts the frame, and
+    # the interrupted one is lost rather than spliced onto the next
+    first, second = framed_symbols(b"interrupted", 1), framed_symbols(b"next one", 2)
+    decoder = StreamingDecoder()
+    assert feed_string(decoder, "00" + first[:60] + "11110000" + first[60:] + "00" + second) == [b"next one"]
+    assert decoder.syncs == 3
+    
+    # Inside a block-coded frame a start sync is just data
+    symbols = framed_symbols(b",,,,", 3, line_code='8b10b')
+    assert "11110000" in symbols[len("11111110000000") + 8:]
+    assert feed_string(StreamingDecoder(), "00" + symbols) == [b",,,,"]
+
+@pytest.mark.parametrize("line_code", ['manchester', '8b10b'])
+def test_oversize_length_is_cut_off(line_code):
+    decoder = StreamingDecoder(max_message_bytes=16)
+    symbols = framed_symbols(b"x" * 40, 0, line_code=line_code) + "00" + framed_symbols(b"short", 1, line_code=line_code)
+    assert feed_string(decoder, "00" + symbols) == [b"short"]
+    
+    # Unframed Manchester data is cut off once it outgrows the limit
+    decoder = StreamingDecoder(max_message_bytes=16, framing=False)
+    assert decoder.feed_bits(ManchesterEncoder().encode_message("y" * 17) + ManchesterEncoder().encode_message("ok")) == ["ok"]
+
+@pytest.mark.parametrize("line_code", ['manchester', '4b5b', '8b10b'])
+def test_crc_reject_then_next_frame(line_code):
+    first = framed_symbols(b"damaged frame", 5, line_code=line_code)
+    # Swap two payload symbols a few bytes before the CRC: in Manchester 10 <-> 01
+    # is still a valid pair, just the wrong bit
+    index = len(first) - 8 * 10 if line_code == 'manchester' else len(first) - 1 - 6 * 10
+    damaged = first[:index] + first[index + 1] + first[index] + first[index + 2:]
+    assert damaged != first
+    
+    decoder = StreamingDecoder()
+    assert feed_string(decoder, "00" + damaged + "00" + framed_symbols(b"good frame", 6, line_code=line_code)) == [b"good frame"]
+    assert decoder.rejected_frames == 1
+    assert decoder.sequence == 6
+
+def test_fec_repairs_a_flipped_pair():
+    symbols = framed_symbols(b"repair me", 9, fec_level=1)
+    index = 8 + 16 * 14
+    damaged = symbols[:index] + ("01" if symbols[index:index + 2] == "10" else "10") + symbols[index + 2:]
+    decoder = StreamingDecoder()
+    assert feed_string(decoder, "00" + damaged) == [b"repair me"]
+    assert decoder.corrected == 1
+
+def best_time(function, repeats=3):
+    """Fastest of a few runs, in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+def test_array_path_beats_reference():
+    message = "WhisprNet " * 800  # 8000 characters
+    data = message.encode('utf-8')
+    encoder, decoder = ManchesterEncoder(), ManchesterDecoder()
+    
+    reference = best_time(lambda: reference_decode(reference_encode(message)))
+    array = best_time(lambda: decoder.decode_bytes(encoder.encode_bytes(data)))
+    assert array < reference
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+from fec import (ReedSolomonCodec, protect_frame, open_frame, unwrap_frame, read_header, air_size,
+                 fec_parity, FEC_HEADER_SIZE)
+from framing import build_frame, HEADER_SIZE
+
+def corrupt(data, positions, seed=0):
+    """Copy of the bytes with every given position changed to a different value"""
+    data = bytearray(data)
+    rng = np.random.default_rng(seed)
+    for position in positions:
+        data[position] ^= int(rng.integers(1, 256))
+    return bytes(data)
+
+@pytest.mark.parametrize("parity", [2, 4, 8, 16])
+def test_codec_corrects_up_to_half_the_parity(parity):
+    codec = ReedSolomonCodec(parity)
+    rng = np.random.default_rng(parity)
+    data = rng.integers(0, 256, 100, dtype=np.uint8).tobytes()
+    codeword = codec.encode(data)
+    assert len(codeword) == len(data) + parity
+    assert codec.decode(codeword) == (data, 0)
+    for errors in range(1, parity // 2 + 1):
+        for trial in range(5):
+            positions = rng.choice(len(codeword), errors, replace=False)
+            assert codec.decode(corrupt(codeword, positions, trial)) == (data, errors)
+
+@pytest.mark.parametrize("parity", [4, 8, 16])
+def test_codec_detects_too_many_errors(parity):
+    codec = ReedSolomonCodec(parity)
+    rng = np.random.default_rng(parity)
+    data = rng.integers(0, 256, 60, dtype=np.uint8).tobytes()
+    codeword = codec.encode(data)
+    detected = 0
+    for trial in range(20):
+        positions = rng.choice(len(codeword), parity // 2 + 1, replace=False)
+        # Beyond t errors the codeword may land near another one, but never back on this one
+        try:
+            repaired, _ = codec.decode(corrupt(codeword, positions, trial))
+        except ValueError:
+            detected += 1
+            continue
+        assert repaired != data
+    assert detected >= 18
+
+def test_codec_limits():
+    with pytest.raises(ValueError):
+        ReedSolomonCodec(0)
+    with pytest.raises(ValueError, match="^Codeword longer than 255 bytes$"):
+        ReedSolomonCodec(8).encode(bytes(250))
+    with pytest.raises(ValueError, match="^Codeword too short$"):
+        ReedSolomonCodec(8).decode(bytes(8))
+    with pytest.raises(ValueError):
+        fec_parity(8)
+
+@pytest.mark.parametrize("level", [0, 1, 2, 4])
+@pytest.mark.parametrize("length", [0, 17, 600])
+def test_protected_frame_round_trip(level, length):
+    payload = np.random.default_rng(length).integers(0, 256, length, dtype=np.uint8).tobytes()
+    frame = protect_frame(build_frame(payload, 7, level))
+    flags, sequence, size, corrected = read_header(frame)
+    assert (flags, sequence, size, corrected) == (level, 7, length, 0)
+    assert len(frame) == air_size(flags, length)
+    assert open_frame(frame) == (payload, 7, 0)
+    assert open_frame(frame + bytes(5)) == (payload, 7, 0)  # Trailing padding is ignored
+
+@pytest.mark.parametrize("level", [1, 2, 4])
+def test_protected_frame_corrects_t_errors_per_codeword(level):
+    payload = bytes(range(256)) * 2
+    frame = protect_frame(build_frame(payload, 1, level))
+    codewords = (len(frame) - FEC_HEADER_SIZE) // 255 + 1
+    t = fec_parity(level) // 2
+    # Interleaved body: byte i belongs to codeword i % codewords, so t * codewords
+    # consecutive bytes put exactly t errors into every codeword
+    start = FEC_HEADER_SIZE + 40
+    damaged = corrupt(frame, range(start, start + t * codewords))
+    assert open_frame(damaged) == (payload, 1, t * codewords)
+
+def test_interleaving_spreads_a_burst():
+    payload = b"burst " * 100
+    frame = protect_frame(build_frame(payload, 0, 2))
+    t = fec_parity(2) // 2
+    # A burst twice as long as one codeword can repair is shared out between three
+    burst = range(FEC_HEADER_SIZE + 10, FEC_HEADER_SIZE + 10 + 2 * t)
+    assert open_frame(corrupt(frame, burst)) == (payload, 0, 2 * t)
+    
+    # Without interleaving the same burst is too much for a single codeword
+    codec = ReedSolomonCodec(fec_parity(2))
+    codeword = codec.encode(payload[:100])
+    try:
+        repaired, _ = codec.decode(corrupt(codeword, range(10, 10 + 2 * t)))
+    except ValueError:
+        repaired = None
+    assert repaired != payload[:100]
+
+def test_header_is_repaired():
+    frame = protect_frame(build_frame(b"header", 3, 1))
+    damaged = corrupt(frame, [0, HEADER_SIZE + 1])
+    flags, sequence, length, corrected = read_header(damaged)
+    assert (flags, sequence, length, corrected) == (1, 3, 6, 2)
+    assert open_frame(damaged) == (b"header", 3, 2)
+
+def test_uncorrectable_frame_is_rejected():
+    payload = b"too many errors" * 4
+    frame = protect_frame(build_frame(payload, 0, 1))
+    damaged = corrupt(frame, range(FEC_HEADER_SIZE, len(frame)))
+    with pytest.raises(ValueError):
+        open_frame(damaged)
+    with pytest.raises(ValueError, match="^Frame is truncated$"):
+        open_frame(frame[:-1])
+
+def test_unprotected_frame_errors_are_caught_by_the_crc():
+    frame = build_frame(b"no parity", 0)
+    with pytest.raises(ValueError, match="^Frame CRC mismatch$"):
+        open_frame(corrupt(frame, [HEADER_SIZE]))
+    with pytest.raises(ValueError):
+        open_frame(corrupt(frame, [1]))
+
+def test_unwrap_frame():
+    assert unwrap_frame(b"plain text") == (b"plain text", None, 0)
+    assert unwrap_frame(protect_frame(build_frame(b"framed", 5, 1))) == (b"framed", 5, 0)
+    with pytest.raises(ValueError):
+        unwrap_frame(corrupt(build_frame(b"framed", 5), [HEADER_SIZE - 1]))
@@ -0,0 +1,67 @@
+import numpy as np
+from chunking import unpack_transfer
+from fountain import (FountainEncoder, FountainTransfer, TransferAssembler, parse_symbol, symbol_blocks,
+                      robust_soliton, SYMBOL_HEADER_SIZE)
+
+DATA = bytes(range(256)) * 2
+
+def peeled(k, seeds):
+    """Blocks peeling alone solves from the symbols with these seeds"""
+    distribution = robust_soliton(k)
+    symbols = [symbol_blocks(seed, k, distribution) for seed in seeds]
+    known = set()
+    progress = True
+    while progress:
+        progress = False
+        for blocks in symbols:
+            if len(blocks - known) == 1:
+                known |= blocks
+                progress = True
+    return len(known)
+
+def decode(encoder, seeds):
+    """FountainTransfer fed the symbols with these seeds, in order"""
+    transfer = None
+    for seed in seeds:
+        _, seed, shape, data = parse_symbol(encoder.symbol(seed))
+        transfer = transfer or FountainTransfer(*shape)
+        transfer.add(seed, data)
+    return transfer
+
+def test_elimination_finishes_where_peeling_stalls():
+    encoder = FountainEncoder(DATA, "stall.bin", 64, transfer_id=7)
+    # Every third symbol lost: none of the eleven that arrive has degree one
+    seeds = [seed for seed in range(36, 53) if seed % 3]
+    assert peeled(encoder.k, seeds) < encoder.k
+    transfer = decode(encoder, seeds)
+    assert transfer.missing == 0
+    assert unpack_transfer(transfer.blob()) == ("stall.bin", DATA)
+
+def test_too_few_symbols_leave_blocks_missing():
+    encoder = FountainEncoder(DATA, "short.bin", 64, transfer_id=7)
+    transfer = decode(encoder, range(encoder.k - 1))
+    assert transfer.missing > 0
+    assert transfer.size <= transfer.symbols * 64
+
+def test_repeated_symbols_count_once():
+    encoder = FountainEncoder(DATA, "", 64, transfer_id=7)
+    transfer = decode(encoder, [3, 3, 3, 5, 5])
+    assert transfer.symbols == 2
+
+def test_random_loss_round_trip():
+    encoder = FountainEncoder(DATA * 4, "loss.bin", 64, transfer_id=9)
+    rng = np.random.default_rng(0)
+    for trial in range(10):
+        # 40% of the symbols lost, the survivors in a random order
+        symbols = [symbol for symbol in encoder.symbols(3 * encoder.k) if rng.random() >= 0.4]
+        rng.shuffle(symbols)
+        assembler = TransferAssembler()
+        results = [assembler.add(symbol) for symbol in symbols]
+        assert [result for result in results if result] == [("loss.bin", DATA * 4)]
+        assert assembler.size == 0
+
+def test_malformed_symbol_is_rejected():
+    symbol = FountainEncoder(DATA, "", 64, transfer_id=1).symbol(0)
+    assembler = TransferAssembler()
+    assert assembler.add(symbol[:SYMBOL_HEADER_SIZE + 10]) is None  # Too short a block for its block count
+    assert assembler.rejected == 1
@@ -0,0 +1,46 @@
+import pytest
+from grid import parse_grid, grid_symbols, cell_bounds
+from lanes import split_stripes, merge_stripes
+from receiver import GridReceiver
+from simulator import OpticalChannelSimulator
+from sources import ArraySource
+
+MESSAGE = "The quick brown fox jumps over the lazy dog 0123456789"
+
+def test_parse_grid():
+    assert parse_grid("3x3") == (3, 3)
+    assert parse_grid("2X4") == (2, 4)
+    with pytest.raises(ValueError):
+        parse_grid("0x2")
+
+def test_stripes_round_trip():
+    data = MESSAGE.encode('utf-8')
+    for lanes in (1, 4, 9):
+        stripes = split_stripes(data, lanes)
+        assert len({len(stripe) for stripe in stripes}) == 1
+        assert merge_stripes(stripes) == data
+
+def test_cell_bounds_stay_inside_their_cells():
+    regions = cell_bounds((100, 50, 400, 350), 3, 3)
+    assert len(regions) == 9
+    for index, (x1, y1, x2, y2) in enumerate(regions):
+        row, col = divmod(index, 3)
+        assert 100 + col * 100 <= x1 < x2 <= 100 + (col + 1) * 100
+        assert 50 + row * 100 <= y1 < y2 <= 50 + (row + 1) * 100
+
+def test_symbols_have_one_column_per_cell():
+    symbols = grid_symbols(MESSAGE, 2, 3)
+    assert symbols.shape[1] == 6
+
+@pytest.mark.parametrize("rows, cols, options", [
+    (2, 2, {}),
+    (3, 3, {}),
+    (2, 2, {'sequence': 7, 'fec_level': 1, 'compress': True}),
+])
+def test_simulated_grid_round_trip(rows, cols, options):
+    symbols = grid_symbols(MESSAGE, rows, cols, **options)
+    timestamps, brightness = OpticalChannelSimulator(seed=rows * cols).simulate(symbols, 100)
+    assert brightness.shape == (len(timestamps), rows * cols)
+    
+    receiver = GridReceiver(rows, cols, show_preview=False)
+    assert receiver.decode_source(ArraySource(timestamps, brightness)) == [MESSAGE]
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from line_codes import (FourBFiveBCode, EightBTenBCode, FOUR_FIVE_GROUPS, get_line_code, line_code_by_id,
+                        _eight_ten_tables)
+
+def longest_run(symbols):
+    """Longest run of equal symbols"""
+    edges = np.flatnonzero(np.diff(symbols)) + 1
+    return int(np.diff(np.concatenate(([0], edges, [len(symbols)]))).max())
+
+def random_bytes(count, seed=0):
+    """Reproducible random data"""
+    return np.random.default_rng(seed).integers(0, 256, count, dtype=np.uint8).tobytes()
+
+def test_four_five_table_is_a_bijection():
+    assert len(set(FOUR_FIVE_GROUPS)) == 16
+    code = FourBFiveBCode()
+    assert sorted(code._nibbles[code._nibbles >= 0].tolist()) == list(range(16))
+    assert (code._nibbles >= 0).sum() == 16
+
+@pytest.mark.parametrize("code", [FourBFiveBCode(), EightBTenBCode()])
+@pytest.mark.parametrize("previous", [0, 1])
+def test_round_trip(code, previous):
+    data = bytes(range(256)) + random_bytes(300)
+    symbols = code.encode(data, previous)
+    assert len(symbols) == len(data) * code.symbols_per_byte
+    assert code.decode(symbols, previous) == data
+
+def test_four_five_runs():
+    # At most three zeros in a row between groups, so NRZI holds a level for at most 4 symbols
+    assert longest_run(FourBFiveBCode().encode(bytes(range(256)) + random_bytes(1000))) <= 4
+
+def test_four_five_is_not_dc_balanced():
+    # Every zero nibble leaves the screen dark for 3 of its 5 symbols, so the
+    # running disparity drifts without bound where 8b/10b keeps it within 3
+    symbols = FourBFiveBCode().encode(bytes(200))
+    assert np.cumsum(2 * symbols.astype(int) - 1).min() < -100
+    assert not FourBFiveBCode().dc_balanced
+
+def test_eight_ten_table_is_a_bijection():
+    encode, _, decode = _eight_ten_tables()
+    codes = {int(''.join(map(str, encode[disparity, byte])), 2): byte
+             for disparity in (0, 1) for byte in range(256)}
+    # Balanced bytes share one code group between both disparities, the rest get two
+    assert len(codes) > 256
+    assert all(decode[code] == byte for code, byte in codes.items())
+    assert (decode >= 0).sum() == len(codes)
+
+def test_eight_ten_running_disparity():
+    encode, next_disparity, _ = _eight_ten_tables()
+    for start in (0, 1):
+        for byte in range(256):
+            group = encode[start, byte].astype(int)
+            disparity = 2 * group.sum() - 10
+            assert disparity in (0, 2, -2)
+            # A negative running disparity never gets more negative, and vice versa
+            assert disparity >= 0 if start == 0 else disparity <= 0
+            flipped = disparity != 0
+            assert next_disparity[start, byte] == start ^ flipped
+    
+    symbols = EightBTenBCode().encode(bytes(range(256)) + random_bytes(2000, 1) + bytes(100) + b'\xff' * 100)
+    # Starting from -1, the running disparity is +-1 after every group and within 3 inside one
+    running = np.cumsum(2 * symbols.astype(int) - 1) - 1
+    assert running.min() >= -3 and running.max() <= 3
+    assert set(running[9::10].tolist()) == {-1, 1}
+    assert longest_run(symbols) <= 5
+    assert EightBTenBCode().dc_balanced
+
+@pytest.mark.parametrize("code", [FourBFiveBCode(), EightBTenBCode()])
+def test_invalid_symbols(code):
+    name = "4B5B" if code.name == '4b5b' else "8b/10b"
+    symbols = code.encode(b"\x00b")
+    with pytest.raises(ValueError, match=f"^{name} data length must be a multiple of 10 symbols$"):
+        code.decode(symbols[:-1])
+    
+    # A steady screen (4B5B group 00000) or ten ones (8b/10b) is no valid group
+    invalid = symbols.copy()
+    invalid[:5 if code.name == '4b5b' else 10] = 0 if code.name == '4b5b' else 1
+    with pytest.raises(ValueError, match=f"^Invalid {name} code group$"):
+        code.decode(invalid)
+    assert code.decode(invalid, strict=False) == b"\x00b"
+
+def test_lookup():
+    assert get_line_code("8B10B").code_id == 2
+    assert line_code_by_id(1).name == '4b5b'
+    assert line_code_by_id(7) is None
+    with pytest.raises(ValueError, match="^Unknown line code: 3b4b$"):
+        get_line_code("3b4b")
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+from encoder_decoder import bytes_to_bits
+from fec import FEC_HEADER_SIZE
+from pam import pam_symbols, calibration_ramp, bits_to_levels, PamDecoder
+from receiver import PamReceiver
+from simulator import OpticalChannelSimulator, decode_samples
+
+MESSAGE = "Multi-level symbols carry two or three bits each!"
+
+def simulate(symbols, levels, bit_duration_ms=100, seed=0):
+    """Brightness samples of PAM symbols, spread evenly in emitted light like level_color does"""
+    return OpticalChannelSimulator(seed=seed).simulate(np.asarray(symbols) / (levels - 1), bit_duration_ms)
+
+@pytest.mark.parametrize("levels, fec_level, compress", [(4, 0, False), (4, 1, True), (8, 1, True)])
+def test_framed_round_trip(levels, fec_level, compress):
+    symbols = pam_symbols(MESSAGE, levels, 0, fec_level, compress)
+    messages, _ = decode_samples(*simulate(symbols, levels), receiver=PamReceiver(levels, show_preview=False))
+    assert messages == [MESSAGE]
+
+def test_bit_duration_sets_the_clock():
+    assert PamReceiver(4, bit_duration_ms=80).clock_recovery.nominal_period == pytest.approx(0.08)
+    assert PamReceiver(4).clock_recovery.nominal_period is None
+
+def test_corrupted_frame_is_not_delivered():
+    # Flip one payload symbol: the text stays valid UTF-8, but the CRC catches it
+    symbols = pam_symbols("abcdefgh", 4)
+    corrupted = symbols.copy()
+    index = len(calibration_ramp(4)) + 1 + 7 * 4 + 2
+    corrupted[index] ^= 1
+    messages, _ = decode_samples(*simulate(corrupted, 4), receiver=PamReceiver(4, show_preview=False))
+    assert messages == []
+
+def test_decoder_rejects_a_bad_header():
+    decoder = PamDecoder(4)
+    frame = bits_to_levels(bytes_to_bits(bytes(FEC_HEADER_SIZE)), 4)
+    results = [decoder.feed(level) for level in np.concatenate(([3], frame))]
+    assert results == [None] * len(results)
+    assert decoder.rejected_frames == 1
+    assert not decoder.active
+
+def test_decoder_rejects_an_oversize_length():
+    symbols = pam_symbols("x" * 40, 4)
+    decoder = PamDecoder(4, max_message_bytes=16)
+    start = len(calibration_ramp(4))
+    assert all(decoder.feed(level) is None for level in symbols[start:start + 1 + decoder.header_symbols])
+    assert decoder.rejected_frames == 1
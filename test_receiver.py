@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from receiver import CameraReceiver
+from sender import ScreenFlicker
+from simulator import OpticalChannelSimulator
+from sources import ArraySource
+
+MESSAGE = "Hello, World! 123"
+
+@pytest.mark.parametrize("lead_ms", [100, 300, 450, 1000])
+def test_transmission_starting_during_warmup(lead_ms):
+    # The slicer learns its noise floor over the first 16 samples (~0.5 s);
+    # a transmission that starts inside that window must still be decoded
+    symbols = ScreenFlicker().encode_payload(MESSAGE)
+    timestamps, brightness = OpticalChannelSimulator(seed=3, lead_ms=lead_ms).simulate(symbols, 100)
+    receiver = CameraReceiver(auto_locate=False)
+    assert receiver.decode_source(ArraySource(timestamps, brightness)) == [MESSAGE]
+
+class FrameSource:
+    """Synthetic 480x640 camera frames with the transmitter off-center"""
+    realtime = False
+    provides_frames = True
+    pixel_format = 'bgr'
+    
+    def __init__(self, timestamps, brightness, seed=0):
+        self.timestamps = timestamps
+        self.brightness = brightness
+        self.background = np.random.default_rng(seed).integers(20, 120, (480, 640, 3), dtype=np.uint8)
+        self._index = 0
+    
+    def open(self):
+        self._index = 0
+    
+    def read(self):
+        if self._index >= len(self.timestamps):
+            return False, None, None
+        frame = self.background.copy()
+        frame[300:400, 420:520] = int(self.brightness[self._index])
+        self._index += 1
+        return True, float(self.timestamps[self._index - 1]), frame
+    
+    def at_end(self):
+        return self._index >= len(self.timestamps)
+    
+    def close(self):
+        pass
+
+@pytest.mark.parametrize("lead_ms", [100, 300])
+def test_locked_frames_replay_transmission_start(lead_ms):
+    # The locator finds the transmitter seconds into the message, the
+    # replayed history starts with hardly any idle samples before it
+    symbols = ScreenFlicker().encode_payload(MESSAGE)
+    timestamps, brightness = OpticalChannelSimulator(seed=1, lead_ms=lead_ms).simulate(symbols, 100)
+    receiver = CameraReceiver(show_preview=False)
+    assert receiver.decode_source(FrameSource(timestamps, brightness)) == [MESSAGE]
+    
+    x1, y1, x2, y2 = receiver.brightness_detector.roi
+    assert 420 <= x1 < x2 <= 520 and 300 <= y1 < y2 <= 400
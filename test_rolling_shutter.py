@@ -0,0 +1,59 @@
+import pytest
+from receiver import RollingShutterReceiver
+from sender import ScreenFlicker
+from simulator import OpticalChannelSimulator
+
+MESSAGE = "Hello, World! 123"
+REFRESH_MS = 1000.0 / 60
+
+class FrameSource:
+    """Simulated grayscale frames of a camera held close to the screen"""
+    realtime = False
+    provides_frames = True
+    pixel_format = 'gray'
+    
+    def __init__(self, timestamps, frames):
+        self.timestamps = timestamps
+        self.frames = frames
+        self._index = 0
+    
+    def open(self):
+        self._index = 0
+    
+    def read(self):
+        if self._index >= len(self.timestamps):
+            return False, None, None
+        self._index += 1
+        return True, float(self.timestamps[self._index - 1]), self.frames[self._index - 1]
+    
+    def at_end(self):
+        return self._index >= len(self.timestamps)
+    
+    def close(self):
+        pass
+
+def receive_rows(fps, seed, line_code='manchester', readout_fraction=0.8):
+    """(messages, receiver) for one Rows mode transmission through the rolling shutter model"""
+    flicker = ScreenFlicker(line_code=line_code)
+    flicker.fullscreen = True
+    symbols = flicker.encode_payload(MESSAGE)
+    # The display shows every symbol for exactly one refresh, so there is no
+    # sub-frame jitter; a missed refresh is a different failure altogether
+    simulator = OpticalChannelSimulator(fps=fps, seed=seed, scheduled=True, sleep_overshoot_ms=0, jitter_ms=0)
+    timestamps, frames = simulator.simulate_rows(symbols, REFRESH_MS, readout_fraction=readout_fraction)
+    receiver = RollingShutterReceiver(show_preview=False, camera_fps=fps)
+    return receiver.decode_source(FrameSource(timestamps, frames)), receiver
+
+@pytest.mark.parametrize("fps", [15, 25, 29.97, 30])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_rows_decode_at_common_frame_rates(fps, seed):
+    assert receive_rows(fps, seed)[0] == [MESSAGE]
+
+@pytest.mark.parametrize("fps", [15, 25])
+def test_rows_decode_with_8b10b(fps):
+    assert receive_rows(fps, 0, '8b10b')[0] == [MESSAGE]
+
+def test_row_time_is_measured():
+    # 25 fps against a 60 Hz display puts the stripe edges on different rows every frame
+    _, receiver = receive_rows(25, 0)
+    assert receiver.row_timing.row_time == pytest.approx(0.8 / 25 / 480, rel=0.03)
@@ -0,0 +1,72 @@
+import time
+import numpy as np
+import pytest
+from grid import grid_symbols
+from receiver import GridReceiver
+from simulator import OpticalChannelSimulator
+from sources import ArraySource, TraceRecorder, TraceSource, save_trace, load_trace
+
+def read_all(source):
+    """Every (timestamp, brightness) sample read() returns"""
+    samples = []
+    source.open()
+    while True:
+        ok, timestamp, brightness = source.read()
+        if not ok:
+            return samples
+        samples.append((timestamp, brightness))
+
+def test_single_lane_samples_are_floats():
+    source = ArraySource(np.arange(3.0), np.array([10.0, 20.0, 30.0]))
+    assert read_all(source) == [(0.0, 10.0), (1.0, 20.0), (2.0, 30.0)]
+    source.open()
+    assert list(source.iter_samples(chunk_size=2)) == [[0.0, 10.0], [1.0, 20.0], [2.0, 30.0]]
+    assert source.at_end()
+
+def test_multi_lane_samples_keep_their_columns():
+    brightness = np.arange(12.0).reshape(3, 4)
+    source = ArraySource(np.arange(3.0), brightness)
+    samples = read_all(source)
+    assert [timestamp for timestamp, _ in samples] == [0.0, 1.0, 2.0]
+    np.testing.assert_array_equal(np.stack([lanes for _, lanes in samples]), brightness)
+    
+    source.open()
+    samples = list(source.iter_samples(chunk_size=2))
+    assert [timestamp for timestamp, _ in samples] == [0.0, 1.0, 2.0]
+    np.testing.assert_array_equal(np.stack([lanes for _, lanes in samples]), brightness)
+
+@pytest.mark.parametrize("lanes", [1, 3, 4])
+def test_recorder_round_trip(tmp_path, lanes):
+    rng = np.random.default_rng(lanes)
+    brightness = rng.uniform(0.0, 255.0, (10, lanes))
+    recorder = TraceRecorder(chunk_size=4)
+    for timestamp, sample in enumerate(brightness):
+        recorder.add(float(timestamp), sample[0] if lanes == 1 else sample)
+    recorder.save(tmp_path / "trace.npy")
+    
+    trace = load_trace(tmp_path / "trace.npy")
+    assert trace.shape == (10, 1 + lanes)
+    np.testing.assert_array_equal(trace[:, 1:], brightness)
+
+def test_trace_needs_a_brightness_column(tmp_path):
+    with pytest.raises(ValueError):
+        save_trace(tmp_path / "trace.npy", np.zeros((5, 1)))
+
+def test_grid_session_is_recorded_and_replayed(tmp_path):
+    message = "The quick brown fox jumps over the lazy dog"
+    timestamps, brightness = OpticalChannelSimulator(seed=1).simulate(grid_symbols(message, 2, 2), 100)
+    
+    receiver = GridReceiver(2, 2, show_preview=False)
+    received = []
+    receiver.start_receiving(received.append, None, source=ArraySource(timestamps, brightness),
+                             record_path=tmp_path / "grid.npy")
+    while receiver.capture_thread.is_alive():
+        time.sleep(0.01)
+    deadline = time.monotonic() + 5.0
+    while not received and time.monotonic() < deadline:
+        time.sleep(0.01)
+    receiver.stop_receiving()
+    assert received == [message]
+    
+    replayed = GridReceiver(2, 2, show_preview=False).decode_source(TraceSource(tmp_path / "grid.npy"))
+    assert replayed == [message]
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from utils import AdaptiveSlicer, BitBuffer
+
+def slice_all(samples, slicer=None):
+    """Bits the slicer decides for a sequence of brightness samples"""
+    slicer = slicer or AdaptiveSlicer()
+    return [slicer.slice(sample)[0] for sample in samples]
+
+def test_idle_noise_stays_zero():
+    rng = np.random.default_rng(0)
+    for noise_std in (3.0, 6.0):
+        samples = 30.0 + rng.normal(0.0, noise_std, 300)
+        assert not any(slice_all(samples))
+
+def test_flicker_after_warmup():
+    rng = np.random.default_rng(1)
+    levels = np.repeat([0, 1, 0, 1, 1, 0], 3)
+    samples = np.concatenate((np.full(20, 30.0), 30.0 + 190.0 * levels)) + rng.normal(0.0, 3.0, 38)
+    assert slice_all(samples)[20:] == list(levels)
+
+def test_flicker_inside_warmup():
+    # The transmitter turns on before the slicer has seen 16 samples: the
+    # "on" samples are the other level, not noise, so it must not go deaf
+    rng = np.random.default_rng(2)
+    levels = np.repeat([1, 1, 0, 1, 0, 0, 1, 0], 3)
+    samples = np.concatenate((np.full(3, 30.0), 30.0 + 190.0 * levels)) + rng.normal(0.0, 3.0, 27)
+    slicer = AdaptiveSlicer()
+    bits = slice_all(samples, slicer)
+    assert bits[4:] == list(levels[1:])
+    assert slicer.has_signal and slicer.noise < 10.0
+
+@pytest.mark.parametrize("max_size", [1, 13, 64, 10000])
+def test_bit_buffer_keeps_the_newest_bits(max_size):
+    rng = np.random.default_rng(max_size)
+    buffer, sent = BitBuffer(max_size), ""
+    for bit in rng.integers(0, 2, 3 * max_size + 5):
+        buffer.add_bit(int(bit))
+        sent += str(bit)
+    newest = sent[-max_size:]
+    assert buffer.get_buffer_string() == newest
+    assert buffer.size() == len(newest)
+    assert buffer.find("0110") == newest.find("0110")
+    assert buffer.find("1", 1) == newest.find("1", 1)
+    buffer.clear()
+    assert buffer.get_buffer_string() == "" and buffer.size() == 0
+
+def test_bit_buffer_packs_eight_bits_a_byte():
+    buffer = BitBuffer(10000)
+    for bit in "1011" * 2500:
+        buffer.add_bit(bit)
+    assert len(buffer._bytes) == 2 * 10000 // 8
+    assert buffer.bits().tolist() == [1, 0, 1, 1] * 2500
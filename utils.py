@@ -1,33 +1,210 @@
 import numpy as np
-import cv2
+
+# '0'/'1' characters to bit bytes and back, for BitBuffer
+_BIT_CHARACTERS = bytes.maketrans(b'01', b'\x00\x01')
+_BIT_STRING = bytes.maketrans(b'\x00\x01', b'01')
+
+# Integer BT.601 luma weights for B, G, R (they sum to 256)
+LUMA_WEIGHTS_BGR = np.array([29, 150, 77], dtype=np.float64)
 
 class BrightnessDetector:
-    def __init__(self):
+    def __init__(self, pixel_format='bgr'):
         self.region_size = 50  # Size of detection region (50x50 pixels)
+        self.pixel_format = pixel_format  # 'bgr', 'gray', or 'yuyv' (Y in channel 0)
+        self.roi = None  # Locked transmitter bounds (x1, y1, x2, y2), None for the center
+        self.slicer = AdaptiveSlicer()
+        self._center_shape = None
+        self._center_bounds = None
+        self._region_sums = np.zeros((0, 4), dtype=np.float64)
+        self._region_counts = np.zeros(0, dtype=np.float64)
+    
+    def center_bounds(self, shape):
+        """Bounds (x1, y1, x2, y2) of the center region for a frame shape"""
+        # Frames keep their size for a whole session, so compute this once
+        if shape[:2] != self._center_shape:
+            h, w = shape[:2]
+            center_x, center_y = w // 2, h // 2
+            
+            # Define region of interest (center square)
+            self._center_bounds = (
+                max(0, center_x - self.region_size),
+                max(0, center_y - self.region_size),
+                min(w, center_x + self.region_size),
+                min(h, center_y + self.region_size),
+            )
+            self._center_shape = shape[:2]
+        return self._center_bounds
+    
+    def roi_bounds(self, shape):
+        """Bounds of the region being read: the locked ROI, or the center"""
+        return self.roi or self.center_bounds(shape)
     
     def get_center_brightness(self, frame):
         """Get average brightness of center region"""
-        h, w = frame.shape[:2]
-        center_x, center_y = w // 2, h // 2
+        return self.get_region_brightness(frame, self.center_bounds(frame.shape))
+    
+    def get_roi_brightness(self, frame):
+        """Get average brightness of the current detection region"""
+        return self.get_region_brightness(frame, self.roi_bounds(frame.shape))
+    
+    def get_region_brightness(self, frame, bounds):
+        """Average luma of one (x1, y1, x2, y2) region, reading only its pixels"""
+        import cv2
+        x1, y1, x2, y2 = bounds
+        count = (x2 - x1) * (y2 - y1)
+        if count <= 0:
+            return 0.0
+        
+        # Slicing is a view and sumElems reads it in place: no copies, no
+        # per-pixel color conversion. Luma is linear, so the mean luma is
+        # the weighted mean of the channel sums.
+        sums = cv2.sumElems(frame[y1:y2, x1:x2])
+        return self._luma(sums, frame.ndim) / count
+    
+    def get_region_color(self, frame, bounds):
+        """Mean of each channel (B, G, R for color frames) over one region"""
+        import cv2
+        x1, y1, x2, y2 = bounds
+        count = max(1, (x2 - x1) * (y2 - y1))
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        return np.array(cv2.sumElems(frame[y1:y2, x1:x2])[:channels]) / count
+    
+    def get_regions_brightness(self, frame, regions):
+        """Average luma of several (x1, y1, x2, y2) regions in one call"""
+        import cv2
+        if len(regions) > len(self._region_sums):
+            self._region_sums = np.zeros((len(regions), 4), dtype=np.float64)
+            self._region_counts = np.zeros(len(regions), dtype=np.float64)
+        sums = self._region_sums[:len(regions)]
+        counts = self._region_counts[:len(regions)]
+        
+        for index, (x1, y1, x2, y2) in enumerate(regions):
+            sums[index] = cv2.sumElems(frame[y1:y2, x1:x2])
+            counts[index] = max(1, (x2 - x1) * (y2 - y1))
+        
+        if frame.ndim == 2 or self.pixel_format != 'bgr':
+            return sums[:, 0] / counts
+        return sums[:, :3] @ LUMA_WEIGHTS_BGR / (256.0 * counts)
+    
+    def _luma(self, sums, ndim):
+        """Luma sum from per-channel sums"""
+        # Grayscale frames and the Y plane of YUYV need no weighting
+        if ndim == 2 or self.pixel_format != 'bgr':
+            return sums[0]
+        return (29 * sums[0] + 150 * sums[1] + 77 * sums[2]) / 256.0
+    
+    def slice_brightness(self, brightness):
+        """Convert a brightness sample to (bit, confidence) using the adaptive slicer"""
+        return self.slicer.slice(brightness)
+
+class AdaptiveSlicer:
+    """Two-level tracker that slices brightness samples with hysteresis"""
+    def __init__(self, alpha=0.05, attack=0.8, leak=0.002, hysteresis=0.1, min_contrast=12.0, min_snr=5.0, warmup=16):
+        self.alpha = alpha                # Tracking rate of the active level
+        self.attack = attack              # How fast a level expands to new extremes
+        self.leak = leak                  # Idle level drifts back so stale extremes expire
+        self.hysteresis = hysteresis      # Dead band as a fraction of the contrast
+        self.min_contrast = min_contrast  # Below this there is no signal to slice
+        self.min_snr = min_snr            # Contrast needed relative to the sample noise
+        self.warmup = warmup              # Samples until the noise estimate is fully trusted
+        self.reset()
+    
+    def reset(self):
+        """Forget the learned levels"""
+        self.high = None
+        self.low = None
+        self.noise = 0.0
+        self.bit = 0
+        self._samples = 0
+        self._noise_samples = 0
+    
+    @property
+    def threshold(self):
+        """Current decision threshold"""
+        if self.high is None:
+            return None
+        return (self.high + self.low) / 2.0
+    
+    @property
+    def contrast(self):
+        """Distance between the tracked on and off levels"""
+        if self.high is None:
+            return 0.0
+        return self.high - self.low
+    
+    @property
+    def has_signal(self):
+        """Whether the two levels are far enough apart to slice reliably"""
+        # A young noise estimate needs proportionally more contrast, so a
+        # transmission that starts during the warmup is still sliced
+        contrast = self.contrast
+        trust = min(1.0, self._samples / self.warmup)
+        return contrast * trust >= max(self.min_contrast, self.min_snr * self.noise)
+    
+    def slice(self, brightness):
+        """Return (bit, confidence) for one brightness sample"""
+        brightness = float(brightness)
+        self._samples += 1
+        if self.high is None:
+            self.high = self.low = brightness
+            return self.bit, 0.0
         
-        # Define region of interest (center square)
-        x1 = max(0, center_x - self.region_size)
-        y1 = max(0, center_y - self.region_size)
-        x2 = min(w, center_x + self.region_size)
-        y2 = min(h, center_y + self.region_size)
+        # Expand to new extremes first, so the very first edge of a
+        # transmission is sliced on the sample that shows it
+        if brightness > self.high:
+            self.high += self.attack * (brightness - self.high)
+        elif brightness < self.low:
+            self.low += self.attack * (brightness - self.low)
         
-        # Extract region
-        roi = frame[y1:y2, x1:x2]
+        # Decide with hysteresis around the midpoint of the two levels,
+        # holding the last decision while there is no usable contrast
+        threshold = self.threshold
+        band = self.hysteresis * self.contrast
+        if not self.has_signal:
+            pass
+        elif self.bit == 0 and brightness > threshold + band:
+            self.bit = 1
+        elif self.bit == 1 and brightness < threshold - band:
+            self.bit = 0
         
-        # Convert to grayscale if needed
-        if len(roi.shape) == 3:
-            roi_gray = cv2.cvtColor(roi, cv2.COLOR_BGR2GRAY)
+        # Noise is measured around the active level. A sample far across the
+        # midpoint is the other level, not noise: a transmission that is
+        # already running while the decision still holds 0 would otherwise
+        # inflate the noise until no contrast could ever clear it
+        deviation = brightness - (self.high if self.bit else self.low)
+        crossed = (brightness > threshold) != bool(self.bit)
+        if not (crossed and abs(deviation) > self.min_contrast + self.min_snr * self.noise):
+            self._update_noise(deviation)
+        
+        # Track the active level and let the idle one relax, so
+        # auto-exposure drift cannot strand a stale extreme
+        if self.bit:
+            self.high += self.alpha * (brightness - self.high)
+            self.low += self.leak * (self.high - self.low)
         else:
-            roi_gray = roi
+            self.low += self.alpha * (brightness - self.low)
+            self.high -= self.leak * (self.high - self.low)
+        
+        contrast = self.contrast
+        if not self.has_signal:
+            return self.bit, 0.0
         
-        # Calculate average brightness
-        brightness = np.mean(roi_gray)
-        return brightness
+        # Soft confidence: distance from the threshold relative to half the contrast
+        confidence = min(1.0, abs(brightness - threshold) / (contrast / 2.0))
+        return self.bit, confidence
+    
+    def soft_value(self, brightness):
+        """Signed distance of a sample from the threshold in half contrasts, 0 while there is no signal"""
+        if not self.has_signal:
+            return 0.0
+        return (float(brightness) - self.threshold) / (self.contrast / 2.0)
+    
+    def _update_noise(self, deviation):
+        """Track the mean absolute deviation around the active level"""
+        # Plain average at first so the estimate is usable after the warmup
+        self._noise_samples += 1
+        rate = max(self.alpha, 1.0 / self._noise_samples)
+        self.noise += rate * (abs(deviation) - self.noise)
 
 class SyncDetector:
     def __init__(self):
@@ -86,27 +263,375 @@ def validate_message(message):
     
     return True, "Message valid"
 
+class RingBuffer:
+    """Fixed-capacity ring of NumPy values, oldest first, O(1) append
+    
+    Storage is twice the capacity and every value is written at i and at
+    i + capacity, so the newest n values are always one contiguous slice
+    and window() is a view, never a copy. When full the oldest value is
+    overwritten, nothing is ever halved away.
+    """
+    def __init__(self, capacity, dtype=np.uint8, width=None):
+        if capacity < 1:
+            raise ValueError("Ring capacity must be at least 1")
+        self.capacity = capacity
+        dtype = np.dtype(dtype)
+        if dtype == np.uint8 and width is None:
+            # Bytes live in a bytearray: item writes are cheap and find() searches it in place
+            self._bytes = bytearray(2 * capacity)
+            self._data = np.frombuffer(self._bytes, dtype=np.uint8)
+            self._cells = self._bytes
+        else:
+            self._bytes = None
+            shape = (2 * capacity,) if width is None else (2 * capacity, width)
+            self._data = np.zeros(shape, dtype=dtype)
+            # Single values go through a memoryview, several times faster than NumPy item assignment
+            self._cells = memoryview(self._data) if width is None else self._data
+        self._head = 0   # Slot of the next write, always below the capacity
+        self._count = 0
+    
+    def __len__(self):
+        return self._count
+    
+    def append(self, value):
+        """Add one value (a row when the ring has a width), dropping the oldest when full"""
+        head = self._head
+        self._cells[head] = value
+        self._cells[head + self.capacity] = value
+        self._head = head + 1 if head + 1 < self.capacity else 0
+        if self._count < self.capacity:
+            self._count += 1
+    
+    def extend(self, values):
+        """Add many values at once"""
+        values = np.asarray(values, dtype=self._data.dtype)[-self.capacity:]
+        slots = (self._head + np.arange(len(values))) % self.capacity
+        self._data[slots] = values
+        self._data[slots + self.capacity] = values
+        self._head = (self._head + len(values)) % self.capacity
+        self._count = min(self.capacity, self._count + len(values))
+    
+    def window(self, n=None):
+        """View of the newest n values (all of them by default), oldest first"""
+        n = self._count if n is None else min(n, self._count)
+        end = self._head + self.capacity
+        return self._data[end - n:end]
+    
+    def find(self, pattern, start=0):
+        """Index in window() of the first '0'/'1' string or byte pattern, -1 if absent (uint8 rings only)"""
+        if self._bytes is None:
+            raise ValueError("Only byte rings can be searched")
+        if isinstance(pattern, str):
+            pattern = pattern.encode('ascii').translate(_BIT_CHARACTERS)
+        end = self._head + self.capacity
+        begin = end - self._count
+        index = self._bytes.find(bytes(pattern), begin + start, end)
+        return index - begin if index >= 0 else -1
+    
+    def clear(self):
+        """Forget every value, keeping the storage"""
+        self._head = 0
+        self._count = 0
+
+class SampleBuffer:
+    """Newest (timestamp, brightness) samples in two parallel float rings"""
+    def __init__(self, capacity, channels=None):
+        self.timestamps = RingBuffer(capacity, np.float64)
+        self.brightness = RingBuffer(capacity, np.float64, channels)  # One column per channel if given
+    
+    def __len__(self):
+        return len(self.timestamps)
+    
+    def append(self, timestamp, brightness):
+        """Record one sample"""
+        self.timestamps.append(timestamp)
+        self.brightness.append(brightness)
+    
+    def window(self, n=None):
+        """Views (timestamps, brightness) of the newest n samples"""
+        return self.timestamps.window(n), self.brightness.window(n)
+    
+    def clear(self):
+        """Forget every sample"""
+        self.timestamps.clear()
+        self.brightness.clear()
+
 class BitBuffer:
+    """Newest received bits, packed eight to a byte in a ring
+    
+    Like RingBuffer the storage holds the ring twice (bit i at i and at
+    i + capacity), so the newest bits are always one contiguous run to
+    unpack. When full the oldest bit is overwritten.
+    """
     def __init__(self, max_size=10000):
-        self.buffer = []
         self.max_size = max_size
+        self._capacity = -(-max_size // 8) * 8  # Whole bytes, so the second copy starts on a byte
+        self._copy = self._capacity // 8         # Byte offset of the second copy
+        self._bytes = bytearray(2 * self._copy)
+        self._head = 0   # Bit slot of the next write, always below the capacity
+        self._count = 0
     
     def add_bit(self, bit):
-        """Add bit to buffer"""
-        self.buffer.append(str(bit))
-        
-        # Prevent buffer overflow
-        if len(self.buffer) > self.max_size:
-            self.buffer = self.buffer[-self.max_size//2:]  # Keep last half
+        """Add bit to buffer, the oldest bit goes once it is full"""
+        head = self._head
+        index = head >> 3
+        mask = 0x80 >> (head & 7)
+        data = self._bytes
+        if bit == 1 or bit == '1':
+            data[index] |= mask
+            data[index + self._copy] |= mask
+        else:
+            data[index] &= ~mask
+            data[index + self._copy] &= ~mask
+        self._head = head + 1 if head + 1 < self._capacity else 0
+        if self._count < self.max_size:
+            self._count += 1
+    
+    def bits(self):
+        """Newest bits unpacked into a uint8 array, oldest first"""
+        end = self._head + self._capacity
+        start = end - self._count
+        packed = np.frombuffer(self._bytes, dtype=np.uint8)[start >> 3:-(-end // 8)]
+        return np.unpackbits(packed)[start & 7:(start & 7) + self._count]
     
     def get_buffer_string(self):
         """Get buffer as string"""
-        return ''.join(self.buffer)
+        return self.bits().tobytes().translate(_BIT_STRING).decode('ascii')
+    
+    def find(self, pattern, start=0):
+        """Position of a '0'/'1' pattern in the buffer, -1 if absent"""
+        if isinstance(pattern, str):
+            pattern = pattern.encode('ascii').translate(_BIT_CHARACTERS)
+        return self.bits().tobytes().find(bytes(pattern), start)
     
     def clear(self):
         """Clear buffer"""
-        self.buffer = []
+        self._head = 0
+        self._count = 0
     
     def size(self):
         """Get buffer size"""
-        return len(self.buffer)
+        return self._count
+
+class ClockRecovery:
+    """Recover the sender's symbol clock from the timing of level transitions"""
+    def __init__(self, nominal_period=None, max_run_symbols=8, phase_gain=0.3, period_gain=0.05, bootstrap_runs=12):
+        self.nominal_period = nominal_period    # Optional hint in seconds
+        self.max_run_symbols = max_run_symbols  # Longest run we ever expand (block sync = 7)
+        self.phase_gain = phase_gain            # How fast the symbol grid follows edges
+        self.period_gain = period_gain          # How fast the period follows sender drift
+        self.bootstrap_runs = bootstrap_runs    # Edges collected before a blind estimate
+        self.reset()
+    
+    def reset(self):
+        """Forget the current run and the clock estimate"""
+        self.symbol_period = self.nominal_period
+        self.slots = []    # (start, end) of every symbol the last push returned
+        self._grid = None  # Recovered grid time of the previous edge
+        self._level = None
+        self._run_start = None
+        self._last_timestamp = None
+        self._last_soft = None
+        self._crossing = None
+        self._flushed = False
+        self._pending_runs = []
+        self._sample_interval = None
+    
+    def push(self, level, timestamp, soft=None):
+        """Feed one sliced sample, return the list of symbols it completed
+        
+        soft is the sample's signed distance from the threshold (see
+        AdaptiveSlicer.soft_value), it places edges between samples.
+        """
+        if self.slots:
+            self.slots = []
+        if self._level is None:
+            self._level = level
+            self._last_timestamp = timestamp
+            self._last_soft = soft
+            return []
+        
+        # Where the brightness last crossed the threshold. The slicer's
+        # hysteresis may only flip the level a sample or two later.
+        if soft is not None and self._last_soft is not None and soft * self._last_soft < 0:
+            fraction = self._last_soft / (self._last_soft - soft)
+            self._crossing = self._last_timestamp + fraction * (timestamp - self._last_timestamp)
+        self._last_soft = soft
+        
+        # Track the camera's sample interval, the grid search must avoid it
+        interval = timestamp - self._last_timestamp
+        if self._sample_interval is None:
+            self._sample_interval = interval
+        else:
+            self._sample_interval += 0.05 * (interval - self._sample_interval)
+        
+        if level == self._level:
+            self._last_timestamp = timestamp
+            
+            # Flush runs longer than any legal symbol run, e.g. the idle
+            # screen after a frame, so trailing symbols are not held back
+            if (not self._flushed and self._grid is not None and
+                    timestamp - self._run_start > self.max_run_symbols * self.symbol_period):
+                self._flushed = True
+                self.slots = [(self._grid + index * self.symbol_period, self._grid + (index + 1) * self.symbol_period)
+                              for index in range(self.max_run_symbols)]
+                return [level] * self.max_run_symbols
+            return []
+        
+        # The edge is the threshold crossing of this run, if the soft values
+        # saw one, or else somewhere between the previous sample and this one
+        if self._crossing is not None and (self._run_start is None or self._crossing > self._run_start):
+            edge = self._crossing
+        else:
+            edge = (self._last_timestamp + timestamp) / 2.0
+        self._crossing = None
+        run = (self._level, self._run_start, edge, self._flushed)
+        
+        self._level = level
+        self._run_start = edge
+        self._last_timestamp = timestamp
+        self._flushed = False
+        
+        if self.symbol_period is None:
+            return self._bootstrap(run)
+        return self._advance(*run)
+    
+    def _advance(self, level, start, end, flushed):
+        """Place an edge on the symbol grid, return the symbols of the run it ends"""
+        if start is None or flushed or self._grid is None:
+            # Nothing to count against: (re)anchor the grid on this edge
+            self._grid = end
+            return []
+        
+        position = (end - self._grid) / self.symbol_period
+        count = int(round(position))
+        if count < 1:
+            return []  # Edges that land on the previous grid point are glitches
+        
+        # Edges sit on multiples of the sender's symbol period, so the
+        # distance to the nearest grid point drives a small phase/period loop
+        residual = (position - count) * self.symbol_period
+        start = self._grid
+        self._grid += count * self.symbol_period + self.phase_gain * residual
+        if count <= 4:
+            self.symbol_period += self.period_gain * residual / count
+        
+        # The run's symbols share the stretch between the two grid points evenly
+        width = (self._grid - start) / count
+        count = min(count, self.max_run_symbols)
+        self.slots.extend((start + index * width, start + (index + 1) * width) for index in range(count))
+        return [level] * count
+    
+    def _bootstrap(self, run):
+        """Collect edges until the symbol period can be estimated blindly"""
+        self._pending_runs.append(run)
+        if len(self._pending_runs) < self.bootstrap_runs:
+            return []
+        
+        runs, self._pending_runs = self._pending_runs, []
+        estimate = self._estimate_clock([end for _, _, end, _ in runs])
+        if estimate is None:
+            return []
+        
+        self.symbol_period, origin = estimate
+        
+        # Snap the first edge onto the estimated grid, then replay the rest
+        first_end = runs[0][2]
+        self._grid = origin + round((first_end - origin) / self.symbol_period) * self.symbol_period
+        symbols = []
+        for level, start, end, flushed in runs[1:]:
+            symbols.extend(self._advance(level, start, end, flushed))
+        return symbols
+    
+    def _estimate_clock(self, edges):
+        """Estimate (period, origin) as the grid that best explains a set of edges"""
+        edges = np.asarray(edges, dtype=np.float64)
+        durations = np.diff(edges)
+        durations = durations[durations > 0]
+        if len(durations) == 0:
+            return None
+        
+        # Every run lasts at least one symbol, so the period sits near the
+        # shortest run; score candidates by how well edges line up on the grid
+        shortest = durations.min()
+        candidates = np.linspace(0.6 * shortest, 1.6 * shortest, 400)
+        
+        # Sampled edges always line up with the frame clock itself, so
+        # anything close to the sample interval is an alias
+        if self._sample_interval:
+            candidates = candidates[candidates > 1.25 * self._sample_interval]
+            if len(candidates) == 0:
+                return None
+        relative = edges - edges[0]
+        phasors = np.exp(2j * np.pi * relative[np.newaxis, :] / candidates[:, np.newaxis]).mean(axis=1)
+        coherence = np.abs(phasors)
+        
+        # Prefer the longest period that fits, shorter ones are harmonics
+        best = np.nonzero(coherence >= 0.9 * coherence.max())[0][-1]
+        period = float(candidates[best])
+        origin = edges[0] + np.angle(phasors[best]) / (2 * np.pi) * period
+        return period, float(origin)
+
+class SymbolIntegrator:
+    """Matched filter on the recovered symbol clock
+    
+    Every sample stands for the stretch of time half a sample interval
+    either side of it. A symbol's soft value is the mean of the slicer's
+    soft values over its slot, each sample weighted by how much of its
+    stretch lies inside, so a sample that glitched across the threshold is
+    outvoted by the rest of its symbol. StreamingDecoder then settles each
+    Manchester pair from its two soft values.
+    """
+    def __init__(self, capacity=1024):
+        self._samples = SampleBuffer(capacity)  # Must outlast the longest run ClockRecovery expands
+        self._last_timestamp = None
+        self.sample_interval = None
+    
+    def add(self, timestamp, value):
+        """Record one sample's soft value"""
+        if self._last_timestamp is not None:
+            interval = timestamp - self._last_timestamp
+            if self.sample_interval is None:
+                self.sample_interval = interval
+            else:
+                self.sample_interval += 0.05 * (interval - self.sample_interval)
+        self._last_timestamp = timestamp
+        self._samples.append(timestamp, value)
+    
+    def clear(self):
+        """Forget every sample"""
+        self._samples.clear()
+        self._last_timestamp = None
+        self.sample_interval = None
+    
+    def integrate(self, start, end):
+        """Weighted mean soft value over a slot, None when samples cover less than half of it"""
+        if not self.sample_interval:
+            return None
+        timestamps, values = self._samples.window()
+        half = self.sample_interval / 2.0
+        first, last = timestamps.searchsorted((start - half, end + half)).tolist()
+        
+        # A slot holds a handful of samples, plain floats beat NumPy calls at that size
+        total = weighted = 0.0
+        for timestamp, value in zip(timestamps[first:last].tolist(), values[first:last].tolist()):
+            weight = min(end, timestamp + half) - max(start, timestamp - half)
+            if weight > 0:
+                total += weight
+                weighted += weight * value
+        
+        # Rolling shutter frames leave gaps no row sees, and a slot that
+        # fell into one is better left to the run it was counted from
+        if total < 0.5 * (end - start):
+            return None
+        return weighted / total
+    
+    def decide(self, symbols, slots):
+        """(symbol, soft value) for the symbols of one ClockRecovery push, each re-decided from its slot"""
+        decided = []
+        for symbol, (start, end) in zip(symbols, slots):
+            soft = self.integrate(start, end)
+            if soft:
+                symbol = 1 if soft > 0 else 0
+            decided.append((symbol, soft))
+        return decided